@@ -0,0 +1,131 @@
+import os
+import json
+import shutil
+import pickle
+import threading
+import pandas as pd
+from typing import List, Optional
+
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".modexa_cache", "checkpoints")
+
+
+class CheckpointStore:
+    """
+    Persists agent run state after each completed step so a run can resume from the
+    step that failed, or replay from any earlier checkpoint.
+
+    Layout:
+        <root>/<run_id>/data/<var>_<n>.parquet|.pkl   scratchpad values, written once per new object
+        <root>/<run_id>/ckpt_<n>.json                  plan, traces, step pointer and scratchpad index
+    """
+
+    def __init__(self, root: str = None):
+        self.root = root or os.getenv("MODEXA_CHECKPOINT_DIR", DEFAULT_ROOT)
+        self._lock = threading.Lock()
+        self._written = {}   # run_id -> {var: (version, filename)}, so unchanged values aren't rewritten
+
+    def _run_dir(self, run_id: str) -> str:
+        return os.path.join(self.root, run_id)
+
+    def save(self, run_id: str, question: str, plan: List[str], completed: dict, current_step_index: int, scratchpad) -> int:
+        """
+        Writes a checkpoint and returns its number.
+
+        Args:
+            completed: Step index -> trace for every step logged so far.
+            scratchpad: The run's Scratchpad.
+        """
+        with self._lock:
+            run_dir = self._run_dir(run_id)
+            data_dir = os.path.join(run_dir, "data")
+            os.makedirs(data_dir, exist_ok=True)
+            n = len(self.list(run_id))
+
+            written = self._written.setdefault(run_id, {})
+            index = {}
+            for var in list(scratchpad.versions):
+                version = scratchpad.versions.get(var)
+                previous = written.get(var)
+                if previous and previous[0] == version:
+                    index[var] = previous[1]
+                    continue
+                # Only read values that changed, so spilled frames aren't reloaded needlessly
+                filename = self._write_value(data_dir, f"{var}_{n}", scratchpad.get(var))
+                written[var] = (version, filename)
+                index[var] = filename
+
+            state = {
+                "run_id": run_id,
+                "question": question,
+                "plan": list(plan),
+                "completed": {str(idx): trace for idx, trace in completed.items()},
+                "current_step_index": current_step_index,
+                "scratchpad": index,
+            }
+            path = os.path.join(run_dir, f"ckpt_{n:03d}.json")
+            with open(path + ".tmp", "w") as f:
+                json.dump(state, f, default=str)
+            os.replace(path + ".tmp", path)
+            return n
+
+    @staticmethod
+    def _write_value(data_dir: str, stem: str, value) -> str:
+        if isinstance(value, pd.DataFrame):
+            try:
+                filename = f"{stem}.parquet"
+                value.to_parquet(os.path.join(data_dir, filename))
+                return filename
+            except Exception as e:
+                # Mixed-type object columns can't always be written as Parquet
+                print(f"[Checkpoint] Falling back to pickle for '{stem}': {e}")
+        filename = f"{stem}.pkl"
+        with open(os.path.join(data_dir, filename), "wb") as f:
+            pickle.dump(value, f)
+        return filename
+
+    def list(self, run_id: str) -> List[int]:
+        run_dir = self._run_dir(run_id)
+        if not os.path.isdir(run_dir):
+            return []
+        return sorted(
+            int(name[len("ckpt_"):-len(".json")])
+            for name in os.listdir(run_dir)
+            if name.startswith("ckpt_") and name.endswith(".json")
+        )
+
+    def load(self, run_id: str, checkpoint: Optional[int] = None) -> dict:
+        """
+        Loads a checkpoint (the latest by default), with scratchpad values read back in.
+        """
+        checkpoints = self.list(run_id)
+        if not checkpoints:
+            raise FileNotFoundError(f"No checkpoints found for run '{run_id}'")
+        n = checkpoints[-1] if checkpoint is None else checkpoint
+
+        run_dir = self._run_dir(run_id)
+        with open(os.path.join(run_dir, f"ckpt_{n:03d}.json")) as f:
+            state = json.load(f)
+
+        state["completed"] = {int(idx): trace for idx, trace in state["completed"].items()}
+        # Scratchpad versions restart once restored, so forget what was written for the old ones
+        with self._lock:
+            self._written.pop(run_id, None)
+        values = {}
+        for var, filename in state["scratchpad"].items():
+            path = os.path.join(run_dir, "data", filename)
+            if filename.endswith(".parquet"):
+                values[var] = pd.read_parquet(path)
+            else:
+                with open(path, "rb") as f:
+                    values[var] = pickle.load(f)
+        state["scratchpad"] = values
+        state["checkpoint"] = n
+        return state
+
+    def delete(self, run_id: str):
+        with self._lock:
+            self._written.pop(run_id, None)
+            shutil.rmtree(self._run_dir(run_id), ignore_errors=True)
+
+
+default_checkpoint_store = CheckpointStore()
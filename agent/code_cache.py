@@ -0,0 +1,138 @@
+import os
+import json
+import hashlib
+import threading
+import pandas as pd
+from typing import Optional
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".modexa_cache", "code.json")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Collapses whitespace and trailing punctuation. Case and operators are kept, since they
+    change what the generated code does.
+    """
+    return " ".join(prompt.split()).rstrip(" .")
+
+
+def schema_fingerprint(params) -> str:
+    """
+    Hash of the structure of `params`: column names and dtypes of every DataFrame, keys of
+    dicts and the types of other values. Row contents don't matter.
+    """
+    def describe(value):
+        if isinstance(value, pd.DataFrame):
+            return {"columns": [[str(c), str(t)] for c, t in value.dtypes.items()], "index": str(value.index.dtype)}
+        if isinstance(value, dict):
+            return {str(k): describe(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [describe(v) for v in value]
+        return type(value).__name__
+
+    return hashlib.sha256(json.dumps(describe(params), sort_keys=True).encode()).hexdigest()[:16]
+
+
+class CodeCache:
+    """
+    Remembers generated functions that ran successfully, keyed by normalized prompt and the
+    schema fingerprint of their inputs, so recurring transformations skip code generation.
+
+    Args:
+        path: JSON file the cache persists to (MODEXA_CODE_CACHE_PATH overrides the default).
+        max_entries: Least recently used entries beyond this are dropped.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = 500):
+        self.path = path or os.getenv("MODEXA_CODE_CACHE_PATH", DEFAULT_PATH)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.entries = {}    # key -> {"prompt", "schema", "code", "uses", "generation_latency_s"}
+        self.stats = {"hits": 0, "misses": 0, "invalidated": 0, "saved_latency_s": 0.0}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[CodeCache] Ignoring unreadable code cache {self.path}: {e}")
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def key(prompt: str, params=None) -> str:
+        return hashlib.sha256(f"{normalize_prompt(prompt)}\n{schema_fingerprint(params)}".encode()).hexdigest()
+
+    def lookup(self, prompt: str, params=None) -> Optional[str]:
+        """
+        Returns the cached code for this prompt and input schema, or None. It only counts as
+        a hit once `record_hit` confirms the code ran successfully.
+        """
+        key = self.key(prompt, params)
+        with self._lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries[key] = entry   # Most recently used last
+            return entry["code"]
+
+    def record_hit(self, prompt: str, params=None):
+        """
+        Counts a hit, and the generation latency it saved, for cached code that just ran successfully.
+        """
+        key = self.key(prompt, params)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            entry["uses"] += 1
+            self.stats["hits"] += 1
+            self.stats["saved_latency_s"] += entry.get("generation_latency_s", 0.0)
+
+    def add(self, prompt: str, params, code: str, generation_latency: float = 0.0):
+        """
+        Stores code that has just run successfully on inputs shaped like `params`.
+        """
+        key = self.key(prompt, params)
+        with self._lock:
+            self.entries[key] = {
+                "prompt": normalize_prompt(prompt),
+                "schema": schema_fingerprint(params),
+                "code": code,
+                "uses": 0,
+                "generation_latency_s": generation_latency,
+            }
+            while len(self.entries) > self.max_entries:
+                self.entries.pop(next(iter(self.entries)))
+            self._save()
+
+    def invalidate(self, prompt: str, params=None):
+        """
+        Drops cached code that failed; the code is generated again, so this counts as a miss.
+        """
+        key = self.key(prompt, params)
+        with self._lock:
+            if self.entries.pop(key, None) is not None:
+                self.stats["invalidated"] += 1
+                self.stats["misses"] += 1
+                self._save()
+
+    def report(self) -> dict:
+        with self._lock:
+            report = dict(self.stats)
+            lookups = report["hits"] + report["misses"]
+            report["hit_rate"] = report["hits"] / lookups if lookups else 0.0
+            report["entries"] = len(self.entries)
+            return report
+
+
+default_code_cache = CodeCache()
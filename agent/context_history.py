@@ -1,10 +1,64 @@
+# Final thoughts the executor records when it gives up on a step
+FAILURE_THOUGHTS = ("Exceeded max retries.", "Deadline exceeded.")
+
+
+def trace_failed(trace: list[dict]) -> bool:
+    return bool(trace) and trace[-1].get("thought") in FAILURE_THOUGHTS
+
+
 class ContextHistory:
     def __init__(self):
         self.entries = []
 
     def log(self, step: str, trace: list[dict]):
-        self.entries.append({"step": step, "trace": trace})
+        self.entries.append({
+            "step": step,
+            "trace": trace,
+            "digest": None,   # Short summary that replaces the trace once the step is compacted
+            "failed": trace_failed(trace),
+        })
 
     def recent(self, n=3):
         return self.entries[-n:]
-    
\ No newline at end of file
+
+    def clear(self):
+        self.entries = []
+
+    def compact(self, keep_recent: int = 3, summarizer=None) -> int:
+        """
+        Replaces the traces of all but the `keep_recent` latest steps with short digests.
+        Digests are computed once per step, with `summarizer(step, trace)` if given, else
+        extractively. Returns the number of steps newly compacted.
+        """
+        summarizer = summarizer or extractive_digest
+        cutoff = max(0, len(self.entries) - keep_recent)
+        compacted = 0
+        for entry in self.entries[:cutoff]:
+            if entry["digest"] is not None:
+                continue
+            try:
+                entry["digest"] = summarizer(entry["step"], entry["trace"])
+            except Exception as e:
+                print(f"[Warning] Step digest failed, using extractive digest: {e}")
+                entry["digest"] = extractive_digest(entry["step"], entry["trace"])
+            entry["trace"] = []
+            compacted += 1
+        return compacted
+
+
+def extractive_digest(step: str, trace: list[dict], max_chars: int = 300) -> str:
+    """
+    One-line digest of a step: the last action taken and the first line of what it returned.
+    """
+    if not trace:
+        return "No actions recorded."
+    last = trace[-1]
+    action = last.get("action")
+    if isinstance(action, dict):
+        action_str = f"{action.get('tool')} -> {(action.get('args') or {}).get('output_var', '?')}"
+    else:
+        action_str = "reasoning only"
+    observation = str(last.get("observation") or "").strip().splitlines()
+    observation = " ".join(observation[:2])   # e.g. DataFrame shape and columns
+    digest = f"{len(trace)} attempt(s); last action: {action_str}; result: {observation}"
+    return digest[:max_chars]
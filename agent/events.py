@@ -0,0 +1,120 @@
+import queue
+from dataclasses import dataclass, field, fields
+from typing import ClassVar, List, Optional
+
+
+@dataclass
+class ProgressEvent:
+    """
+    Base class for what the executor reports while it runs. Front-ends (Streamlit, CLI,
+    HTTP) subscribe with an `on_progress(event)` callback or by iterating an EventQueue.
+    """
+    type: ClassVar[str] = "event"
+
+    def to_dict(self) -> dict:
+        # Shallow, so traces holding large observations aren't deep-copied per event
+        return dict({f.name: getattr(self, f.name) for f in fields(self)}, type=self.type)
+
+
+@dataclass
+class PlanStep(ProgressEvent):
+    type: ClassVar[str] = "plan_step"
+    index: int
+    step: str
+
+
+@dataclass
+class PlanReady(ProgressEvent):
+    type: ClassVar[str] = "plan_ready"
+    plan: List[str]
+
+
+@dataclass
+class StepStarted(ProgressEvent):
+    type: ClassVar[str] = "step_started"
+    index: int
+    step: str
+
+
+@dataclass
+class Thought(ProgressEvent):
+    type: ClassVar[str] = "thought"
+    index: int
+    attempt: int
+    thought: str
+
+
+@dataclass
+class Action(ProgressEvent):
+    type: ClassVar[str] = "action"
+    index: int
+    attempt: int
+    tool: str
+    args: dict = field(default_factory=dict)
+
+
+@dataclass
+class Observation(ProgressEvent):
+    type: ClassVar[str] = "observation"
+    index: int
+    attempt: int
+    observation: str
+    cached: bool = False
+    error: Optional[str] = None
+
+
+@dataclass
+class StepDone(ProgressEvent):
+    type: ClassVar[str] = "step_done"
+    index: int
+    step: str
+    trace: List[dict]
+    failed: bool = False
+
+
+@dataclass
+class StepFailed(ProgressEvent):
+    type: ClassVar[str] = "step_failed"
+    index: int
+    step: str
+    error: str
+
+
+@dataclass
+class AnswerToken(ProgressEvent):
+    type: ClassVar[str] = "answer_token"
+    text: str
+
+
+@dataclass
+class AnswerDone(ProgressEvent):
+    type: ClassVar[str] = "answer_done"
+    answer: str
+
+
+class EventQueue:
+    """
+    Callback that buffers events so another thread can consume them as a generator:
+
+        events = EventQueue()
+        worker thread: run_agent_pipeline(question, on_progress=events); events.close()
+        UI thread:     for event in events: render(event)
+    """
+
+    _CLOSED = object()
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def __call__(self, event: ProgressEvent):
+        self._queue.put(event)
+
+    def close(self):
+        self._queue.put(self._CLOSED)
+
+    def __iter__(self):
+        while True:
+            event = self._queue.get()
+            if event is self._CLOSED:
+                return
+            yield event
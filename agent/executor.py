@@ -1,12 +1,46 @@
 from llm.wrapper import LLMWrapper
 import pandas as pd 
-from agent.utils import summarize_value, resolve_args_from_scratchpad
+from agent.utils import resolve_args_from_scratchpad
+from agent.step_judge import prejudge_step
+from llm.telemetry import usage_recorder
 from agent.scratchpad import Scratchpad
-from agent.context_history import ContextHistory
-import streamlit as st
+from agent.context_history import ContextHistory, extractive_digest, trace_failed
+from llm.scheduler import estimate_tokens
+import os
+import json
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from agent.plan_graph import PlanGraph, parse_step_io
+from agent.checkpoint import CheckpointStore
+from llm import deadline
+from llm.deadline import Deadline, DeadlineExceeded
+from agent.tracing import tracer, profiled
+from agent import events
+
+# Overall time budget for answering a question, overridable with MODEXA_REQUEST_TIMEOUT_S
+DEFAULT_TIME_BUDGET_S = float(os.getenv("MODEXA_REQUEST_TIMEOUT_S", 300))
+# Steps assumed for a plan that is still streaming in, when budgeting time per step
+EXPECTED_PLAN_STEPS = 5
 
 class ReActPlanExecutor:
-    def __init__(self, tool_specs, tool_mapper, llm: LLMWrapper, use_ui= True, max_retries: int = 5):
+    def __init__(
+        self,
+        tool_specs,
+        tool_mapper,
+        llm: LLMWrapper,
+        max_retries: int = 5,
+        max_parallel: int = 4,
+        checkpoints: CheckpointStore = None,
+        run_id: str = None,
+        context_keep_recent: int = 3,
+        context_token_budget: int = None,
+        llm_digests: bool = False,
+        time_budget_s: float = None,
+        answer_reserve_s: float = None,
+        profile_step: int = None,
+        on_progress=None,
+    ):
         self.tools = tool_specs                # Toolset for actions (e.g., sql_tool, ml_tool, plot_tool)
         self.tool_mapper = tool_mapper          # Maps tool names to functions
         self.llm = llm                    # LLM interface
@@ -14,84 +48,376 @@ class ReActPlanExecutor:
         self.scratchpad = Scratchpad()             # Volatile working memory
         self.current_step_index = 0      # Pointer to step in the plan
         self.max_tries = max_retries      # Max retries for each step
-        self.use_ui = use_ui
+        self.max_parallel = max_parallel  # Max plan steps running at once
+        self.judge_stats = {"fast_pass": 0, "fast_fail": 0, "llm": 0}   # How each step judgement was settled
+        self._tool_memo = {}             # Tool call key -> (output_var, scratchpad version) of its result
+        self.memo_stats = {"hits": 0, "misses": 0}
+        self.plan = []                   # Steps received so far (the plan may be streamed)
+        self._history_start = 0          # First context history entry of the current run
+        self.metrics = {}                # Run latencies, e.g. time_to_first_action_s
+        self.checkpoints = checkpoints   # Optional store for per-step run state
+        self.run_id = run_id
+        self.context_keep_recent = context_keep_recent      # Steps kept in full in the final prompt
+        self.context_token_budget = context_token_budget or int(os.getenv("MODEXA_CONTEXT_TOKEN_BUDGET", 6000))
+        self.llm_digests = llm_digests                      # Digest older steps with the LLM instead of extractively
+        self.time_budget_s = time_budget_s or DEFAULT_TIME_BUDGET_S   # Used when the caller hasn't set a deadline
+        self.answer_reserve_s = answer_reserve_s                      # Time kept back for the final answer
+        self.on_progress = on_progress   # Optional callback receiving agent.events progress events
+        # Step number (1-based) to capture a cProfile for, e.g. MODEXA_PROFILE_STEP=2
+        self.profile_step = profile_step or (int(os.getenv("MODEXA_PROFILE_STEP")) if os.getenv("MODEXA_PROFILE_STEP") else None)
 
     def reset(self):
         self.context_history.clear()
         self.scratchpad.clear()
         self.current_step_index = 0
+        self._history_start = 0
+        self.judge_stats = {"fast_pass": 0, "fast_fail": 0, "llm": 0}
+        self._tool_memo = {}
+        self.memo_stats = {"hits": 0, "misses": 0}
 
-    def run_plan(self, plan: list[str], question: str):
-        self.status_items = []
+    def run_plan(self, plan, question: str, stream: bool = False, completed: dict = None):
+        """
+        Executes each step of `plan`, which may be a list or a generator streaming steps
+        as the planner produces them. With `stream=True` the final answer is returned as
+        a generator of text chunks instead of a string.
 
-        while self.current_step_index < len(plan):
-            step = plan[self.current_step_index]
-            step_label = f"Running step {self.current_step_index + 1}: {step}"
-            status = None
+        Steps whose inputs are ready run concurrently (up to `max_parallel`), but are
+        logged to the context history in plan order so the final answer is deterministic.
+        `completed` maps step indices to traces of steps already done (when resuming).
 
-            try:
-                if self.use_ui:
-                    status = st.status(step_label, state="running", expanded=True)
-                    self.status_items.append(status)
-                    status.write(f"**Step {self.current_step_index + 1}:** {step}")
-
-                print(f"\n--- Step {self.current_step_index + 1}: {step} ---")
-                self.execute_step(step, question)
-
-                latest_entry = self.context_history.entries[-1]["trace"]
-                if latest_entry:
-                    last = latest_entry[-1]
-                    if self.use_ui and status:
-                        status.write(f"- **Thought:** {last.get('thought', '')}")
-                        status.write(f"- **Action:** {last.get('action', '')}")
-                        status.write(f"- **Observation:** {last.get('observation', '')}")
-                if self.use_ui and status:
-                    status.update(label=f"✅ Completed: {step}", state="complete", expanded=False)
+        The run is bounded by the caller's deadline (or `time_budget_s`). Steps share what's
+        left of it minus a reserve for the final answer; once that's spent, no new steps
+        start, a plan still streaming in is abandoned, and the answer is written from the
+        steps completed so far.
+        """
+        completed = completed or {}
+        request_deadline = deadline.current_deadline() or Deadline(self.time_budget_s)
+        reserve = self.answer_reserve_s
+        if reserve is None:
+            reserve = min(30.0, 0.15 * request_deadline.remaining())
+        steps_deadline = request_deadline.child(request_deadline.remaining() - reserve)
+        self.question = question
+        self.plan = []
+        self.metrics = {"timeouts": request_deadline.root.timeouts}   # Time-outs per stage
+        self.current_step_index = 0
+        # Entries before this are from earlier questions when the executor is kept for a session
+        self._history_start = len(self.context_history.entries)
+        self._run_started = time.perf_counter()
+        self._graph = PlanGraph()
+        self._results = {}       # step index -> local trace of finished steps
+        self._logged = logged = set()
+        done, started = set(), set()
+        running = {}             # future -> step index
+        failed = False
+        steps = iter(plan)
+        plan_exhausted = False
+        plan_size = len(plan) if isinstance(plan, (list, tuple)) else None
+        # Streamed steps are read on their own thread, so waiting for the planner never
+        # holds up finished steps or the deadline; one context keeps the reads' state together
+        plan_reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plan")
+        plan_ctx = contextvars.copy_context()
+        reading = None           # Future for the next step of the plan
 
-            except Exception as e:
-                error_msg = f"❌ Step failed due to: {str(e)}"
-                print(error_msg)
-                if self.use_ui and status:
-                    status.write(f"**Error:** {str(e)}")
-                    status.update(label=error_msg, state="error", expanded=True)
-                break
+        with deadline.within(request_deadline), ThreadPoolExecutor(max_workers=self.max_parallel) as pool:
+            while True:
+                if not failed and steps_deadline.expired():
+                    print("⏱️ Out of time for steps, answering with what has completed so far")
+                    steps_deadline.record("steps")
+                    failed = True
+
+                if not failed:
+                    for idx in self._graph.ready(done, started):
+                        started.add(idx)
+                        self._emit(events.StepStarted(idx, self._graph.steps[idx]))
+                        pending = len(self._graph.steps) - len(done)
+                        if not plan_exhausted:
+                            # Steps yet to arrive need time too: the rest of the plan if its size is known
+                            pending = max(pending, (plan_size or EXPECTED_PLAN_STEPS) - len(done))
+                        step_deadline = steps_deadline.child(self._step_budget(steps_deadline, pending))
+                        # Carry run/step tags, LLM priority and the deadline into the worker thread
+                        ctx = contextvars.copy_context()
+                        running[pool.submit(ctx.run, self._run_step, idx, question, step_deadline)] = idx
+
+                    if not plan_exhausted and reading is None:
+                        reading = plan_reader.submit(plan_ctx.run, self._read_plan_step, steps, steps_deadline)
 
-            self.current_step_index += 1
+                # No more waiting on the planner once steps have stopped
+                waiting = set(running) | ({reading} if reading is not None and not failed else set())
+                if not waiting:
+                    break
 
+                finished, _ = wait(waiting, timeout=None if failed else steps_deadline.remaining(),
+                                   return_when=FIRST_COMPLETED)
+                if reading in finished:
+                    future, reading = reading, None
+                    try:
+                        step = future.result()
+                    except DeadlineExceeded:
+                        # The planner ran into the steps deadline; answer from what has completed
+                        step, plan_exhausted = None, True
+                        failed = True
+                    if step is None:
+                        plan_exhausted = True
+                        if not failed:
+                            self._emit(events.PlanReady(list(self.plan)))
+                    else:
+                        self.plan.append(step)
+                        idx = self._graph.add(step)
+                        self._emit(events.PlanStep(idx, step))
+                        if idx in completed:
+                            self._results[idx] = completed[idx]
+                            done.add(idx)
+                            started.add(idx)
+                        if "time_to_first_step_s" not in self.metrics:
+                            self.metrics["time_to_first_step_s"] = time.perf_counter() - self._run_started
+
+                for future in finished:
+                    if future not in running:
+                        continue
+                    idx = running.pop(future)
+                    try:
+                        self._results[idx] = future.result()
+                        done.add(idx)
+                        trace = self._results[idx]
+                        self._emit(events.StepDone(idx, self._graph.steps[idx], trace, failed=trace_failed(trace)))
+                    except Exception as e:
+                        error_msg = f"❌ Step failed due to: {str(e)}"
+                        print(error_msg)
+                        self._emit(events.StepFailed(idx, self._graph.steps[idx], str(e)))
+                        failed = True
+
+                # Log finished steps in plan order, up to the first one still pending or failed
+                while self.current_step_index in self._results:
+                    self._log_step(self.current_step_index)
+                    logged.add(self.current_step_index)
+                    self.current_step_index += 1
+                    self._checkpoint(question)
+
+        # Steps that finished after a failure are still useful context
+        for idx in sorted(self._results):
+            if idx not in logged:
+                self._log_step(idx)
+                logged.add(idx)
+
+        # The rest of an unfinished plan isn't needed: stop the planner rather than wait for it
+        if not plan_exhausted:
+            if reading is None:
+                self._close_plan(steps)
+            else:
+                reading.add_done_callback(lambda _: self._close_plan(steps))
+        plan_reader.shutdown(wait=False)
+        self._checkpoint(question)
+        print(f"Run metrics: {self.metrics}")
+        print(f"Scratchpad memory: {self.scratchpad.memory_report()}")
+        print(f"Step judging: {self.judge_calls_avoided} LLM judge calls avoided ({self.judge_stats})")
+        print(f"Tool calls: {self.memo_stats['hits']} repeated calls served from the run's results ({self.memo_stats})")
         # self._display_final_output()
-        final_prompt = self._format_context(question)
-        return self.llm._call_llm(final_prompt)
+        with deadline.within(request_deadline):
+            final_prompt = self._format_context(question)
+            if stream:
+                return deadline.bind(self._stream_best_effort(final_prompt, request_deadline), request_deadline)
+            try:
+                with tracer.span("answer", "llm"):
+                    answer = self.llm._call_llm(final_prompt)
+            except Exception as e:
+                if not request_deadline.expired():
+                    raise
+                print(f"⏱️ Final answer timed out: {e}")
+                answer = self._fallback_answer()
+            self._emit(events.AnswerDone(answer))
+            return answer
+
+    def _read_plan_step(self, steps, steps_deadline: Deadline):
+        # A streaming planner gives up at the steps deadline rather than keep the run waiting
+        with deadline.within(steps_deadline):
+            return next(steps, None)
+
+    @staticmethod
+    def _close_plan(steps):
+        close = getattr(steps, "close", None)
+        if close is not None:
+            close()
+
+    def _stream_best_effort(self, final_prompt: str, request_deadline: Deadline):
+        span = tracer.start("answer", "llm", stream=True)
+        chunks = []
+        try:
+            for chunk in self.llm.stream_answer(final_prompt):
+                if not chunks:
+                    # What the user waits for before the answer starts, next to time_to_first_action_s
+                    self.metrics["time_to_first_token_s"] = time.perf_counter() - self._run_started
+                chunks.append(chunk)
+                self._emit(events.AnswerToken(chunk))
+                yield chunk
+        except Exception as e:
+            if not request_deadline.expired():
+                tracer.end(span, e)
+                raise
+            print(f"⏱️ Final answer timed out: {e}")
+            chunk = "\n\n" + self._fallback_answer()
+            chunks.append(chunk)
+            self._emit(events.AnswerToken(chunk))
+            yield chunk
+        tracer.end(span)
+        self._emit(events.AnswerDone("".join(chunks)))
+
+    def _fallback_answer(self) -> str:
+        """
+        Answer written without the LLM when there's no time left: what each step produced.
+        """
+        lines = ["I ran out of time before I could write up a full answer. Here is what I found so far:"]
+        for entry in self.context_history.entries:
+            digest = entry["digest"] if entry["digest"] is not None else extractive_digest(entry["step"], entry["trace"])
+            lines.append(f"- {entry['step']}: {digest}")
+        return "\n".join(lines)
+
+    def _step_budget(self, steps_deadline: Deadline, pending: int) -> float:
+        # Split the time left evenly across the rounds of parallel steps still to run
+        rounds = max(1, -(-pending // self.max_parallel))
+        return steps_deadline.remaining() / rounds
+
+    def resume(self, checkpoint: int = None, stream: bool = False):
+        """
+        Restores this run (`self.run_id`) from a checkpoint, the latest by default, and
+        continues from the first step that hadn't completed.
+        """
+        state = self.checkpoints.load(self.run_id, checkpoint)
+        print(f"Resuming run {self.run_id} from checkpoint {state['checkpoint']} (step {state['current_step_index'] + 1} of {len(state['plan'])})")
+
+        self.context_history.clear()
+        self.scratchpad.clear()
+        for var, value in state["scratchpad"].items():
+            self.scratchpad.set(var, value)
+
+        return self.run_plan(state["plan"], state["question"], stream=stream, completed=state["completed"])
+
+    def _checkpoint(self, question: str):
+        if self.checkpoints is None or self.run_id is None:
+            return
+        try:
+            self.checkpoints.save(
+                self.run_id,
+                question,
+                self.plan,
+                {idx: self._results[idx] for idx in self._logged},
+                self.current_step_index,
+                self.scratchpad,
+            )
+        except Exception as e:
+            # A failed checkpoint shouldn't fail the run
+            print(f"[Warning] Failed to checkpoint run {self.run_id}: {e}")
 
-    def execute_step(self, step: str, question: str):
+    def succeeded(self) -> bool:
+        """
+        True if every step of the last run was logged and completed within its retries.
+        """
+        entries = self.context_history.entries[self._history_start:]
+        if not self.plan or len(entries) != len(self.plan):
+            return False
+        return not any(entry["failed"] for entry in entries)
+
+    def _run_step(self, idx: int, question: str, step_deadline: Deadline = None):
+        step = self._graph.steps[idx]
+        print(f"\n--- Step {idx + 1}: {step} ---")
+        with usage_recorder.step(idx), deadline.within(step_deadline), tracer.span("step", "step", index=idx, step=step):
+            if self.profile_step == idx + 1:
+                prof_path = os.path.join(tracer.export_dir, f"{self.run_id}_step{idx + 1}.prof") if tracer.export_dir else None
+                with profiled(prof_path):
+                    return self.execute_step(step, question, index=idx)
+            return self.execute_step(step, question, index=idx)
+
+    def _log_step(self, idx: int):
+        trace = self._results[idx]
+        self.context_history.log(self._graph.steps[idx], trace)
+        entry = self.context_history.entries[-1]
+        entry["full_tokens"] = estimate_tokens("\n".join(self._render_entry(idx, entry)))
+        # Digest older steps as we go so the history stays bounded
+        self.context_history.compact(self.context_keep_recent, self._digest_step)
+        for t in reversed(trace):
+            if t.get("output_var"):
+                self.scratchpad.set("_last_output_var", t["output_var"])
+                break
+
+    def _emit(self, event: events.ProgressEvent):
+        if self.on_progress is None:
+            return
+        try:
+            self.on_progress(event)
+        except Exception as e:
+            # A broken subscriber shouldn't fail the run
+            print(f"[Warning] Progress callback failed on '{event.type}': {e}")
+
+    def execute_step(self, step: str, question: str, index: int = None):
+        """
+        Runs the think/act/judge loop for one step and returns its trace.
+        `index` is the step's position in the plan, reported with progress events.
+        """
         step_done = False
         curr_tries = 0
         local_trace = []  # For this step’s ReAct loop
+        # Variables the step declared it writes; None if it isn't annotated
+        _, _, declared_outputs = parse_step_io(step)
 
-        while not step_done and curr_tries <= self.max_tries:
-            curr_tries += 1
+        try:
+            while not step_done and curr_tries <= self.max_tries:
+                curr_tries += 1
+                deadline.check("step")
 
-            # STEP 1: THINK
-            prompt = self._build_prompt(question, step, local_trace)
-            thought_output = self.llm.think_and_route(prompt)
-            print(thought_output)
-            local_trace.append({"thought": thought_output.get('thought', 'There was an error!')})
+                # STEP 1: THINK
+                prompt = self._build_prompt(question, step, local_trace)
+                with tracer.span("think", "llm", attempt=curr_tries):
+                    thought_output = self.llm.think_and_route(prompt)
+                print(thought_output)
+                local_trace.append({"thought": thought_output.get('thought', 'There was an error!')})
+                self._emit(events.Thought(index, curr_tries, local_trace[-1]["thought"]))
             
-            # STEP 2: ACT
-            if thought_output.get('tool') and thought_output.get('tool') != 'think_reflect':
-                action = {
-                    "tool": thought_output["tool"],
-                    "args": thought_output["args"],
-                }
-                result = self._execute_action(action)
-                local_trace[-1]["action"] = action
-                local_trace[-1]["observation"] = summarize_value(result)
-            else:
-                local_trace[-1]["action"] = "None"
-                local_trace[-1]["observation"] = thought_output.get('thought')
-            # STEP 3: OBSERVE + DECIDE
-            step_done = self._is_step_complete(step, local_trace)
-            if step_done:
-                print("✅ Step complete.")
+                # STEP 2: ACT
+                if thought_output.get('tool') and thought_output.get('tool') != 'think_reflect':
+                    action = {
+                        "tool": thought_output["tool"],
+                        "args": thought_output["args"],
+                    }
+                    local_trace[-1]["action"] = action
+                    self._emit(events.Action(index, curr_tries, action["tool"], dict(action["args"] or {})))
+                    try:
+                        self._check_output_var(action, declared_outputs)
+                        with tracer.span("act", "tool", attempt=curr_tries, tool=action["tool"]):
+                            cached = self._execute_action(action)
+                        # Summary and metadata were computed once when the result was stored
+                        output_var = action["args"]["output_var"]
+                        local_trace[-1]["observation"] = self.scratchpad.summary(output_var)
+                        local_trace[-1]["result_meta"] = self.scratchpad.metadata[output_var]
+                        local_trace[-1]["output_var"] = output_var
+                        if cached:
+                            local_trace[-1]["cached"] = True
+                    except DeadlineExceeded:
+                        raise
+                    except Exception as e:
+                        print(f"[Warning] Tool '{action['tool']}' raised: {e}")
+                        local_trace[-1]["observation"] = f"Error: {e}"
+                        local_trace[-1]["error"] = str(e)
+                else:
+                    local_trace[-1]["action"] = "None"
+                    local_trace[-1]["observation"] = thought_output.get('thought')
+                self._emit(events.Observation(
+                    index, curr_tries, str(local_trace[-1]["observation"]),
+                    cached=local_trace[-1].get("cached", False), error=local_trace[-1].get("error"),
+                ))
+                # STEP 3: OBSERVE + DECIDE
+                with tracer.span("judge", "judge", attempt=curr_tries) as judge_span:
+                    step_done = self._is_step_complete(step, local_trace)
+                    judge_span.set(passed=step_done)
+                if step_done:
+                    print("✅ Step complete.")
+        except DeadlineExceeded as e:
+            # Out of time: stop here and keep whatever the step produced so far
+            print(f"⏱️ Step stopped: {e}")
+            local_trace.append({
+                "thought": "Deadline exceeded.",
+                "action": "None",
+                "observation": f"Step stopped: {e}",
+            })
+            return local_trace
 
         if not step_done:
             print("❌ Step failed after max tries.")
@@ -101,8 +427,7 @@ class ReActPlanExecutor:
                 "observation": "Step aborted after max attempts."
             })
 
-        # Add to global context history
-        self.context_history.log(step, local_trace)
+        return local_trace
 
 
     def _build_prompt(self, question, step, trace):
@@ -113,9 +438,23 @@ class ReActPlanExecutor:
             "recent_trace": trace[-3:]  # Truncate local trace for token efficiency
         }
 
-    def _execute_action(self, action: dict):
+    @staticmethod
+    def _check_output_var(action: dict, declared_outputs):
+        # The plan's dependency graph, and which steps may run side by side, come from the
+        # declared outputs; storing anything else would hide it from dependent steps
+        output_var = (action.get("args") or {}).get("output_var")
+        if declared_outputs is not None and output_var and output_var not in declared_outputs:
+            allowed = ", ".join(sorted(declared_outputs)) or "none (use think_reflect)"
+            raise ValueError(f"output_var '{output_var}' isn't an output of this step; store the result as: {allowed}")
+
+    def _execute_action(self, action: dict) -> bool:
+        """
+        Runs a tool and stores its result under the action's output_var. Identical calls made
+        earlier in the run (same tool, arguments and scratchpad input contents) are not
+        repeated: the stored result is rebound to the new output_var. Returns True if so.
+        """
         tool_name = action.get("tool")
-        tool_args = action.get("args", {})
+        tool_args = dict(action.get("args") or {})   # Copy so the trace keeps output_var
 
         # Extract output_var (must be present per spec)
         output_var = tool_args.pop("output_var", None)
@@ -123,37 +462,118 @@ class ReActPlanExecutor:
             raise ValueError(f"Tool '{tool_name}' must specify 'output_var' to store results.")
 
         args = resolve_args_from_scratchpad(tool_args, self.scratchpad)
+        if "time_to_first_action_s" not in self.metrics:
+            self.metrics["time_to_first_action_s"] = time.perf_counter() - self._run_started
+
+        memo_key = self._tool_call_key(tool_name, tool_args)
+        source = self._tool_memo.get(memo_key)
+        if source and self.scratchpad.versions.get(source[0]) == source[1]:
+            source_var = source[0]
+            self.memo_stats["hits"] += 1
+            print(f"[Cache] Reusing result of identical {tool_name} call from '{source_var}'")
+            if source_var != output_var:
+                self.scratchpad.set(
+                    output_var,
+                    self.scratchpad.get(source_var),
+                    summary=self.scratchpad.summary(source_var),
+                    metadata=self.scratchpad.metadata[source_var],
+                )
+            return True
+
         # Execute the tool
-        result = self.tool_mapper[tool_name](**args)
+        self.memo_stats["misses"] += 1
+        with tracer.span(f"tool:{tool_name}", "tool", output_var=output_var):
+            result = self.tool_mapper[tool_name](**args)
 
         # Store the result in the scratchpad under the provided variable name
+        # (_last_output_var is set when the step is logged, in plan order)
         self.scratchpad.set(output_var, result)
-        self.scratchpad.set("_last_output_var", output_var)
+        self._tool_memo[memo_key] = (output_var, self.scratchpad.versions[output_var])
+        return False
 
-        return result
+    def _tool_call_key(self, tool_name: str, tool_args: dict) -> str:
+        # Scratchpad references are keyed by content, so a renamed or recomputed-but-equal input still matches
+        canonical = {}
+        for key, value in tool_args.items():
+            if key.endswith("_var") and isinstance(value, str):
+                names = [v.strip() for v in value.split(",")] if "," in value else [value]
+                refs = [(name, self.scratchpad.fingerprint(name)) for name in names]
+                # A single reference is passed by value, so its name doesn't matter
+                canonical[key] = refs[0][1] if len(refs) == 1 else refs
+            else:
+                canonical[key] = value
+        return json.dumps([tool_name, canonical], sort_keys=True, default=str)
 
     def _is_step_complete(self, step, trace):
+        verdict = prejudge_step(step, trace[-1])
+        if verdict is True:
+            self.judge_stats["fast_pass"] += 1
+            return True
+        if verdict is False:
+            self.judge_stats["fast_fail"] += 1
+            return False
+
+        # Ambiguous outcome, escalate to the LLM judge
+        self.judge_stats["llm"] += 1
         return self.llm.judge_step(step, trace)
+
+    @property
+    def judge_calls_avoided(self):
+        return self.judge_stats["fast_pass"] + self.judge_stats["fast_fail"]
     
     def _format_context(self, question):
+        """
+        Builds the final-answer prompt within `context_token_budget`. Recent steps are kept
+        in full and older ones as digests; if that's still too long, more steps are
+        digested and finally the oldest steps are dropped.
+        """
+        start = time.perf_counter()
+        keep = self.context_keep_recent
+        self.context_history.compact(keep, self._digest_step)
+        prompt = self._render_context(question)
+
+        while estimate_tokens(prompt) > self.context_token_budget and keep > 0:
+            keep -= 1
+            self.context_history.compact(keep, self._digest_step)
+            prompt = self._render_context(question)
+
+        skip = 0
+        while estimate_tokens(prompt) > self.context_token_budget and skip < len(self.context_history.entries):
+            skip += 1
+            prompt = self._render_context(question, skip=skip)
+
+        prompt_tokens = estimate_tokens(prompt)
+        # Tokens the prompt would have had with every step in full
+        full_tokens = prompt_tokens + sum(
+            entry["full_tokens"] - estimate_tokens(entry["digest"])
+            for entry in self.context_history.entries
+            if entry["digest"] is not None and "full_tokens" in entry
+        )
+        self.metrics["context"] = {
+            "prompt_tokens": prompt_tokens,
+            "full_tokens": full_tokens,
+            "compression_ratio": full_tokens / prompt_tokens if prompt_tokens else 1.0,
+            "digested_steps": sum(entry["digest"] is not None for entry in self.context_history.entries),
+            "dropped_steps": skip,
+            "compaction_s": time.perf_counter() - start,
+        }
+        print(f"Final prompt context: {self.metrics['context']}")
+        return prompt
+
+    def _render_context(self, question, skip: int = 0):
         prompt_lines = ["You are a data scientist that has completed the following steps:\n"]
-        print(self.context_history.entries)
+        if skip:
+            prompt_lines.append(f"({skip} earlier step(s) omitted for length)\n")
+        history_start = self._history_start
         for idx, entry in enumerate(self.context_history.entries):
-            step = entry["step"]
-            prompt_lines.append(f"Step {idx + 1}: {step}")
-
-            for t in entry["trace"]:
-                thought = t.get("thought", "")
-                action = t.get("action", "")
-                observation = t.get("observation", "")
-
-                if thought:
-                    prompt_lines.append(f"Thought: {thought}")
-                if action:
-                    prompt_lines.append(f"Action: {action}")
-                if observation:
-                    prompt_lines.append(f"Observation: {observation}")
-                prompt_lines.append("\n")  # for spacing
+            if idx < skip:
+                continue
+            # In a session, steps taken for earlier questions come first
+            if history_start and idx == skip and idx < history_start:
+                prompt_lines.append("Steps for earlier questions in this conversation:\n")
+            if history_start and idx == history_start:
+                prompt_lines.append("Steps for the current question:\n")
+            prompt_lines.extend(self._render_entry(idx if idx < history_start else idx - history_start, entry))
 
         if '_last_output_var' in self.scratchpad:
             output_var = self.scratchpad.get("_last_output_var")
@@ -167,6 +587,32 @@ class ReActPlanExecutor:
                 prompt_lines.append(f"Here is the final string result from `{output_var}`:\n{result}")
                 prompt_lines.append(f"Based on the above, answer the following: {question.strip()}")
         return "\n".join(prompt_lines)
+
+    def _render_entry(self, idx, entry):
+        lines = [f"Step {idx + 1}: {entry['step']}"]
+        if entry.get("digest") is not None:
+            lines.append(f"Summary: {entry['digest']}")
+            lines.append("\n")
+            return lines
+
+        for t in entry["trace"]:
+            thought = t.get("thought", "")
+            action = t.get("action", "")
+            observation = t.get("observation", "")
+
+            if thought:
+                lines.append(f"Thought: {thought}")
+            if action:
+                lines.append(f"Action: {action}" + (" (cached result)" if t.get("cached") else ""))
+            if observation:
+                lines.append(f"Observation: {observation}")
+            lines.append("\n")  # for spacing
+        return lines
+
+    def _digest_step(self, step, trace):
+        if self.llm_digests:
+            return self.llm.digest_step(step, trace)
+        return extractive_digest(step, trace)
     
     # def _display_final_output(self):
     #     try:
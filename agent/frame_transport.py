@@ -0,0 +1,115 @@
+import os
+import uuid
+import tempfile
+import pandas as pd
+
+# POSIX shared memory is a tmpfs on Linux; elsewhere fall back to the temp dir
+SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Frames smaller than this are cheaper to pickle than to map
+DEFAULT_MIN_BYTES = int(float(os.getenv("MODEXA_SANDBOX_SHARE_MIN_MB", 1)) * 1024 * 1024)
+
+
+class FrameHandle:
+    """
+    Reference to a DataFrame stored as an Arrow IPC file in shared memory.
+    Only the handle crosses the process boundary; the data is memory-mapped on the other side.
+    """
+
+    def __init__(self, path: str, nbytes: int, rows: int):
+        self.path = path
+        self.nbytes = nbytes
+        self.rows = rows
+
+    def __repr__(self):
+        return f"FrameHandle({os.path.basename(self.path)}, rows={self.rows}, nbytes={self.nbytes})"
+
+
+def export_frame(df: pd.DataFrame, directory: str = None) -> FrameHandle:
+    """
+    Writes `df` as an Arrow IPC file into shared memory and returns its handle.
+    Raises if Arrow can't represent the frame (e.g. mixed-type object columns).
+    """
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    path = os.path.join(directory or SHARED_DIR or tempfile.gettempdir(), f"frame_{uuid.uuid4().hex}.arrow")
+    try:
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return FrameHandle(path, os.path.getsize(path), len(df))
+
+
+def open_frame(handle: FrameHandle, unlink: bool = False, writable: bool = False) -> pd.DataFrame:
+    """
+    Memory-maps a shared frame read-only. Numeric columns without nulls stay backed by the
+    mapping rather than being copied, unless `writable=True` asks for a private copy.
+    With `unlink=True` the file is removed right away; the mapping stays valid for as long
+    as the frame references it.
+    """
+    import pyarrow as pa
+    source = pa.memory_map(handle.path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    if unlink:
+        os.remove(handle.path)
+    if writable:
+        return table.to_pandas().copy()
+    return table.to_pandas(split_blocks=True)
+
+
+def share_frames(value, directory: str = None, min_bytes: int = DEFAULT_MIN_BYTES):
+    """
+    Replaces DataFrames in `value` (itself, or inside a dict/list/tuple) with FrameHandles.
+    Frames below `min_bytes` or that Arrow can't represent are left to be pickled.
+    Returns (value, handles).
+    """
+    handles = []
+
+    def _share(v):
+        if isinstance(v, pd.DataFrame) and int(v.memory_usage(deep=False).sum()) >= min_bytes:
+            try:
+                handle = export_frame(v, directory)
+            except Exception as e:
+                print(f"[Sandbox] Pickling frame instead of sharing it: {e}")
+                return v
+            handles.append(handle)
+            return handle
+        if isinstance(v, dict):
+            return {k: _share(item) for k, item in v.items()}
+        if isinstance(v, (list, tuple)):
+            return type(v)(_share(item) for item in v)
+        return v
+
+    return _share(value), handles
+
+
+def open_frames(value, unlink: bool = False, writable: bool = False):
+    """
+    Inverse of `share_frames`: maps every FrameHandle in `value` back to a DataFrame.
+    """
+    if isinstance(value, FrameHandle):
+        return open_frame(value, unlink=unlink, writable=writable)
+    if isinstance(value, dict):
+        return {k: open_frames(item, unlink, writable) for k, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(open_frames(item, unlink, writable) for item in value)
+    return value
+
+
+def find_handles(value) -> list:
+    if isinstance(value, FrameHandle):
+        return [value]
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        return [h for item in value for h in find_handles(item)]
+    return []
+
+
+def release(handles):
+    for handle in handles:
+        if os.path.exists(handle.path):
+            os.remove(handle.path)
@@ -0,0 +1,350 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import contextlib
+import multiprocessing as mp
+from typing import List, Optional
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".modexa_cache", "jobs.db")
+
+TERMINAL_STATES = ("done", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    time_budget_s REAL,
+    status TEXT NOT NULL,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    worker_pid INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_id TEXT,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, submitted_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    event TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+class JobStore:
+    """
+    Durable queue of agent questions in a SQLite database, shared by the processes that
+    submit jobs and those that run them. Each job keeps its progress events and, once
+    finished, its result, so clients can poll, stream or fetch them later.
+
+    Args:
+        path: Database file (MODEXA_JOBS_DB overrides the default).
+        max_attempts: Times a job is started before a job whose worker keeps dying is
+            failed instead of requeued (MODEXA_JOB_MAX_ATTEMPTS, 3 by default).
+    """
+
+    def __init__(self, path: str = None, max_attempts: int = None):
+        self.path = path or os.getenv("MODEXA_JOBS_DB", DEFAULT_PATH)
+        self.max_attempts = max_attempts or int(os.getenv("MODEXA_JOB_MAX_ATTEMPTS", 3))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A connection per call, so the store can be used from any thread or process
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, question: str, priority: int = 0, time_budget_s: float = None) -> str:
+        """
+        Queues a question and returns its job ID. Higher priorities run first, then oldest first.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, question, priority, time_budget_s, status, submitted_at) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, question, priority, time_budget_s, time.time()),
+            )
+        return job_id
+
+    def claim(self, worker_pid: int) -> Optional[dict]:
+        """
+        Atomically takes the next queued job for a worker, or returns None if there is none.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' AND attempts < ? ORDER BY priority DESC, submitted_at LIMIT 1",
+                    (self.max_attempts,),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, worker_pid = ?, attempts = attempts + 1 WHERE job_id = ?",
+                        (time.time(), worker_pid, row["job_id"]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return dict(row) if row is not None else None
+
+    def add_event(self, job_id: str, event: dict):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO job_events (job_id, seq, created_at, event) "
+                "VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?), ?, ?)",
+                (job_id, job_id, time.time(), json.dumps(event, default=str)),
+            )
+
+    def events(self, job_id: str, after: int = 0) -> List[dict]:
+        """
+        Progress events of a job after sequence number `after`, each with its `seq`.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+            ).fetchall()
+        return [dict(json.loads(row["event"]), seq=row["seq"]) for row in rows]
+
+    def finish(self, job_id: str, result: dict, run_id: str = None):
+        self._close(job_id, "done", run_id=run_id, result=json.dumps(result, default=str))
+
+    def fail(self, job_id: str, error: str, run_id: str = None):
+        self._close(job_id, "failed", run_id=run_id, error=error)
+
+    def _close(self, job_id: str, status: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET status = ?, finished_at = ?, {columns} WHERE job_id = ?",
+                (status, time.time(), *fields.values(), job_id),
+            )
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a job that hasn't started yet. Returns False if it's already running or finished.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+        return cursor.rowcount > 0
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        The job's status and timings, plus its result once done (or error if it failed).
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            if job["status"] == "queued":
+                job["queue_position"] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND (priority > ? OR (priority = ? AND submitted_at < ?))",
+                    (job["priority"], job["priority"], job["submitted_at"]),
+                ).fetchone()[0]
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def recent(self, status: str = None, limit: int = 50) -> List[dict]:
+        query = "SELECT job_id, question, priority, status, submitted_at, started_at, finished_at FROM jobs"
+        params = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY submitted_at DESC LIMIT ?", (*params, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def stream(self, job_id: str, poll_s: float = 0.5):
+        """
+        Yields the job's progress events as they're recorded, until the job has finished.
+        """
+        seq = 0
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return
+            for event in self.events(job_id, after=seq):
+                seq = event["seq"]
+                yield event
+            # The status was read first, so a finished job's events have all been yielded
+            if job["status"] in TERMINAL_STATES:
+                return
+            time.sleep(poll_s)
+
+    def requeue_orphans(self) -> int:
+        """
+        Puts jobs back in the queue whose worker process died while running them, or fails
+        them once they have used up `max_attempts`, since they likely killed the worker.
+        Returns the number of orphaned jobs found.
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT job_id, worker_pid, attempts FROM jobs WHERE status = 'running'").fetchall()
+            orphans = [row for row in rows if not _pid_alive(row["worker_pid"])]
+            for row in orphans:
+                job_id = row["job_id"]
+                if row["attempts"] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', finished_at = ?, worker_pid = NULL, error = ? WHERE job_id = ? AND status = 'running'",
+                        (time.time(), f"Worker died while running the job ({row['attempts']} attempts)", job_id),
+                    )
+                    print(f"[Jobs] Failed job {job_id}, whose worker exited on each of {row['attempts']} attempts")
+                    continue
+                conn.execute("UPDATE jobs SET status = 'queued', worker_pid = NULL WHERE job_id = ? AND status = 'running'", (job_id,))
+                print(f"[Jobs] Requeued job {job_id}, whose worker exited")
+        return len(orphans)
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def run_job(store: JobStore, job: dict):
+    """
+    Runs one claimed job to completion, recording its progress events and result.
+    """
+    from agent.runner import run_agent_pipeline
+    from agent.events import StepDone
+
+    job_id = job["job_id"]
+    steps = {}
+
+    def on_progress(event):
+        if isinstance(event, StepDone):
+            steps[event.index] = {"step": event.step, "trace": event.trace, "failed": event.failed}
+        store.add_event(job_id, event.to_dict())
+
+    print(f"[Jobs] Worker {os.getpid()} running job {job_id}: {job['question']}")
+    try:
+        plan, response, report = run_agent_pipeline(job["question"], time_budget_s=job["time_budget_s"], on_progress=on_progress)
+    except Exception as e:
+        store.fail(job_id, f"{type(e).__name__}: {e}")
+        return
+    store.finish(
+        job_id,
+        {
+            "plan": plan,
+            "execution_trace": [steps[idx] for idx in sorted(steps)],
+            "final_summary": response or "",
+            "usage": report.to_dict()["totals"],
+        },
+        run_id=report.run_id,
+    )
+
+
+def _worker_main(path: str, max_attempts: int, stop, poll_s: float):
+    store = JobStore(path, max_attempts=max_attempts)
+    while not stop.is_set():
+        job = store.claim(os.getpid())
+        if job is None:
+            stop.wait(poll_s)
+            continue
+        run_job(store, job)
+
+
+class JobWorkerPool:
+    """
+    Processes that take jobs off a JobStore and run them with `run_agent_pipeline`, so
+    analyses run outside the processes serving users. The number of workers bounds how
+    many jobs run at once (MODEXA_JOB_WORKERS, default 2).
+    """
+
+    def __init__(self, store: JobStore = None, workers: int = None, poll_s: float = 1.0):
+        self.store = store or JobStore()
+        self.workers = workers or int(os.getenv("MODEXA_JOB_WORKERS", 2))
+        self.poll_s = poll_s
+        self._ctx = mp.get_context("spawn")
+        self._stop = self._ctx.Event()
+        self._processes = []
+
+    def start(self):
+        self.store.requeue_orphans()
+        for _ in range(self.workers):
+            # Not daemonic: workers start sandbox processes of their own for generated code
+            process = self._ctx.Process(target=_worker_main, args=(self.store.path, self.store.max_attempts, self._stop, self.poll_s))
+            process.start()
+            self._processes.append(process)
+        print(f"[Jobs] Started {self.workers} worker(s) on {self.store.path}")
+
+    def stop(self, timeout_s: float = None):
+        """
+        Stops the workers once their current jobs finish (or after `timeout_s`, after which
+        they're terminated and their jobs requeued).
+        """
+        self._stop.set()
+        terminated = False
+        for process in self._processes:
+            process.join(timeout_s)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+                terminated = True
+        self._processes = []
+        if terminated:
+            self.store.requeue_orphans()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+default_job_store = None
+
+
+def get_job_store() -> JobStore:
+    # Created on first use, so importing this module doesn't touch the database
+    global default_job_store
+    if default_job_store is None:
+        default_job_store = JobStore()
+    return default_job_store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Modexa background job workers.")
+    parser.add_argument("--workers", type=int, default=None, help="Jobs run at once (MODEXA_JOB_WORKERS, default 2)")
+    parser.add_argument("--db", default=None, help="Job database (MODEXA_JOBS_DB)")
+    args = parser.parse_args()
+
+    pool = JobWorkerPool(JobStore(args.db), workers=args.workers)
+    pool.start()
+    try:
+        while True:
+            time.sleep(60)
+            pool.store.requeue_orphans()
+    except KeyboardInterrupt:
+        print("[Jobs] Stopping workers after their current jobs")
+        pool.stop()
@@ -0,0 +1,143 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter
+from typing import List, Optional, Tuple
+
+# Function words only: quantifiers and content words ("most", "per", "top", years, states)
+# change what a question asks, so they stay in the key
+STOPWORDS = {
+    "a", "an", "the", "of", "to", "in", "on", "and", "is", "are", "was", "were",
+    "what", "which", "do", "does", "we", "our", "us", "me", "my", "i", "should",
+    "can", "could", "would", "there", "that", "this", "be", "it",
+}
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".modexa_cache", "plans.json")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Lowercases, strips punctuation and stopwords, so trivially different phrasings share a key.
+    """
+    tokens = re.findall(r"[a-z0-9]+", question.lower())
+    return " ".join(t for t in tokens if t not in STOPWORDS)
+
+
+def _features(normalized: str) -> Counter:
+    tokens = normalized.split()
+    return Counter(tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])])
+
+
+class PlanStore:
+    """
+    Remembers plans that ran successfully, keyed by normalized question, and finds
+    near-matches for new questions with a TF-IDF cosine similarity index.
+
+    Only an identical normalized question reuses a plan as-is; a near-match may differ in
+    a year, state or top-N, so its plan is adapted by a cheap LLM call instead.
+
+    Args:
+        path: JSON file the store persists to (MODEXA_PLAN_CACHE_PATH overrides the default).
+        adapt_threshold: Similarity at or above which a cached plan is adapted.
+    """
+
+    def __init__(self, path: str = None, adapt_threshold: float = 0.4):
+        self.path = path or os.getenv("MODEXA_PLAN_CACHE_PATH", DEFAULT_PATH)
+        self.adapt_threshold = adapt_threshold
+        self._lock = threading.Lock()
+        self.entries = {}    # normalized question -> {"question", "plan", "uses"}
+        self.stats = {"exact_hits": 0, "adapted": 0, "misses": 0,
+                      "planning_latency_s": 0.0, "saved_latency_s": 0.0}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[PlanStore] Ignoring unreadable plan cache {self.path}: {e}")
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, question: str) -> Tuple[Optional[dict], float]:
+        """
+        Returns the most similar stored entry and its similarity in [0, 1], which is 1.0
+        only for an identical normalized question.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            if key in self.entries:
+                return self.entries[key], 1.0
+            if not self.entries:
+                return None, 0.0
+
+            # IDF over the stored questions plus the query
+            docs = {k: _features(k) for k in self.entries}
+            query = _features(key)
+            n_docs = len(docs) + 1
+            df = Counter()
+            for feats in list(docs.values()) + [query]:
+                df.update(set(feats))
+            idf = {t: math.log((1 + n_docs) / (1 + df[t])) + 1 for t in df}
+
+            def vector(feats):
+                vec = {t: c * idf[t] for t, c in feats.items()}
+                norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+                return {t: v / norm for t, v in vec.items()}
+
+            query_vec = vector(query)
+            best_key, best_score = None, 0.0
+            for k, feats in docs.items():
+                doc_vec = vector(feats)
+                score = sum(v * doc_vec.get(t, 0.0) for t, v in query_vec.items())
+                if score > best_score:
+                    best_key, best_score = k, score
+            # Rounding can put a different question's score at 1.0
+            return self.entries.get(best_key), min(best_score, 0.999)
+
+    def add(self, question: str, plan: List[str], planning_latency: float = None):
+        if not plan:
+            return
+        key = normalize_question(question)
+        with self._lock:
+            entry = self.entries.setdefault(key, {"question": question, "plan": plan, "uses": 0})
+            entry["plan"] = plan
+            entry["uses"] += 1
+            if planning_latency is not None:
+                entry["planning_latency_s"] = planning_latency
+            self._save()
+
+    def record(self, outcome: str, latency: float = 0.0, entry: dict = None):
+        """
+        Records a lookup outcome ("exact_hits", "adapted" or "misses").
+        Misses contribute their planning latency. Hits add the latency they saved against
+        the matched entry's original planning latency (or the average miss).
+        """
+        with self._lock:
+            self.stats[outcome] += 1
+            if outcome == "misses":
+                self.stats["planning_latency_s"] += latency
+                return
+            avg_miss = self.stats["planning_latency_s"] / self.stats["misses"] if self.stats["misses"] else 0.0
+            baseline = (entry or {}).get("planning_latency_s", avg_miss)
+            self.stats["saved_latency_s"] += max(0.0, baseline - latency)
+
+    def report(self) -> dict:
+        with self._lock:
+            report = dict(self.stats)
+            lookups = sum(report[k] for k in ("exact_hits", "adapted", "misses"))
+            report["hit_rate"] = (lookups - report["misses"]) / lookups if lookups else 0.0
+            report["entries"] = len(self.entries)
+            return report
+
+
+default_plan_store = PlanStore()
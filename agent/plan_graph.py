@@ -0,0 +1,78 @@
+import re
+from typing import List, Optional, Set, Tuple
+
+# Trailing "(inputs: a, b | outputs: c)" annotation the planner adds to each step
+IO_PATTERN = re.compile(r"\(\s*inputs?\s*:(?P<inputs>[^|)]*)\|\s*outputs?\s*:(?P<outputs>[^)]*)\)\s*\.?\s*$", re.IGNORECASE)
+
+
+def _var_list(text: str) -> Set[str]:
+    names = {v.strip().strip("`'\"") for v in text.split(",")}
+    return {n for n in names if n and n.lower() not in ("none", "n/a", "-")}
+
+
+def parse_step_io(step: str) -> Tuple[str, Optional[Set[str]], Optional[Set[str]]]:
+    """
+    Splits a plan step into (description, inputs, outputs).
+    Inputs and outputs are None when the step carries no annotation.
+    """
+    match = IO_PATTERN.search(step)
+    if not match:
+        return step.strip(), None, None
+    description = step[:match.start()].strip()
+    return description, _var_list(match.group("inputs")), _var_list(match.group("outputs"))
+
+
+class PlanGraph:
+    """
+    Dependency graph over plan steps, built incrementally as steps arrive.
+
+    A step depends on the most recent earlier step that outputs each of its input
+    variables, and on earlier steps that read or write a variable it overwrites.
+    Steps without an annotation act as barriers: they wait for everything before them
+    and everything after them waits for them, which keeps plans from older prompts
+    (or sloppy ones) strictly sequential.
+    """
+
+    def __init__(self):
+        self.steps: List[str] = []
+        self.deps: List[Set[int]] = []
+        self._producers = {}   # variable name -> index of latest step that outputs it
+        self._readers = {}     # variable name -> indices of steps reading its latest value
+        self._barrier = None   # index of the latest unannotated step
+
+    def add(self, step: str) -> int:
+        idx = len(self.steps)
+        _, inputs, outputs = parse_step_io(step)
+
+        if inputs is None:
+            deps = set(range(idx))
+            self._barrier = idx
+        else:
+            # Inputs nobody produces (e.g. left over from an earlier turn) add no edge
+            deps = {self._producers[v] for v in inputs if v in self._producers}
+            for v in outputs:
+                # Don't overwrite a variable while an earlier step still reads or writes it
+                deps |= self._readers.get(v, set())
+                if v in self._producers:
+                    deps.add(self._producers[v])
+            if self._barrier is not None:
+                deps.add(self._barrier)
+
+            for v in inputs:
+                self._readers.setdefault(v, set()).add(idx)
+            for v in outputs:
+                self._producers[v] = idx
+                self._readers[v] = set()
+
+        self.steps.append(step)
+        self.deps.append(deps)
+        return idx
+
+    def ready(self, done: Set[int], started: Set[int]) -> List[int]:
+        """
+        Indices of steps not yet started whose dependencies have all finished, in plan order.
+        """
+        return [
+            idx for idx in range(len(self.steps))
+            if idx not in started and self.deps[idx] <= done
+        ]
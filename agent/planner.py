@@ -1,13 +1,86 @@
 from llm.wrapper import LLMWrapper
+from agent.plan_cache import PlanStore
+from agent.tracing import tracer
 from typing import List, Dict, Any
+import time
 
 class Planner:
-    def __init__(self, llm: LLMWrapper):
+    def __init__(self, llm: LLMWrapper, plan_store: PlanStore = None):
         self.llm = llm
+        self.plan_store = plan_store   # Optional cache of past successful plans
+        self.last_planning_latency = None
 
     def create_plan(self, question: str, context: str = "") -> List[str]:
         """
         Generates a plan from a business question using the LLM.
         Returns a list of natural-language steps.
         """
-        return self.llm.plan(question=question, context=context)
+        with tracer.span("plan", "plan") as span:
+            cached = self._plan_from_store(question, context)
+            if cached:
+                span.set(cached=True, steps=len(cached))
+                return cached
+
+            start = time.perf_counter()
+            plan = self.llm.plan(question=question, context=context)
+            self._record_miss(time.perf_counter() - start)
+            span.set(cached=False, steps=len(plan))
+            return plan
+
+    def stream_plan(self, question: str, context: str = ""):
+        """
+        Streams the plan from the LLM, yielding each step as soon as it is complete.
+        """
+        # Spans the whole stream, which is consumed while the first steps already run
+        span = tracer.start("plan", "plan", stream=True)
+        cached = self._plan_from_store(question, context)
+        if cached:
+            span.set(cached=True, steps=len(cached))
+            tracer.end(span)
+            yield from cached
+            return
+
+        start = time.perf_counter()
+        steps = 0
+        for step in self.llm.stream_plan(question=question, context=context):
+            steps += 1
+            yield step
+        self._record_miss(time.perf_counter() - start)
+        span.set(cached=False, steps=steps)
+        tracer.end(span)
+
+    def remember(self, question: str, plan: List[str]):
+        """
+        Stores a plan that ran successfully so similar questions can reuse it.
+        """
+        if self.plan_store is not None:
+            self.plan_store.add(question, plan, planning_latency=self.last_planning_latency)
+
+    def _plan_from_store(self, question: str, context: str = ""):
+        # Follow-ups with extra context need a fresh plan
+        if self.plan_store is None or context:
+            return None
+
+        start = time.perf_counter()
+        entry, score = self.plan_store.lookup(question)
+        if entry is None or score < self.plan_store.adapt_threshold:
+            return None
+
+        if score >= 1.0:
+            outcome = "exact_hits"
+            print(f"[PlanStore] Reusing plan for '{entry['question']}'")
+            plan = list(entry["plan"])
+        else:
+            outcome = "adapted"
+            print(f"[PlanStore] Adapting plan for '{entry['question']}' (similarity {score:.2f})")
+            plan = self.llm.adapt_plan(question, entry["question"], entry["plan"])
+            if not plan:
+                return None
+
+        self.plan_store.record(outcome, time.perf_counter() - start, entry=entry)
+        return plan
+
+    def _record_miss(self, latency: float):
+        self.last_planning_latency = latency
+        if self.plan_store is not None:
+            self.plan_store.record("misses", latency)
@@ -0,0 +1,69 @@
+import os
+import pickle
+import hashlib
+import threading
+from collections import Counter
+from agent.tracing import tracer
+from llm.telemetry import current_run_id
+
+
+class QueryCache:
+    """
+    Caches warehouse query results on disk by SQL text, so repeated runs of the same
+    questions (e.g. evals) don't re-run the same queries. Off unless a directory is given
+    or MODEXA_WAREHOUSE_CACHE_DIR is set, since live data changes.
+
+    Every query goes through `run`, which records a "sql" span (with `cached=True` on hits)
+    so a run's trace shows how many queries it made.
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or os.getenv("MODEXA_WAREHOUSE_CACHE_DIR")
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.stats = {"queries": 0, "hits": 0}
+        self.hits_by_run = Counter()
+
+    def _path(self, sql: str) -> str:
+        key = hashlib.sha256(" ".join(sql.split()).encode()).hexdigest()
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def run(self, sql: str, execute):
+        """
+        Returns the cached result of `sql`, or `execute()`'s result, caching it.
+        """
+        with tracer.span("sql", "warehouse") as span:
+            with self._lock:
+                self.stats["queries"] += 1
+            if self.directory:
+                try:
+                    with open(self._path(sql), "rb") as f:
+                        result = pickle.load(f)
+                    span.set(cached=True)
+                    with self._lock:
+                        self.stats["hits"] += 1
+                        self.hits_by_run[current_run_id()] += 1
+                    return result
+                except (OSError, pickle.UnpicklingError, EOFError):
+                    pass
+
+            span.set(cached=False)
+            result = execute()
+            if self.directory and result is not None:
+                tmp_path = self._path(sql) + f".{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self._path(sql))
+            return result
+
+    def hits_for(self, run_id: str) -> int:
+        with self._lock:
+            return self.hits_by_run[run_id]
+
+    def report(self) -> dict:
+        with self._lock:
+            return dict(self.stats, enabled=bool(self.directory))
+
+
+default_query_cache = QueryCache()
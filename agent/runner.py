@@ -1,23 +1,183 @@
+import os
+import threading
 from agent.planner import Planner
-from agent.executor import ReActPlanExecutor
+from agent.executor import ReActPlanExecutor, DEFAULT_TIME_BUDGET_S
 from agent.tools import tool_specs, tool_mapper
 from llm.wrapper import LLMWrapper
+from llm.telemetry import usage_recorder, new_run_id, RunReport
+from llm.deadline import within
+from agent.tracing import tracer
+from agent.plan_cache import default_plan_store
+from agent.checkpoint import default_checkpoint_store
+from agent.code_cache import default_code_cache
+from agent.session import default_session_manager
 
-def run_agent_pipeline(question, use_ui=True):
+def run_agent_pipeline(question, stream=False, time_budget_s=None, on_progress=None, session=None):
+    """
+    Plans and executes an answer to `question`. With `stream=True` the plan is executed
+    as it streams in and the returned response is a generator of answer chunks.
+
+    Planning, steps and the answer share `time_budget_s` (MODEXA_REQUEST_TIMEOUT_S by
+    default); when it runs out, the answer is written from the steps completed so far.
+
+    `on_progress(event)` is called with an `agent.events.ProgressEvent` for each plan step
+    received, step started, thought, action, observation, step finished and answer token;
+    front-ends render from these (see main.py and api.py).
+
+    With an `agent.session.AgentSession`, the question is a turn of that conversation: the
+    session's scratchpad and history from earlier turns are kept and offered to the planner.
+    The session must already be acquired (`default_session_manager.get(session_id, acquire=True)`,
+    which raises SessionBusy if it is still answering a previous question); it is released
+    when the turn ends.
+
+    Returns (plan, response, report), where `report` is the run's LLM usage report.
+    If the run doesn't complete, `resume_agent_pipeline(report.run_id)` picks it up again.
+    """
+    run_id = new_run_id()
+    try:
+        with usage_recorder.run(run_id), within(time_budget_s or DEFAULT_TIME_BUDGET_S), \
+                tracer.span("run_agent_pipeline", "run", question=question):
+            plan, response = _run_pipeline(question, run_id, stream=stream, on_progress=on_progress, session=session)
+    except BaseException:
+        if session is not None:
+            session.release()
+        raise
+    _report_trace(run_id)
+
+    if stream:
+        # Keep the answer's LLM call tagged with this run while it streams
+        response = usage_recorder.bind(_export_trace_after(response, run_id), run_id)
+        if session is not None:
+            response = _SessionTurnStream(response, session, question)
+    elif session is not None:
+        _end_turn(session, question)
+    return plan, response, RunReport(run_id)
+
+
+def resume_agent_pipeline(run_id, checkpoint=None, stream=False, time_budget_s=None, on_progress=None):
+    """
+    Resumes a run from its latest checkpoint (or replays from `checkpoint`), skipping
+    every step that had already completed. Returns (plan, response, report).
+    """
+    with usage_recorder.run(run_id), within(time_budget_s or DEFAULT_TIME_BUDGET_S), \
+            tracer.span("resume_agent_pipeline", "run", checkpoint=checkpoint):
+        llm, planner, executor = _build_agent(run_id, on_progress=on_progress)
+        response = executor.resume(checkpoint=checkpoint, stream=stream)
+        _finish_run(executor, planner, executor.question, run_id)
+    _report_trace(run_id)
+
+    if stream:
+        response = usage_recorder.bind(_export_trace_after(response, run_id), run_id)
+    return executor.plan, response, RunReport(run_id)
+
+
+def _build_agent(run_id, on_progress=None):
     ## Initialize agent components
     llm = LLMWrapper(tool_specs=tool_specs)
-    planner = Planner(llm)
+    planner = Planner(llm, plan_store=default_plan_store)
     executor = ReActPlanExecutor(
         tool_specs=tool_specs,
         tool_mapper=tool_mapper,
         llm=llm,
-        use_ui=use_ui,
+        checkpoints=default_checkpoint_store,
+        run_id=run_id,
+        on_progress=on_progress,
     )
+    return llm, planner, executor
+
+
+def _run_pipeline(question, run_id, stream=False, on_progress=None, session=None):
+    if session is not None:
+        llm, planner, executor = session.llm, session.planner, session.executor
+        context = session.planner_context()
+        session.begin_turn(run_id, on_progress)
+    else:
+        llm, planner, executor = _build_agent(run_id, on_progress=on_progress)
+        context = ""
 
-    ## Generate plan 
-    plan = planner.create_plan(question)
+    ## Generate plan
+    if stream:
+        plan = planner.stream_plan(question, context=context)
+    else:
+        plan = planner.create_plan(question, context=context)
 
     ## Execute plan
-    response = executor.run_plan(plan, question)
-    
-    return plan, response
+    response = executor.run_plan(plan, question, stream=stream)
+    print("Model tier usage:", llm.router.report())
+    # Follow-up plans build on the session's variables, so they aren't reusable on their own
+    _finish_run(executor, planner, question, run_id, remember=not context)
+
+    return executor.plan, response
+
+
+def _end_turn(session, question):
+    session.end_turn(question)
+    session.release()
+    default_session_manager.sweep()
+
+
+def _finish_run(executor, planner, question, run_id, remember=True):
+    if executor.succeeded():
+        if remember:
+            planner.remember(question, executor.plan)
+        # Checkpoints are only needed to retry failed runs, unless asked to keep them for replay
+        if not os.getenv("MODEXA_KEEP_CHECKPOINTS"):
+            default_checkpoint_store.delete(run_id)
+    else:
+        print(f"Run {run_id} did not complete; resume it with resume_agent_pipeline('{run_id}')")
+    print("Plan cache:", default_plan_store.report())
+    print("Code cache:", default_code_cache.report())
+
+
+def _report_trace(run_id):
+    print("Time by span:", tracer.summary(run_id))
+    for path in tracer.export(run_id):
+        print(f"Trace written to {path}")
+
+
+def _export_trace_after(response, run_id):
+    # A streamed answer's span is only recorded once the stream is consumed
+    yield from response
+    tracer.export(run_id)
+
+
+class _SessionTurnStream:
+    """
+    A session's streamed answer. The session takes its next question only once the turn
+    ends: when the stream is exhausted or closed, or when it's garbage-collected unread,
+    so an abandoned stream can't leave the session busy (and unevictable) for good.
+    """
+
+    def __init__(self, response, session, question):
+        self._response = response
+        self._session = session
+        self._question = question
+        self._ended = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._response)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self._end():
+            self._response.close()
+            _end_turn(self._session, self._question)
+
+    def __del__(self):
+        # May run on any thread, even one holding the session manager's lock, so this
+        # only frees the session and leaves eviction to the next sweep
+        if self._end():
+            self._session.end_turn(self._question)
+            self._session.release()
+
+    def _end(self) -> bool:
+        with self._lock:
+            ended, self._ended = self._ended, True
+        return not ended
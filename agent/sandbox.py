@@ -0,0 +1,262 @@
+import io
+import os
+import re
+import time
+import shutil
+import atexit
+import pickle
+import tempfile
+import threading
+import traceback
+import contextlib
+import multiprocessing as mp
+from queue import Queue, Empty
+from collections import OrderedDict
+from llm import deadline
+from agent.frame_transport import SHARED_DIR, DEFAULT_MIN_BYTES, share_frames, open_frames, find_handles, release
+
+# Modules every worker imports once at startup, so executions don't pay for them
+PRELOAD_MODULES = ["pandas", "numpy"]
+
+
+def _apply_memory_limit(memory_limit_mb):
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        print(f"[Sandbox] Memory limit not applied: {e}")
+
+
+# Code objects compiled in this process, keyed by source, so repeated code skips compilation
+_compiled = OrderedDict()
+MAX_COMPILED = 256
+
+
+def compile_cached(code: str):
+    compiled = _compiled.pop(code, None)
+    if compiled is None:
+        compiled = compile(code, "<generated>", "exec")
+    _compiled[code] = compiled
+    if len(_compiled) > MAX_COMPILED:
+        _compiled.popitem(last=False)
+    return compiled
+
+
+def execute_generated_code(code: str, params=None) -> dict:
+    """
+    Executes generated code and, if params are given, calls the first function it defines
+    (dict params are unpacked as keyword arguments). Returns result, stdout and traceback.
+    """
+    exec_env = {}
+    output_buffer = io.StringIO()
+    result, error = None, None
+
+    try:
+        with contextlib.redirect_stdout(output_buffer), contextlib.redirect_stderr(output_buffer):
+            exec(compile_cached(code), exec_env)
+
+            # If parameters are passed, find and call the first function
+            if params is not None:
+                match = re.search(r'def\s+(\w+)\s*\(', code)
+                if match:
+                    func = exec_env.get(match.group(1))
+                    if callable(func):
+                        if isinstance(params, dict):
+                            result = func(**params)
+                        else:
+                            result = func(params)
+                        print(result)
+    except Exception:
+        error = traceback.format_exc()
+
+    return {"result": result, "stdout": output_buffer.getvalue().strip(), "traceback": error}
+
+
+def _worker_main(conn, memory_limit_mb, share_dir, share_min_bytes):
+    _apply_memory_limit(memory_limit_mb)
+    for module in PRELOAD_MODULES:
+        __import__(module)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+
+        code, params = task
+        outcome = execute_generated_code(code, open_frames(params))
+        if outcome["traceback"] and "destination is read-only" in outcome["traceback"]:
+            # Shared frames are mapped read-only; code that modifies its inputs in place gets copies
+            outcome = execute_generated_code(code, open_frames(params, writable=True))
+        outcome["result"], _ = share_frames(outcome["result"], share_dir, share_min_bytes)
+        try:
+            conn.send(outcome)
+        except Exception:
+            # Results that can't be pickled come back as their repr
+            outcome["result"] = repr(outcome["result"])
+            conn.send(outcome)
+
+
+class _Worker:
+    def __init__(self, ctx, memory_limit_mb, share_dir, share_min_bytes):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child_conn, memory_limit_mb, share_dir, share_min_bytes), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+            self.process.join(timeout=1)
+            if self.process.is_alive():
+                self.process.kill()
+        self.conn.close()
+
+
+class SandboxPool:
+    """
+    Pool of warm worker processes that run generated code in isolation.
+
+    Each execution gets a wall-clock timeout, workers run under an address-space limit,
+    and are recycled after `max_tasks_per_worker` executions, a timeout or a crash.
+
+    DataFrames of at least `share_min_bytes`, in the params or as the result, cross the
+    process boundary as Arrow IPC files in shared memory rather than being pickled.
+
+    Args:
+        size: Number of worker processes.
+        timeout_s: Default wall-clock limit per execution.
+        memory_limit_mb: Address-space limit per worker (None to disable).
+        max_tasks_per_worker: Executions before a worker is replaced with a fresh one.
+        share_min_bytes: Smallest DataFrame passed through shared memory.
+    """
+
+    def __init__(self, size: int = 2, timeout_s: float = 60, memory_limit_mb: int = 4096, max_tasks_per_worker: int = 50,
+                 share_min_bytes: int = DEFAULT_MIN_BYTES):
+        methods = mp.get_all_start_methods()
+        # forkserver forks workers from a clean, preloaded server rather than from this (threaded) process
+        self._ctx = mp.get_context("forkserver" if "forkserver" in methods else "spawn")
+        if "forkserver" in methods:
+            self._ctx.set_forkserver_preload(PRELOAD_MODULES)
+        self.size = size
+        self.timeout_s = timeout_s
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.share_min_bytes = share_min_bytes
+        # Per-pool directory, so frames orphaned by a killed worker are removed on close
+        self.share_dir = tempfile.mkdtemp(prefix="modexa_sandbox_", dir=SHARED_DIR)
+        self._idle = Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"executions": 0, "timeouts": 0, "crashes": 0, "recycled": 0, "frames_shared": 0, "bytes_shared": 0}
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        return _Worker(self._ctx, self.memory_limit_mb, self.share_dir, self.share_min_bytes)
+
+    def run(self, code: str, params=None, timeout_s: float = None) -> dict:
+        """
+        Runs `code` on an idle worker. Returns a dict with `result`, `stdout`, `traceback`,
+        `duration_s` and `timed_out`. Raises DeadlineExceeded if no worker frees up before
+        the current deadline.
+        """
+        if self._closed:
+            raise RuntimeError("Sandbox pool is closed")
+        timeout_s = self.timeout_s if timeout_s is None else timeout_s
+        start = time.perf_counter()
+        try:
+            # Waits for a free worker no longer than the current deadline allows
+            worker = self._idle.get(timeout=deadline.remaining())
+        except Empty:
+            deadline.record_timeout("sandbox")
+            raise deadline.DeadlineExceeded("sandbox")
+        params, handles = share_frames(params, self.share_dir, self.share_min_bytes)
+        replace = False
+
+        try:
+            worker.conn.send((code, params))
+            if worker.conn.poll(timeout_s):
+                outcome = worker.conn.recv()
+                outcome["timed_out"] = False
+                # A large result frame comes back as a handle; map it and drop the file
+                result_handles = find_handles(outcome["result"])
+                outcome["result"] = open_frames(outcome["result"], unlink=True)
+                handles += result_handles
+            else:
+                outcome = {"result": None, "stdout": "", "timed_out": True,
+                           "traceback": f"TimeoutError: execution exceeded {timeout_s:.1f}s"}
+                self._count("timeouts")
+                replace = True
+        except (EOFError, OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+            if isinstance(e, (EOFError, OSError)):
+                worker.process.join(timeout=1)   # Let a dying worker report its exit code
+            crashed = not worker.process.is_alive()
+            outcome = {"result": None, "stdout": "", "timed_out": False,
+                       "traceback": f"Worker crashed (exit code {worker.process.exitcode})"
+                       if crashed else f"{type(e).__name__}: {e}"}
+            if crashed:
+                self._count("crashes")
+            replace = True
+        finally:
+            release(handles)
+
+        worker.tasks += 1
+        if not replace and worker.tasks >= self.max_tasks_per_worker:
+            self._count("recycled")
+            replace = True
+        if replace:
+            worker.stop(kill=True)
+            worker = self._spawn()
+        self._idle.put(worker)
+
+        with self._lock:
+            self.stats["executions"] += 1
+            self.stats["frames_shared"] += len(handles)
+            self.stats["bytes_shared"] += sum(h.nbytes for h in handles)
+        outcome["duration_s"] = time.perf_counter() - start
+        return outcome
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def close(self):
+        self._closed = True
+        while not self._idle.empty():
+            self._idle.get().stop()
+        shutil.rmtree(self.share_dir, ignore_errors=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """
+    Returns the process-wide sandbox pool, starting it on first use.
+    Sized by MODEXA_SANDBOX_WORKERS, MODEXA_SANDBOX_TIMEOUT_S and MODEXA_SANDBOX_MEMORY_MB.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(
+                size=int(os.getenv("MODEXA_SANDBOX_WORKERS", 2)),
+                timeout_s=float(os.getenv("MODEXA_SANDBOX_TIMEOUT_S", 60)),
+                memory_limit_mb=int(os.getenv("MODEXA_SANDBOX_MEMORY_MB", 4096)),
+            )
+            atexit.register(_pool.close)
+        return _pool
@@ -1,27 +1,215 @@
-import pandas as pd 
-from agent.utils import summarize_value
+import os
+import sys
+import shutil
+import pickle
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+import pandas as pd
+from agent.utils import summarize_value, describe_value, fingerprint_value
+
+# Default in-memory budget per scratchpad, overridable with MODEXA_SCRATCHPAD_BUDGET_MB
+DEFAULT_BUDGET_MB = 512
+
+
+def sizeof(value) -> int:
+    """
+    Approximate in-memory size of a scratchpad value in bytes.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class _Spilled:
+    """
+    Placeholder for a DataFrame that lives on disk instead of in memory.
+    """
+
+    def __init__(self, path: str, nbytes: int, fmt: str):
+        self.path = path
+        self.nbytes = nbytes
+        self.fmt = fmt
+
 
 class Scratchpad:
-    def __init__(self):
+    """
+    Working memory for a run's intermediate values.
+
+    Tracks the size of every value and keeps resident DataFrames within `budget_bytes`:
+    when the budget is exceeded, the least recently used DataFrames are spilled to
+    Arrow IPC files and memory-mapped back in transparently when accessed again.
+
+    Each value's summary and metadata are computed once when it is stored, and only
+    recomputed when the key is overwritten.
+    """
+
+    def __init__(self, budget_bytes: int = None, spill_dir: str = None):
         self.memory = {}
+        self.versions = {}   # key -> counter bumped on every write, to detect changed values
+        self._version = 0
+        self.sizes = {}      # key -> in-memory size in bytes
+        self.summaries = {}  # key -> summarize_value() text, cached at write time
+        self.metadata = {}   # key -> describe_value() dict, cached at write time
+        self._fingerprints = {}   # key -> (version, content fingerprint), computed on first use
+        self.budget_bytes = budget_bytes or int(os.getenv("MODEXA_SCRATCHPAD_BUDGET_MB", DEFAULT_BUDGET_MB)) * 1024 * 1024
+        self._lru = OrderedDict()   # Resident DataFrame keys, least recently used first
+        self._lock = threading.RLock()
+        self._spill_root = spill_dir
+        self._spill_dir = None
+        self._spill_files = {}      # key -> _Spilled file currently backing the key
+        self.stats = {"spills": 0, "reloads": 0, "spilled_bytes_total": 0}
 
     def __contains__(self, key):
         return key in self.memory
 
     def __getitem__(self, key):
-        return self.memory[key]
+        if key not in self.memory:
+            raise KeyError(key)
+        return self.get(key)
 
     def items(self):
-        return self.memory.items()
+        return [(k, self.get(k)) for k in list(self.memory)]
 
-    def set(self, key, value):
-        self.memory[key] = value
+    def set(self, key, value, summary: str = None, metadata: dict = None):
+        """
+        Stores `value` under `key`. A known `summary` and `metadata` (e.g. when rebinding a
+        value that's already stored under another key) skip recomputing them.
+        """
+        with self._lock:
+            self._drop_spill(key)
+            self.memory[key] = value
+            self._version += 1
+            self.versions[key] = self._version
+            self.sizes[key] = sizeof(value)
+            self.summaries[key] = summary if summary is not None else summarize_value(value)
+            self.metadata[key] = metadata if metadata is not None else describe_value(value)
+            if isinstance(value, pd.DataFrame):
+                self._lru[key] = None
+                self._lru.move_to_end(key)
+            else:
+                self._lru.pop(key, None)
+            self._enforce_budget(protect=key)
 
     def get(self, key):
-        return self.memory.get(key)
-    
+        with self._lock:
+            value = self.memory.get(key)
+            if isinstance(value, _Spilled):
+                value = self._reload(key, value)
+            if key in self._lru:
+                self._lru.move_to_end(key)
+            return value
+
+    def fingerprint(self, key) -> str:
+        """
+        Content fingerprint of the current value of `key`, computed once per version.
+        Values that can't be hashed get a fingerprint unique to this version.
+        """
+        with self._lock:
+            version = self.versions[key]
+            cached = self._fingerprints.get(key)
+            if cached and cached[0] == version:
+                return cached[1]
+            try:
+                fingerprint = fingerprint_value(self.get(key))
+            except Exception:
+                fingerprint = f"{key}@{version}"
+            self._fingerprints[key] = (version, fingerprint)
+            return fingerprint
+
+    def clear(self):
+        with self._lock:
+            for key in list(self.memory):
+                self._drop_spill(key)
+            self.memory.clear()
+            self.versions.clear()
+            self._fingerprints.clear()
+            self.sizes.clear()
+            self.summaries.clear()
+            self.metadata.clear()
+            self._lru.clear()
+
+    def summary(self, key) -> str:
+        return self.summaries.get(key)
+
     def describe(self):
-        return {
-            k: summarize_value(v)
-            for k, v in self.memory.items()
-        }
\ No newline at end of file
+        with self._lock:
+            return {k: self.summaries[k] for k in self.memory}
+
+    def resident_bytes(self) -> int:
+        return sum(size for k, size in self.sizes.items() if not isinstance(self.memory.get(k), _Spilled))
+
+    def memory_report(self) -> dict:
+        with self._lock:
+            spilled = [k for k, v in self.memory.items() if isinstance(v, _Spilled)]
+            return dict(
+                self.stats,
+                budget_bytes=self.budget_bytes,
+                resident_bytes=self.resident_bytes(),
+                spilled_bytes=sum(self.sizes[k] for k in spilled),
+                resident_vars=len(self.memory) - len(spilled),
+                spilled_vars=len(spilled),
+            )
+
+    def _enforce_budget(self, protect=None):
+        # Spill cold DataFrames until resident values fit, never the one just touched
+        while self.resident_bytes() > self.budget_bytes:
+            victim = next((k for k in self._lru if k != protect), None)
+            if victim is None:
+                break
+            self._spill(victim)
+
+    def _spill(self, key):
+        df = self.memory[key]
+        self._lru.pop(key, None)
+        self.stats["spills"] += 1
+
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="modexa_scratchpad_", dir=self._spill_root)
+            weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+
+        path = os.path.join(self._spill_dir, f"{key}_{self.versions[key]}")
+        try:
+            import pyarrow as pa
+            table = pa.Table.from_pandas(df, preserve_index=True)
+            with pa.OSFile(path + ".arrow", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            spilled = _Spilled(path + ".arrow", self.sizes[key], "arrow")
+        except Exception as e:
+            # Columns Arrow can't represent (e.g. mixed-type objects) fall back to pickle
+            print(f"[Scratchpad] Spilling '{key}' with pickle: {e}")
+            with open(path + ".pkl", "wb") as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+            spilled = _Spilled(path + ".pkl", self.sizes[key], "pickle")
+
+        self.memory[key] = spilled
+        self._spill_files[key] = spilled
+        self.stats["spilled_bytes_total"] += spilled.nbytes
+
+    def _reload(self, key, spilled: _Spilled):
+        if spilled.fmt == "arrow":
+            import pyarrow as pa
+            with pa.memory_map(spilled.path, "r") as source:
+                df = pa.ipc.open_file(source).read_all().to_pandas()
+        else:
+            with open(spilled.path, "rb") as f:
+                df = pickle.load(f)
+
+        # Reloaded frames can be mutated in place, so the file can't be reused for the next spill
+        self._drop_spill(key)
+        self.memory[key] = df
+        self.sizes[key] = sizeof(df)
+        self._lru[key] = None
+        self.stats["reloads"] += 1
+        self._enforce_budget(protect=key)
+        return df
+
+    def _drop_spill(self, key):
+        spilled = self._spill_files.pop(key, None)
+        if spilled and os.path.exists(spilled.path):
+            os.remove(spilled.path)
@@ -0,0 +1,209 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Optional
+from agent.planner import Planner
+from agent.executor import ReActPlanExecutor
+from agent.scratchpad import Scratchpad
+from agent.tools import tool_specs, tool_mapper
+from agent.plan_cache import default_plan_store
+from agent.checkpoint import default_checkpoint_store
+from llm.wrapper import LLMWrapper
+
+
+class SessionBusy(RuntimeError):
+    def __init__(self, session_id: str):
+        super().__init__(f"Session {session_id} is already answering a question")
+        self.session_id = session_id
+
+
+class AgentSession:
+    """
+    Agent state kept warm across the turns of one conversation: the LLM wrapper, planner
+    and executor, whose scratchpad, tool-call memo and (compacted) context history carry
+    over, so follow-up questions can build on earlier DataFrames and predictions.
+
+    Only one question per session runs at a time.
+    """
+
+    def __init__(self, session_id: str = None, scratchpad_budget_bytes: int = None, max_history_steps: int = 40):
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        self.llm = LLMWrapper(tool_specs=tool_specs)
+        self.planner = Planner(self.llm, plan_store=default_plan_store)
+        self.executor = ReActPlanExecutor(
+            tool_specs=tool_specs,
+            tool_mapper=tool_mapper,
+            llm=self.llm,
+            checkpoints=default_checkpoint_store,
+        )
+        self.executor.scratchpad = Scratchpad(budget_bytes=scratchpad_budget_bytes)
+        self.max_history_steps = max_history_steps   # Older steps are dropped from the context history
+        self.turns = []          # {"question", "plan", "run_id"} for each question answered
+        self.created_at = self.last_used = time.monotonic()
+        self._busy = threading.Lock()
+
+    def acquire(self) -> bool:
+        if not self._busy.acquire(blocking=False):
+            return False
+        self.last_used = time.monotonic()
+        return True
+
+    def release(self):
+        self.last_used = time.monotonic()
+        self._busy.release()
+
+    @property
+    def busy(self) -> bool:
+        return self._busy.locked()
+
+    def begin_turn(self, run_id: str, on_progress=None):
+        """
+        Readies the executor for the next question: earlier steps are reduced to digests
+        (the oldest dropped beyond `max_history_steps`) and the new run's ID and
+        progress callback are set.
+        """
+        history = self.executor.context_history
+        history.compact(0, self.executor._digest_step)
+        del history.entries[:-self.max_history_steps]
+        self.executor.run_id = run_id
+        self.executor.on_progress = on_progress
+
+    def end_turn(self, question: str):
+        self.turns.append({"question": question, "plan": list(self.executor.plan), "run_id": self.executor.run_id})
+
+    def planner_context(self) -> str:
+        """
+        What earlier turns left behind, for planning a follow-up: the previous questions
+        and the scratchpad variables that can be reused instead of fetched again.
+        """
+        if not self.turns:
+            return ""
+        lines = ["Earlier questions in this conversation:"]
+        lines.extend(f"- {turn['question']}" for turn in self.turns[-5:])
+        variables = {k: v for k, v in self.executor.scratchpad.describe().items() if not k.startswith("_")}
+        if variables:
+            lines.append(
+                "\nVariables already in the scratchpad from earlier turns. Reuse them (as step inputs) "
+                "rather than re-querying or re-predicting, and only fetch what a follow-up adds:"
+            )
+            lines.extend(f"- {name}: {summary.splitlines()[0] if summary else ''}" for name, summary in variables.items())
+        return "\n".join(lines)
+
+    def memory_bytes(self) -> int:
+        return self.executor.scratchpad.resident_bytes()
+
+    def close(self):
+        # Drops the scratchpad's values and any files it spilled to disk
+        self.executor.scratchpad.clear()
+        self.executor.context_history.clear()
+
+    def report(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "turns": len(self.turns),
+            "idle_s": time.monotonic() - self.last_used,
+            "busy": self.busy,
+            "variables": len(self.executor.scratchpad.memory),
+            "history_steps": len(self.executor.context_history.entries),
+            "memory": self.executor.scratchpad.memory_report(),
+        }
+
+
+class SessionManager:
+    """
+    Keeps AgentSessions by ID, evicting sessions idle for longer than `idle_timeout_s` and,
+    when resident scratchpad memory across sessions exceeds `memory_budget_bytes` or there
+    are more than `max_sessions`, the least recently used idle ones.
+
+    Defaults come from MODEXA_SESSION_IDLE_S, MODEXA_SESSION_MEMORY_MB, MODEXA_MAX_SESSIONS
+    and MODEXA_SESSION_SCRATCHPAD_MB (the in-memory budget of each session's scratchpad,
+    beyond which it spills to disk).
+    """
+
+    def __init__(self, idle_timeout_s: float = None, memory_budget_bytes: int = None, max_sessions: int = None,
+                 scratchpad_budget_bytes: int = None):
+        self.idle_timeout_s = idle_timeout_s or float(os.getenv("MODEXA_SESSION_IDLE_S", 1800))
+        self.memory_budget_bytes = memory_budget_bytes or int(os.getenv("MODEXA_SESSION_MEMORY_MB", 2048)) * 1024 * 1024
+        self.max_sessions = max_sessions or int(os.getenv("MODEXA_MAX_SESSIONS", 32))
+        self.scratchpad_budget_bytes = scratchpad_budget_bytes or int(os.getenv("MODEXA_SESSION_SCRATCHPAD_MB", 256)) * 1024 * 1024
+        self._sessions = OrderedDict()   # session_id -> AgentSession, least recently used first
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "reused": 0, "evicted_idle": 0, "evicted_memory": 0}
+
+    def get(self, session_id: str = None, acquire: bool = False) -> AgentSession:
+        """
+        Returns the session for `session_id`, creating it (under a new ID if none is given)
+        if it doesn't exist or has been evicted.
+
+        With `acquire=True` the session is returned busy, acquired under the manager's lock
+        so that a concurrent sweep can't evict it before the caller's turn starts; raises
+        SessionBusy if it is still answering a previous question.
+        """
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.pop(session_id, None) if session_id else None
+            if session is None:
+                session = AgentSession(session_id, scratchpad_budget_bytes=self.scratchpad_budget_bytes)
+                self.stats["created"] += 1
+            else:
+                self.stats["reused"] += 1
+            if acquire and not session.acquire():
+                self._sessions[session.session_id] = session
+                raise SessionBusy(session.session_id)
+            self._sessions[session.session_id] = session
+            session.last_used = time.monotonic()
+            self._enforce_limits(protect=session.session_id)
+            return session
+
+    def find(self, session_id: str) -> Optional[AgentSession]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close(self, session_id: str):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+
+    def sweep(self):
+        """
+        Evicts idle sessions and enforces the memory budget, e.g. after a turn has grown one.
+        """
+        with self._lock:
+            self._evict_idle()
+            self._enforce_limits()
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if not session.busy and now - session.last_used > self.idle_timeout_s:
+                self._evict(session_id, "evicted_idle")
+
+    def _enforce_limits(self, protect: str = None):
+        # Least recently used first; sessions answering a question are never evicted
+        for session_id, session in list(self._sessions.items()):
+            within_limits = (len(self._sessions) <= self.max_sessions
+                             and sum(s.memory_bytes() for s in self._sessions.values()) <= self.memory_budget_bytes)
+            if within_limits:
+                break
+            if session_id != protect and not session.busy:
+                self._evict(session_id, "evicted_memory")
+
+    def _evict(self, session_id: str, reason: str):
+        session = self._sessions.pop(session_id)
+        print(f"[Sessions] Evicting session {session_id} ({reason.split('_')[1]}, {len(session.turns)} turn(s))")
+        session.close()
+        self.stats[reason] += 1
+
+    def report(self) -> dict:
+        with self._lock:
+            return dict(
+                self.stats,
+                sessions=len(self._sessions),
+                resident_bytes=sum(s.memory_bytes() for s in self._sessions.values()),
+            )
+
+
+default_session_manager = SessionManager()
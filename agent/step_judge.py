@@ -0,0 +1,62 @@
+import re
+from typing import Optional
+from llm.prompts import dbschema_str
+
+# Column names known to the warehouse, used to spot columns a step explicitly asks for
+SCHEMA_COLUMNS = set(re.findall(r"^\s+([A-Z][A-Z0-9_]+)\b", dbschema_str, re.MULTILINE))
+
+# Tools whose non-empty output is, on its own, evidence that the step did its job
+DATA_TOOLS = {"convert_text_to_sql", "predict_clv_for_users", "predict_churn_for_users"}
+
+
+def requested_columns(step: str) -> set:
+    """
+    Returns the warehouse columns mentioned by name in a step description.
+    """
+    tokens = set(re.findall(r"[A-Za-z][A-Za-z0-9_]+", step))
+    return {t.upper() for t in tokens if t.upper() in SCHEMA_COLUMNS}
+
+
+def prejudge_step(step: str, entry: dict) -> Optional[bool]:
+    """
+    Rule-based judge for a single think/act/observe entry.
+
+    Returns True or False when the outcome is obvious from the structured tool result,
+    and None when the case is ambiguous and should be escalated to the LLM judge.
+    """
+    action = entry.get("action")
+    if not isinstance(action, dict):
+        # think_reflect / no action: only the LLM can tell whether reasoning finished the step
+        return None
+
+    if entry.get("error"):
+        return False
+
+    meta = entry.get("result_meta") or {}
+    if meta.get("is_none"):
+        return False
+
+    tool = action.get("tool")
+    if tool not in DATA_TOOLS:
+        return None
+
+    if meta.get("type") == "DataFrame":
+        if meta.get("empty"):
+            # An empty result might be the honest answer, or a bad query
+            return None
+        # Only a step that names its columns can be checked without the LLM
+        requested = requested_columns(step)
+        columns = {c.upper() for c in meta.get("columns", [])}
+        if requested and requested <= columns:
+            return True
+        return None
+
+    if meta.get("type") == "dict":
+        return None if meta.get("empty") else True
+
+    # Numeric scalars from SQL (e.g. a COUNT) are complete answers to a query; strings
+    # may be error or "no data" messages, so they go to the LLM judge
+    if meta.get("type") in ("int", "float", "Decimal", "bool"):
+        return True
+
+    return None
@@ -1,25 +1,17 @@
-import snowflake.connector
-import os
 import pandas as pd
+from llm import deadline
+from agent.tracing import add_bytes_fetched
+from agent.query_cache import default_query_cache
+from agent.warehouse import WarehouseConnection
 
-# Establish Snowflake connection
-def connect_to_snowflake():
-    return snowflake.connector.connect(
-        user=os.getenv('SNOWFLAKE_USERNAME'),
-        password=os.getenv('SNOWFLAKE_PASSWORD'),
-        account=os.getenv('SNOWFLAKE_ACCOUNT'),
-        warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
-        database=os.getenv('SNOWFLAKE_DATABASE'),
-        schema=os.getenv('SNOWFLAKE_SCHEMA'),
-    )
 
-def fetch_user_data(user_df: pd.DataFrame, conn) -> pd.DataFrame:
+def fetch_user_data(user_df: pd.DataFrame, conn: WarehouseConnection) -> pd.DataFrame:
     """
     Fetches order and review data for a list of user IDs from the database.
 
     Args:
         user_df (pd.DataFrame): A Pandas Series of CUSTOMER_UNIQUE_IDs.
-        conn: A database connection object compatible with pd.read_sql.
+        conn: An open warehouse connection (see agent.warehouse.connect).
 
     Returns:
         pd.DataFrame: Joined data from customers, orders, order_items, and order_reviews.
@@ -51,7 +43,22 @@ def fetch_user_data(user_df: pd.DataFrame, conn) -> pd.DataFrame:
     WHERE c.CUSTOMER_UNIQUE_ID IN ({formatted_ids})
     """
 
-    return pd.read_sql(query, conn)
+    query_timeout = deadline.remaining()
+    if query_timeout is not None:
+        deadline.check("sql")
+    def execute():
+        # The warehouse cancels the query if it runs past the deadline
+        df = conn.read_frame(query, timeout_s=query_timeout)
+        add_bytes_fetched(df.memory_usage(deep=True).sum())
+        return df
+
+    try:
+        return default_query_cache.run(query, execute)
+    except Exception as e:
+        if deadline.expired():
+            deadline.record_timeout("sql")
+            raise deadline.DeadlineExceeded("sql") from e
+        raise
 
 
 # Feature generation (same as training)
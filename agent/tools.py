@@ -1,39 +1,29 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-import snowflake.connector
 import pandas as pd
-from openai import OpenAI
+from llm.response_cache import make_client
 from dotenv import load_dotenv
 from llm.prompts import dbschema_str
+from llm.routing import default_router
+from llm.scheduler import estimate_tokens
+from llm import deadline
+from agent.tracing import add_bytes_fetched
 import agent.tool_utils as tool_utils
+from agent import warehouse
 import joblib
-import contextlib
-import traceback
-import io
-import re
+from agent.sandbox import get_sandbox_pool
+from agent.code_cache import default_code_cache
+from agent.query_cache import default_query_cache
+import time
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-client = OpenAI()
+# Retries are owned by the request scheduler; MODEXA_LLM_CACHE_DIR replays cached responses
+client = make_client()
 
 def convert_text_to_sql(text: str):
-    # Connect to Snowflake
-    try:
-        conn = snowflake.connector.connect(
-            user=os.getenv('SNOWFLAKE_USERNAME'),
-            password=os.getenv('SNOWFLAKE_PASSWORD'),
-            account=os.getenv('SNOWFLAKE_ACCOUNT'),
-            warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
-            database=os.getenv('SNOWFLAKE_DATABASE'),
-            schema=os.getenv('SNOWFLAKE_SCHEMA'),
-        )
-        cur = conn.cursor()
-    except Exception as e:
-        print("Failed to connect to Snowflake:", e)
-        return None
-
     # Prompt setup
     system_prompt = (
         f"You are an expert data engineer who transforms a natural language query into a SQL query for Snowflake.\n\n"
@@ -42,37 +32,62 @@ def convert_text_to_sql(text: str):
     )
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": text}
-            ]
+        sql = default_router.call(
+            "sql",
+            lambda model: client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": text}
+                ],
+                timeout=deadline.request_timeout(),
+            ),
+            parse=lambda response: response.choices[0].message.content.strip(),
+            accept=lambda sql: bool(sql),
+            est_tokens=estimate_tokens(system_prompt, text),
         )
-        sql = response.choices[0].message.content.strip()
         print("Generated SQL:\n", sql)
+    except deadline.DeadlineExceeded:
+        raise
     except Exception as e:
-        print("Failed to get response from OpenAI:", e)
-        return None
+        raise RuntimeError(f"Failed to generate SQL: {e}") from e
 
     try:
-        cur.execute(sql)
-        columns = [col[0] for col in cur.description] if cur.description else []
-        rows = cur.fetchall()
-
-        # Detect scalar or table result
-        if len(rows) == 1 and len(columns) == 1:
-            print("Scalar result:", rows[0][0])
-            return rows[0][0]
-        else:
-            df = pd.DataFrame(rows, columns=columns)
-            print("Tabular result (top rows):\n", df.head())
-            return df
+        # Connects only if the result isn't cached
+        result = default_query_cache.run(sql, lambda: _execute_sql(sql))
+    except deadline.DeadlineExceeded:
+        raise
     except Exception as e:
-        print("Failed to execute SQL:", e)
-    finally:
-        cur.close()
-        conn.close()
+        if deadline.expired():
+            deadline.record_timeout("sql")
+            raise deadline.DeadlineExceeded("sql") from e
+        # Surface the query with the error so the next attempt can correct it
+        raise RuntimeError(f"Failed to execute SQL: {e}\nSQL: {sql}") from e
+
+    if isinstance(result, pd.DataFrame):
+        print("Tabular result (top rows):\n", result.head())
+    else:
+        print("Scalar result:", result)
+    return result
+
+
+def _execute_sql(sql: str):
+    """
+    Runs `sql` on the warehouse and returns a scalar for 1x1 results, else a DataFrame.
+    """
+    query_timeout = deadline.remaining()
+    if query_timeout is not None:
+        deadline.check("sql")
+    with warehouse.connect() as conn:
+        # The warehouse cancels the query if it runs past the deadline
+        columns, rows = conn.fetch(sql, timeout_s=query_timeout)
+
+    # Detect scalar or table result
+    if len(rows) == 1 and len(columns) == 1:
+        return rows[0][0]
+    df = pd.DataFrame(rows, columns=columns)
+    add_bytes_fetched(df.memory_usage(deep=True).sum())
+    return df
 
 
 # Main prediction function
@@ -82,7 +97,7 @@ def predict_clv_for_users(user_ids: pd.DataFrame, model_path=None):
         project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
         model_path = os.path.join(project_root, "models", "future_clv_model.joblib")
 
-    conn = tool_utils.connect_to_snowflake()
+    conn = warehouse.connect()
     try:
         user_data = tool_utils.fetch_user_data(user_ids, conn)
         features = tool_utils.generate_clv_features(user_data)
@@ -108,7 +123,7 @@ def predict_churn_for_users(user_ids: pd.DataFrame, model_path=None):
         project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
         model_path = os.path.join(project_root, "models", "churn_model.joblib")
 
-    conn = tool_utils.connect_to_snowflake()
+    conn = warehouse.connect()
     try:
         user_data = tool_utils.fetch_user_data(user_ids, conn)
         features = tool_utils.generate_churn_features(user_data)
@@ -126,6 +141,14 @@ def predict_churn_for_users(user_ids: pd.DataFrame, model_path=None):
         conn.close()
 
 
+def _compiles(code: str) -> bool:
+    try:
+        compile(code, "<generated>", "exec")
+        return True
+    except SyntaxError:
+        return False
+
+
 def write_python_code(prompt: str, params = None):
     """
     Generates and executes a Python function from a text prompt. Mostly to apply ad-hoc data transformations & analysis
@@ -135,55 +158,71 @@ def write_python_code(prompt: str, params = None):
         params: (Optional) data that will act as input to the function 
     
     Returns:
-        Dict containing:
-        - 'code': str, generated Python code
-        - 'output': str, stdout from execution
-        - 'error': str, traceback if an error occurred
+        The function's return value, or the captured stdout if it returned nothing.
+        Raises RuntimeError if no code could be generated, or with the traceback if the code
+        fails, times out or crashes its worker.
     """
+    # Reuse code that already ran successfully for this prompt on inputs with the same schema
+    cached_code = default_code_cache.lookup(prompt, params)
+    if cached_code is not None:
+        print("Reusing cached code:\n", cached_code)
+        outcome = _run_generated_code(cached_code, params)
+        if not outcome["traceback"]:
+            default_code_cache.record_hit(prompt, params)
+            return _generated_code_result(outcome)
+        print("Cached code failed, generating new code")
+        default_code_cache.invalidate(prompt, params)
+
     # Step 1: Generate code using LLM
     gen_prompt = f"Write a single, complete Python function for this task:\n{prompt}\nOnly output valid code. Do NOT include markdown/code fences, explanation, or backticks."
+    start = time.perf_counter()
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "user", "content": gen_prompt},
-            ],
-            temperature=0.1,
+        code = default_router.call(
+            "code",
+            lambda model: client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "user", "content": gen_prompt},
+                ],
+                temperature=0.1,
+                timeout=deadline.request_timeout(),
+            ),
+            parse=lambda response: response.choices[0].message.content.strip(),
+            # Code that doesn't compile goes to a stronger tier
+            accept=lambda code: _compiles(code),
+            est_tokens=estimate_tokens(gen_prompt) + 500,
         )
-        code = response.choices[0].message.content.strip()
+    except deadline.DeadlineExceeded:
+        raise
     except Exception as e:
-        return None
+        raise RuntimeError(f"Failed to generate code: {e}") from e
+    generation_latency = time.perf_counter() - start
 
     print("Generated code:\n", code)
-    # Step 2: Execute code and capture output
-    exec_env = {}
-    output_buffer = io.StringIO()
+    # Step 2: Execute code in a sandbox worker process and capture output
+    outcome = _run_generated_code(code, params)
+    result = _generated_code_result(outcome)
+    # Only code that ran successfully is worth reusing
+    default_code_cache.add(prompt, params, code, generation_latency)
+    return result
 
-    try:
-        with contextlib.redirect_stdout(output_buffer), contextlib.redirect_stderr(output_buffer):
-            exec(code, exec_env)
-
-            # If parameters are passed, find and call the first function
-            if params is not None:
-                # Try to find the first defined function name
-                match = re.search(r'def\s+(\w+)\s*\(', code)
-                if match:
-                    func_name = match.group(1)
-                    func = exec_env.get(func_name)
-                    if callable(func):
-                        # If params is a dictionary, unpack as keyword args
-                        if isinstance(params, dict):
-                            result = func(**params)
-                        else:
-                            result = func(params)
-                        print(result)
-
-        print("Execution output:\n", output_buffer.getvalue().strip())
-        return output_buffer.getvalue().strip(),
-     
-
-    except Exception:
-        return None
+
+def _run_generated_code(code: str, params):
+    pool = get_sandbox_pool()
+    deadline.check("sandbox")
+    outcome = pool.run(code, params, timeout_s=deadline.remaining(pool.timeout_s))
+    print(f"Execution output ({outcome['duration_s']:.2f}s):\n", outcome["stdout"])
+    if outcome["timed_out"] and deadline.expired():
+        deadline.record_timeout("sandbox")
+        raise deadline.DeadlineExceeded("sandbox")
+    return outcome
+
+
+def _generated_code_result(outcome: dict):
+    if outcome["traceback"]:
+        # Surface the failure so the next attempt can see what went wrong
+        raise RuntimeError(outcome["traceback"].strip()[-2000:])
+    return outcome["result"] if outcome["result"] is not None else outcome["stdout"]
 
 
 tool_specs = [
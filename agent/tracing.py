@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+import tracemalloc
+import contextlib
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import List
+from llm.telemetry import current_run_id
+
+# Span that new spans started in this context are nested under
+_current_span = ContextVar("current_span", default=None)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes() -> int:
+    """
+    Current resident set size of this process (0 where it can't be read cheaply).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class Span:
+    """
+    One timed section of a run: wall and CPU time, memory and bytes fetched, plus attributes.
+    CPU time is that of the thread that ran the span.
+    """
+
+    def __init__(self, name: str, category: str, parent: "Span" = None, **attrs):
+        self.name = name
+        self.category = category
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.run_id = current_run_id()
+        self.thread_id = threading.get_ident()
+        self.attrs = attrs
+        self.bytes_fetched = 0
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self._rss_start = rss_bytes()
+        self._peak_seen = 0   # Highest traced-memory peak seen before nested spans reset it
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent._peak_seen = max(parent._peak_seen, peak)
+            self._traced_start = current
+            tracemalloc.reset_peak()
+        self.record = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add_bytes(self, nbytes: int):
+        """
+        Counts data fetched within this span (e.g. a warehouse result) towards it and its parents.
+        """
+        span = self
+        while span is not None:
+            span.bytes_fetched += int(nbytes)
+            span = span.parent
+
+    def finish(self, error: BaseException = None) -> dict:
+        record = {
+            "name": self.name,
+            "category": self.category,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "run_id": self.run_id,
+            "thread_id": self.thread_id,
+            "start_time": self.start_time,
+            "wall_s": time.perf_counter() - self._start,
+            "cpu_s": time.thread_time() - self._cpu_start,
+            "rss_bytes": rss_bytes(),
+            "bytes_fetched": self.bytes_fetched,
+            "attrs": self.attrs,
+        }
+        record["rss_delta_bytes"] = record["rss_bytes"] - self._rss_start
+        if tracemalloc.is_tracing() and hasattr(self, "_traced_start"):
+            # Process-wide, so with parallel steps this is an upper bound for the span
+            peak = max(tracemalloc.get_traced_memory()[1], self._peak_seen)
+            record["peak_alloc_bytes"] = max(0, peak - self._traced_start)
+            if self.parent is not None:
+                self.parent._peak_seen = max(self.parent._peak_seen, peak)
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        self.record = record
+        return record
+
+
+class Tracer:
+    """
+    Collects spans for agent runs, grouped by run ID, and exports them as JSONL or as a
+    Chrome trace (chrome://tracing, Perfetto or speedscope) for flame-graph viewing.
+
+    Memory is tracked as process RSS; with `trace_memory=True` (or MODEXA_TRACE_MEMORY=1)
+    tracemalloc also records each span's peak Python allocations, at some cost in speed.
+    """
+
+    def __init__(self, export_dir: str = None, trace_memory: bool = None, max_runs: int = 100):
+        self.export_dir = export_dir or os.getenv("MODEXA_TRACE_DIR")
+        if trace_memory is None:
+            trace_memory = os.getenv("MODEXA_TRACE_MEMORY") == "1"
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.max_runs = max_runs
+        self._runs = OrderedDict()   # run_id -> span records, oldest run first
+        self._lock = threading.Lock()
+
+    def start(self, name: str, category: str = "agent", **attrs) -> Span:
+        """
+        Starts a span without making it current, for work that outlives a `with` block
+        (e.g. a generator). Finish it with `end`.
+        """
+        return Span(name, category, parent=_current_span.get(), **attrs)
+
+    def end(self, span: Span, error: BaseException = None):
+        record = span.finish(error)
+        with self._lock:
+            self._runs.setdefault(record["run_id"], []).append(record)
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "agent", **attrs):
+        span = self.start(name, category, **attrs)
+        token = _current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end(span, error)
+
+    def spans(self, run_id: str) -> List[dict]:
+        with self._lock:
+            return sorted(self._runs.get(run_id, []), key=lambda r: r["start_time"])
+
+    def export_jsonl(self, path: str, run_id: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            for record in self.spans(run_id):
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def export_chrome(self, path: str, run_id: str):
+        """
+        Writes the run as complete ("X") events in the Chrome trace event format.
+        """
+        pid = os.getpid()
+        events = []
+        for record in self.spans(run_id):
+            args = dict(record["attrs"], cpu_s=round(record["cpu_s"], 6), bytes_fetched=record["bytes_fetched"],
+                        rss_bytes=record["rss_bytes"], rss_delta_bytes=record["rss_delta_bytes"])
+            if "peak_alloc_bytes" in record:
+                args["peak_alloc_bytes"] = record["peak_alloc_bytes"]
+            if "error" in record:
+                args["error"] = record["error"]
+            events.append({
+                "name": record["name"],
+                "cat": record["category"],
+                "ph": "X",
+                "ts": record["start_time"] * 1e6,
+                "dur": record["wall_s"] * 1e6,
+                "pid": pid,
+                "tid": record["thread_id"],
+                "args": args,
+            })
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+    def export(self, run_id: str, directory: str = None) -> List[str]:
+        """
+        Writes `<run_id>.spans.jsonl` and `<run_id>.trace.json` to `directory` (or the
+        tracer's export dir). Returns the paths written, none if there's nowhere to write.
+        """
+        directory = directory or self.export_dir
+        if not directory:
+            return []
+        paths = [os.path.join(directory, f"{run_id}.spans.jsonl"), os.path.join(directory, f"{run_id}.trace.json")]
+        self.export_jsonl(paths[0], run_id)
+        self.export_chrome(paths[1], run_id)
+        return paths
+
+    def summary(self, run_id: str) -> dict:
+        """
+        Wall and CPU time per span name for the run, e.g. to see which phase dominates.
+        """
+        summary = {}
+        for record in self.spans(run_id):
+            entry = summary.setdefault(record["name"], {"count": 0, "wall_s": 0.0, "cpu_s": 0.0, "bytes_fetched": 0})
+            entry["count"] += 1
+            entry["wall_s"] += record["wall_s"]
+            entry["cpu_s"] += record["cpu_s"]
+            entry["bytes_fetched"] += record["bytes_fetched"]
+        return summary
+
+
+def current_span():
+    return _current_span.get()
+
+
+def add_bytes_fetched(nbytes: int):
+    span = _current_span.get()
+    if span is not None:
+        span.add_bytes(nbytes)
+
+
+@contextlib.contextmanager
+def profiled(path: str = None, top: int = 15):
+    """
+    Profiles the block (in the current thread) with cProfile, prints the top functions by
+    cumulative time and, if `path` is given, saves the stats there for snakeviz/pstats.
+    """
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            profile.dump_stats(path)
+            print(f"[Profile] Saved to {path}")
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(top)
+
+
+tracer = Tracer()
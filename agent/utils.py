@@ -1,5 +1,10 @@
 import pandas as pd
 import ast
+import pickle
+import hashlib
+
+# Frames with more rows than this are summarized from a sample
+SUMMARY_SAMPLE_ROWS = 100_000
 
 
 def summarize_value(value, preview_items: int = 3) -> str:
@@ -32,6 +37,39 @@ def summarize_value(value, preview_items: int = 3) -> str:
 
     return f"<{type(value).__name__}>: {str(value)[:200]}"
 
+
+def describe_value(value) -> dict:
+    """
+    Returns structured metadata about a tool result, mirroring what `summarize_value`
+    renders as text. Used for rule-based checks that don't need an LLM.
+    """
+    meta = {"type": type(value).__name__, "is_none": value is None, "empty": False}
+
+    if isinstance(value, pd.DataFrame):
+        meta.update({
+            "rows": value.shape[0],
+            "cols": value.shape[1],
+            "columns": [str(c) for c in value.columns],
+            "empty": value.empty,
+        })
+    elif isinstance(value, (list, tuple, dict, str)):
+        meta.update({"length": len(value), "empty": len(value) == 0})
+
+    return meta
+
+def fingerprint_value(value) -> str:
+    """
+    Content hash of a scratchpad value: two values with the same data get the same fingerprint.
+    Raises for values that can't be hashed or pickled.
+    """
+    digest = hashlib.sha256()
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr([(str(c), str(t)) for c, t in value.dtypes.items()]).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    else:
+        digest.update(pickle.dumps(value))
+    return digest.hexdigest()[:16]
+
 def summarize_dataframe(df: pd.DataFrame, preview_rows: int = 0) -> str:
     """
     Generate a human-readable summary of a pandas DataFrame.
@@ -62,10 +100,15 @@ def summarize_dataframe(df: pd.DataFrame, preview_rows: int = 0) -> str:
         preview = df.head(preview_rows).to_markdown(index=False)
         summary += f"\nPreview:\n{preview}"
 
-    # Optional: include missing value stats
-    if df.isnull().values.any():
-        na_cols = df.columns[df.isnull().any()].tolist()
+    # Optional: include missing value stats, in one vectorized pass (sampled for very large frames)
+    sampled = len(df) > SUMMARY_SAMPLE_ROWS
+    scan = df.sample(n=SUMMARY_SAMPLE_ROWS, random_state=0) if sampled else df
+    has_na = scan.isna().any()
+    if has_na.any():
+        na_cols = [str(col) for col in has_na.index[has_na.values]]
         summary += f"\nNote: Missing values in {', '.join(na_cols)}"
+        if sampled:
+            summary += f" (based on a {SUMMARY_SAMPLE_ROWS:,}-row sample)"
 
     return summary
 
@@ -0,0 +1,106 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+import pandas as pd
+
+
+class WarehouseConnection(ABC):
+    """
+    Minimal interface the tools use to query the warehouse, so the Snowflake deployment
+    and local databases (e.g. the DuckDB Olist copy used by the benchmarks) are interchangeable.
+    """
+
+    @abstractmethod
+    def fetch(self, sql: str, timeout_s: float = None):
+        """
+        Runs `sql` and returns (column names, rows). The query is cancelled after `timeout_s`.
+        """
+
+    def read_frame(self, sql: str, timeout_s: float = None) -> pd.DataFrame:
+        columns, rows = self.fetch(sql, timeout_s)
+        return pd.DataFrame(rows, columns=columns)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SnowflakeConnection(WarehouseConnection):
+    def __init__(self):
+        import snowflake.connector
+        self.conn = snowflake.connector.connect(
+            user=os.getenv('SNOWFLAKE_USERNAME'),
+            password=os.getenv('SNOWFLAKE_PASSWORD'),
+            account=os.getenv('SNOWFLAKE_ACCOUNT'),
+            warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
+            database=os.getenv('SNOWFLAKE_DATABASE'),
+            schema=os.getenv('SNOWFLAKE_SCHEMA'),
+        )
+
+    def fetch(self, sql: str, timeout_s: float = None):
+        cur = self.conn.cursor()
+        try:
+            if timeout_s is not None:
+                # The warehouse cancels the query if it runs past the timeout
+                cur.execute(sql, timeout=max(1, int(timeout_s)))
+            else:
+                cur.execute(sql)
+            columns = [col[0] for col in cur.description] if cur.description else []
+            return columns, cur.fetchall()
+        finally:
+            cur.close()
+
+    def close(self):
+        self.conn.close()
+
+
+class DuckDBConnection(WarehouseConnection):
+    """
+    Local DuckDB database attached as the OLIST catalog, so the warehouse's fully qualified
+    names (OLIST.PUBLIC.ORDERS, ...) resolve unchanged.
+    """
+
+    def __init__(self, path: str = None):
+        import duckdb
+        self.path = path or os.getenv("MODEXA_DUCKDB_PATH")
+        if not self.path:
+            raise ValueError("Set MODEXA_DUCKDB_PATH to the DuckDB database to query")
+        self.conn = duckdb.connect()
+        self.conn.execute(f"ATTACH '{self.path}' AS OLIST (READ_ONLY)")
+
+    def fetch(self, sql: str, timeout_s: float = None):
+        # A cursor per query, since DuckDB connections aren't shared across threads
+        cur = self.conn.cursor()
+        timer = None
+        if timeout_s is not None:
+            timer = threading.Timer(max(0.0, timeout_s), cur.interrupt)
+            timer.start()
+        try:
+            cur.execute(sql)
+            columns = [col[0].upper() for col in cur.description] if cur.description else []
+            return columns, cur.fetchall()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            cur.close()
+
+    def close(self):
+        self.conn.close()
+
+
+def connect() -> WarehouseConnection:
+    """
+    Connects to the warehouse selected by MODEXA_WAREHOUSE: "snowflake" (the default) or
+    "duckdb" (the database at MODEXA_DUCKDB_PATH).
+    """
+    kind = os.getenv("MODEXA_WAREHOUSE", "snowflake").lower()
+    if kind == "duckdb":
+        return DuckDBConnection()
+    if kind == "snowflake":
+        return SnowflakeConnection()
+    raise ValueError(f"Unknown warehouse '{kind}' (expected snowflake or duckdb)")
@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from models.schemas import AgentRequest, AgentResponse, StepResult, StepTrace, JobRequest
+from agent.runner import run_agent_pipeline
+from agent.events import StepDone
+from agent.session import SessionBusy, default_session_manager
+from agent.jobs import get_job_store, TERMINAL_STATES
+from llm.scheduler import default_scheduler
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Too many requests in flight")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds the requests a server instance takes on: `workers` running plus `max_queue`
+    waiting. Anything beyond is rejected straight away so a load balancer can send it elsewhere.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self._lock = threading.Lock()
+        self.pending = 0   # Running or queued
+        self.stats = {"admitted": 0, "rejected": 0, "completed": 0, "duration_s_total": 0.0}
+
+    def try_admit(self) -> bool:
+        with self._lock:
+            if self.pending >= self.capacity:
+                self.stats["rejected"] += 1
+                return False
+            self.pending += 1
+            self.stats["admitted"] += 1
+            return True
+
+    def release(self, duration: float):
+        with self._lock:
+            self.pending -= 1
+            self.stats["completed"] += 1
+            self.stats["duration_s_total"] += duration
+
+    def retry_after(self) -> int:
+        # Roughly how long until a slot frees up, from the average request duration
+        with self._lock:
+            avg = self.stats["duration_s_total"] / self.stats["completed"] if self.stats["completed"] else 30.0
+            return max(1, int(avg * max(1, self.pending - self.workers + 1) / self.workers))
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return dict(self.stats, pending=self.pending, running=min(self.pending, self.workers),
+                        queued=max(0, self.pending - self.workers), capacity=self.capacity)
+
+
+class AgentService:
+    """
+    Runs agent pipelines on a bounded pool of worker threads, behind admission control.
+    Sized by MODEXA_API_WORKERS and MODEXA_API_MAX_QUEUE.
+    """
+
+    def __init__(self, workers: int = None, max_queue: int = None):
+        workers = workers or int(os.getenv("MODEXA_API_WORKERS", 4))
+        max_queue = max_queue if max_queue is not None else int(os.getenv("MODEXA_API_MAX_QUEUE", 16))
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agent")
+        self.admission = AdmissionController(workers, max_queue)
+
+    def submit(self, request: AgentRequest, on_event=None) -> Future:
+        """
+        Queues `request` and returns a future for its AgentResponse. With `on_event`, progress
+        events, answer tokens and a final "done" or "error" event are passed to it as dicts.
+        Raises SessionBusy if the request's session is answering another question, and
+        Overloaded if the server is at capacity.
+        """
+        # Taken here rather than on the worker, so a busy session is refused before any response starts
+        session = default_session_manager.get(request.session_id, acquire=True) if request.session_id else None
+        if not self.admission.try_admit():
+            if session is not None:
+                session.release()
+            raise Overloaded(self.admission.retry_after())
+        future = self.pool.submit(self._run, request, session, on_event)
+
+        if on_event is not None:
+            def _finished(f):
+                if f.exception() is not None:
+                    on_event({"type": "error", "error": str(f.exception())})
+                else:
+                    on_event({"type": "done", "response": f.result().model_dump()})
+            future.add_done_callback(_finished)
+        return future
+
+    def _run(self, request: AgentRequest, session=None, on_event=None) -> AgentResponse:
+        start = time.perf_counter()
+        finished_steps = {}
+
+        def on_progress(event):
+            if isinstance(event, StepDone):
+                finished_steps[event.index] = event
+            if on_event is not None:
+                on_event(_jsonable(event.to_dict()))
+
+        try:
+            plan, response, report = run_agent_pipeline(
+                request.question,
+                stream=on_event is not None,
+                time_budget_s=request.time_budget_s,
+                on_progress=on_progress,
+                session=session,
+            )
+            if on_event is not None:
+                # Answer tokens reach on_event as progress events while the stream is consumed
+                response = "".join(response)
+
+            return AgentResponse(
+                plan=plan,
+                execution_trace=[_step_result(finished_steps[idx]) for idx in sorted(finished_steps)],
+                final_summary=response or "",
+                run_id=report.run_id,
+                session_id=request.session_id,
+            )
+        finally:
+            self.admission.release(time.perf_counter() - start)
+
+
+def _step_result(event: StepDone) -> StepResult:
+    return StepResult(
+        step=event.step,
+        trace=[
+            StepTrace(
+                thought=str(t.get("thought") or ""),
+                action=t["action"] if isinstance(t.get("action"), str) else json.dumps(t.get("action"), default=str),
+                observation=str(t.get("observation") or ""),
+            )
+            for t in event.trace
+        ],
+    )
+
+
+def _jsonable(event: dict) -> dict:
+    return json.loads(json.dumps(event, default=str))
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+app = FastAPI(title="Modexa AI")
+service = AgentService()
+
+
+def _overloaded(e: Overloaded):
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+@app.post("/v1/agent", response_model=AgentResponse)
+async def answer(request: AgentRequest):
+    """
+    Answers a question and returns the plan, the full execution trace and the answer.
+    """
+    try:
+        future = service.submit(request)
+    except Overloaded as e:
+        raise _overloaded(e)
+    except SessionBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return await asyncio.wrap_future(future)
+
+
+@app.post("/v1/agent/stream")
+async def answer_stream(request: AgentRequest):
+    """
+    Answers a question as server-sent events: plan steps, step progress and answer tokens,
+    then a final "done" event carrying the AgentResponse (or an "error" event).
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    try:
+        service.submit(request, on_event=lambda event: loop.call_soon_threadsafe(queue.put_nowait, event))
+    except Overloaded as e:
+        raise _overloaded(e)
+    except SessionBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    async def events():
+        while True:
+            event = await queue.get()
+            yield _sse(event)
+            if event["type"] in ("done", "error"):
+                return
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/healthz")
+async def healthz():
+    # Reports not-ready while at capacity, so the load balancer can route around this instance
+    metrics = service.admission.metrics()
+    ready = metrics["pending"] < metrics["capacity"]
+    if not ready:
+        raise HTTPException(status_code=503, detail="At capacity")
+    return {"status": "ok", **metrics}
+
+
+@app.post("/v1/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    Queues a long-running question for the background workers (`python -m agent.jobs`)
+    and returns its job ID straight away.
+    """
+    job_id = get_job_store().submit(request.question, priority=request.priority, time_budget_s=request.time_budget_s)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/v1/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Status of a job, with its plan, execution trace and answer once done.
+    """
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+    return job
+
+
+@app.get("/v1/jobs/{job_id}/events")
+async def job_events(job_id: str, after: int = 0):
+    """
+    The job's progress as server-sent events (from sequence number `after`), then a final
+    "done", "failed" or "cancelled" event carrying the job.
+    """
+    store = get_job_store()
+    if store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+
+    async def events():
+        seq = after
+        while True:
+            job = await asyncio.to_thread(store.get, job_id)
+            for event in await asyncio.to_thread(store.events, job_id, seq):
+                seq = event["seq"]
+                yield _sse(event)
+            if job["status"] in TERMINAL_STATES:
+                yield _sse({"type": job["status"], "job": job})
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.delete("/v1/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    # Only queued jobs can be cancelled; running ones finish
+    if not get_job_store().cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} isn't queued")
+    return {"job_id": job_id, "status": "cancelled"}
+
+
+@app.delete("/v1/sessions/{session_id}")
+async def end_session(session_id: str):
+    """
+    Ends a conversation and frees the session's data; it's otherwise evicted once idle.
+    """
+    default_session_manager.close(session_id)
+    return {"session_id": session_id, "closed": True}
+
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "admission": service.admission.metrics(),
+        "llm_scheduler": default_scheduler.metrics(),
+        "sessions": default_session_manager.report(),
+        "jobs": get_job_store().stats(),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Serve the Modexa agent over HTTP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
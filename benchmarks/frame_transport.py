@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from agent.sandbox import SandboxPool
+
+# Round-trips a frame through a sandbox worker: the generated function returns its input
+ROUND_TRIP_CODE = "def identity(df):\n    return df"
+# Reads every column on the worker but returns only a scalar
+READ_CODE = "def total(df):\n    return float(df.select_dtypes('number').sum().sum())"
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "order_id": np.arange(rows, dtype=np.int64),
+        "price": rng.random(rows) * 100,
+        "freight_value": rng.random(rows) * 20,
+        "quantity": rng.integers(1, 5, rows),
+        "review_score": rng.integers(1, 6, rows).astype(np.float64),
+    })
+
+
+def time_pool(pool, code, df, repeats):
+    pool.run(code, df)   # warm up the worker
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        outcome = pool.run(code, df)
+        timings.append(time.perf_counter() - start)
+        assert outcome["traceback"] is None, outcome["traceback"]
+    return min(timings), sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare pickling vs shared-memory Arrow hand-off of DataFrames to sandbox workers.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    pools = {
+        "pickle": SandboxPool(size=1, memory_limit_mb=None, share_min_bytes=float("inf")),
+        "shared": SandboxPool(size=1, memory_limit_mb=None, share_min_bytes=0),
+    }
+    print(f"{'rows':>12} {'MB':>8} {'workload':>10} {'pickle best/avg (s)':>22} {'shared best/avg (s)':>22} {'speedup':>8}")
+    try:
+        for rows in args.rows:
+            df = make_frame(rows)
+            mb = df.memory_usage(deep=True).sum() / 1024 / 1024
+            for workload, code in [("round-trip", ROUND_TRIP_CODE), ("read", READ_CODE)]:
+                results = {name: time_pool(pool, code, df, args.repeats) for name, pool in pools.items()}
+                (p_best, p_avg), (s_best, s_avg) = results["pickle"], results["shared"]
+                print(f"{rows:>12,} {mb:>8.1f} {workload:>10} {p_best:>10.3f}/{p_avg:<11.3f} {s_best:>10.3f}/{s_avg:<11.3f} {p_best / s_best:>7.1f}x")
+    finally:
+        for pool in pools.values():
+            pool.close()
+
+
+if __name__ == "__main__":
+    main()
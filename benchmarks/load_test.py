@@ -0,0 +1,258 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import threading
+import numpy as np
+from scripted_llm import ScriptedLLM, SCENARIOS, lognormal
+from suite import offline_environment, summarize_timings, quiet
+
+# Throughput growing by less than this when users are added means the deployment is saturated
+SATURATION_GAIN = 0.1
+
+
+class ResourceSampler:
+    """
+    Samples this process's CPU use, RSS and thread count in the background.
+    """
+
+    def __init__(self, interval_s: float = 0.5):
+        self.interval_s = interval_s
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        from agent.tracing import rss_bytes
+        while not self._stop.is_set():
+            self.samples.append({"rss_bytes": rss_bytes(), "threads": threading.active_count()})
+            self._stop.wait(self.interval_s)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        wall_s = time.perf_counter() - self._start
+        self.report = {
+            "cpu_percent": 100 * (time.process_time() - self._cpu_start) / wall_s,
+            "peak_rss_mb": max(s["rss_bytes"] for s in self.samples) / 1024 / 1024,
+            "peak_threads": max(s["threads"] for s in self.samples),
+        }
+
+
+def slow_warehouse(latency_s: float, sigma: float):
+    """
+    Makes every warehouse query wait about `latency_s` first, standing in for a remote
+    warehouse's round trip on top of the local DuckDB query.
+    """
+    from agent import warehouse
+
+    class DelayedConnection(warehouse.DuckDBConnection):
+        def fetch(self, sql: str, timeout_s: float = None):
+            time.sleep(latency_s * lognormal(sigma))
+            return super().fetch(sql, timeout_s)
+
+    warehouse.connect = DelayedConnection
+
+
+def in_process_client():
+    """
+    Asks questions by calling the pipeline directly, one session per simulated user.
+    Returns (ask, end_session); ask returns None or an error description.
+    """
+    from agent.runner import run_agent_pipeline
+    from agent.session import default_session_manager
+
+    def ask(session_id: str, question: str):
+        try:
+            _, response, _ = run_agent_pipeline(question, session=default_session_manager.get(session_id, acquire=True))
+        except Exception as e:
+            return type(e).__name__
+        return None if response else "EmptyResponse"
+
+    return ask, default_session_manager.close
+
+
+def http_client(base_url: str, timeout_s: float):
+    """
+    Asks questions through the HTTP API at `base_url`, one session per simulated user.
+    """
+    import httpx
+    client = httpx.Client(base_url=base_url, timeout=timeout_s)
+
+    def ask(session_id: str, question: str):
+        try:
+            r = client.post("/v1/agent", json={"question": question, "session_id": session_id})
+        except httpx.HTTPError as e:
+            return type(e).__name__
+        return None if r.status_code == 200 else f"HTTP {r.status_code}"
+
+    def end_session(session_id: str):
+        client.delete(f"/v1/sessions/{session_id}")
+
+    return ask, end_session
+
+
+def serve_api(port: int):
+    """
+    Serves api.py from a background thread of this process. Returns the uvicorn server.
+    """
+    import uvicorn
+    from api import app
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def simulate_user(user: int, level: int, ask, questions, duration_s: float, think_time_s: float, records: list):
+    """
+    One simulated user: asks questions in a session, pausing for an exponentially distributed
+    think time between them, until `duration_s` has passed.
+    """
+    rng = np.random.default_rng(level * 1000 + user)
+    session_id = f"load-{level}-{user}"
+    stop_at = time.monotonic() + duration_s
+    # Stagger arrivals so users don't all ask at once
+    time.sleep(rng.uniform(0, think_time_s))
+    i = user
+    while time.monotonic() < stop_at:
+        question = questions[i % len(questions)]
+        i += 1
+        start = time.perf_counter()
+        error = ask(session_id, question)
+        records.append({"user": user, "latency_s": time.perf_counter() - start, "error": error})
+        time.sleep(min(rng.exponential(think_time_s), max(0.0, stop_at - time.monotonic())))
+    return session_id
+
+
+def run_level(users: int, ask, end_session, questions, duration_s: float, think_time_s: float) -> dict:
+    records = []
+    threads = [threading.Thread(target=simulate_user, args=(u, users, ask, questions, duration_s, think_time_s, records))
+               for u in range(users)]
+    with ResourceSampler() as sampler:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_s = time.perf_counter() - start
+    for user in range(users):
+        end_session(f"load-{users}-{user}")
+
+    ok = [r["latency_s"] for r in records if r["error"] is None]
+    errors = {}
+    for r in records:
+        if r["error"] is not None:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    return {
+        "users": users,
+        "requests": len(records),
+        "completed": len(ok),
+        "error_rate": (len(records) - len(ok)) / len(records) if records else 0.0,
+        "errors": errors,
+        "throughput_per_s": len(ok) / wall_s,
+        "latency": summarize_timings(ok),
+        "wall_s": wall_s,
+        "resources": sampler.report,
+    }
+
+
+def saturation_point(levels):
+    """
+    The first user count at which adding users stopped raising throughput (or caused errors).
+    """
+    for prev, level in zip(levels, levels[1:]):
+        if level["error_rate"] > 0.01 or level["throughput_per_s"] < prev["throughput_per_s"] * (1 + SATURATION_GAIN):
+            return level["users"]
+    return None
+
+
+def print_level(level: dict):
+    t, r = level["latency"], level["resources"]
+    latency = f"{t['p50_s']:>8.2f} {t['p95_s']:>8.2f} {t['p99_s']:>8.2f}" if t else f"{'-':>8} {'-':>8} {'-':>8}"
+    print(f"{level['users']:>6} {level['requests']:>8} {level['throughput_per_s']:>8.2f} {latency} "
+          f"{level['error_rate']:>7.1%} {r['cpu_percent']:>6.0f}% {r['peak_rss_mb']:>8.0f} {r['peak_threads']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the agent with concurrent simulated users and stand-in LLM and warehouse backends.")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Concurrent users at each load level")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds each level issues new questions for")
+    parser.add_argument("--think-time", type=float, default=5.0, help="Mean pause (s) between a user's questions")
+    parser.add_argument("--mode", choices=["inprocess", "http"], default="inprocess",
+                        help="Call the pipeline directly or go through the HTTP API")
+    parser.add_argument("--url", help="With --mode http, load-test this running server instead of serving api.py locally")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the locally served API")
+    parser.add_argument("--request-timeout", type=float, default=300.0)
+    parser.add_argument("--customers", type=int, default=20_000, help="Size of the synthetic Olist database")
+    parser.add_argument("--llm-latency-scale", type=float, default=0.2, help="Scale of the typical LLM latencies (see scripted_llm.py)")
+    parser.add_argument("--llm-latency-sigma", type=float, default=0.5, help="Lognormal spread of LLM latencies")
+    parser.add_argument("--sql-latency", type=float, default=0.05, help="Mean extra latency (s) per warehouse query")
+    parser.add_argument("--sql-latency-sigma", type=float, default=0.5, help="Lognormal spread of warehouse latencies")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show the agent's own output")
+    args = parser.parse_args()
+
+    server = None
+    workdir = tempfile.mkdtemp(prefix="modexa-load-")
+    try:
+        if args.url is None:
+            offline_environment(workdir, args.customers)
+            from llm.fake_openai import FakeOpenAIServer
+            llm = ScriptedLLM(latency_scale=args.llm_latency_scale, latency_sigma=args.llm_latency_sigma)
+            server = FakeOpenAIServer(reply=llm)
+            server.start()
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+            if args.sql_latency:
+                slow_warehouse(args.sql_latency, args.sql_latency_sigma)
+
+        if args.mode == "http":
+            base_url = args.url
+            if base_url is None:
+                serve_api(args.port)
+                base_url = f"http://127.0.0.1:{args.port}"
+            ask, end_session = http_client(base_url, args.request_timeout)
+        else:
+            ask, end_session = in_process_client()
+
+        questions = [scenario["question"] for scenario in SCENARIOS]
+        print(f"{'users':>6} {'requests':>8} {'req/s':>8} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8} "
+              f"{'errors':>7} {'cpu':>7} {'RSS (MB)':>8} {'threads':>8}")
+        levels = []
+        for users in args.users:
+            with quiet(not args.verbose):
+                level = run_level(users, ask, end_session, questions, args.duration, args.think_time)
+            levels.append(level)
+            print_level(level)
+    finally:
+        if server is not None:
+            server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    saturated_at = saturation_point(levels)
+    if saturated_at is not None:
+        print(f"\nThroughput stops scaling at {saturated_at} concurrent users")
+    else:
+        print(f"\nThroughput still scaling at {levels[-1]['users']} users; try higher --users")
+
+    if args.output:
+        results = {"levels": levels, "saturated_at": saturated_at,
+                   "config": dict(vars(args), timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"))}
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
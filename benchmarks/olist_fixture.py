@@ -0,0 +1,140 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import numpy as np
+import pandas as pd
+
+STATES = ["SP", "RJ", "MG", "RS", "PR", "SC", "BA", "DF", "GO", "ES"]
+CATEGORIES = ["cama_mesa_banho", "beleza_saude", "esporte_lazer", "moveis_decoracao", "informatica_acessorios",
+              "utilidades_domesticas", "relogios_presentes", "telefonia", "automotivo", "brinquedos"]
+START = pd.Timestamp("2016-10-01")
+END = pd.Timestamp("2018-10-15")
+
+
+def make_tables(customers: int = 10_000, products: int = 2_000, sellers: int = 300, seed: int = 0) -> dict:
+    """
+    Synthetic tables shaped like the Olist warehouse (same tables, columns and types),
+    with `customers` unique customers placing 1-4 orders each between late 2016 and 2018.
+    """
+    rng = np.random.default_rng(seed)
+
+    unique_ids = np.array([f"u{i:08d}" for i in range(customers)])
+    orders_per_customer = rng.choice([1, 2, 3, 4], size=customers, p=[0.6, 0.25, 0.1, 0.05])
+    n_orders = int(orders_per_customer.sum())
+    order_ids = np.array([f"o{i:09d}" for i in range(n_orders)])
+    # As in Olist, every order has its own CUSTOMER_ID pointing to the stable CUSTOMER_UNIQUE_ID
+    customer_ids = np.array([f"c{i:09d}" for i in range(n_orders)])
+    customer_states = rng.choice(STATES, size=customers)
+    owner = np.repeat(np.arange(customers), orders_per_customer)
+
+    purchase = START + pd.to_timedelta(rng.integers(0, (END - START).days, n_orders), unit="D") \
+        + pd.to_timedelta(rng.integers(0, 86_400, n_orders), unit="s")
+    estimated = purchase + pd.to_timedelta(rng.integers(10, 40, n_orders), unit="D")
+    delivered = estimated + pd.to_timedelta(rng.normal(-5, 6, n_orders).round(), unit="D")
+    undelivered = rng.random(n_orders) < 0.03
+    delivered = delivered.where(~undelivered, pd.NaT)
+
+    tables = {}
+    tables["CUSTOMERS"] = pd.DataFrame({
+        "CUSTOMER_ID": customer_ids,
+        "CUSTOMER_UNIQUE_ID": unique_ids[owner],
+        "CUSTOMER_ZIP_CODE_PREFIX": rng.integers(1000, 99999, n_orders).astype(str),
+        "CUSTOMER_CITY": "cidade",
+        "CUSTOMER_STATE": customer_states[owner],
+    })
+    tables["ORDERS"] = pd.DataFrame({
+        "ORDER_ID": order_ids,
+        "CUSTOMER_ID": customer_ids,
+        "ORDER_STATUS": np.where(undelivered, "shipped", "delivered"),
+        "ORDER_PURCHASE_TIMESTAMP": purchase,
+        "ORDER_APPROVED_AT": purchase + pd.Timedelta(hours=1),
+        "ORDER_DELIVERED_CARRIER_DATE": purchase + pd.Timedelta(days=2),
+        "ORDER_DELIVERED_CUSTOMER_DATE": delivered,
+        "ORDER_ESTIMATED_DELIVERY_DATE": estimated,
+    })
+
+    product_ids = np.array([f"p{i:07d}" for i in range(products)])
+    seller_ids = np.array([f"s{i:06d}" for i in range(sellers)])
+    items_per_order = rng.choice([1, 2, 3], size=n_orders, p=[0.85, 0.12, 0.03])
+    item_order = np.repeat(np.arange(n_orders), items_per_order)
+    n_items = len(item_order)
+    tables["ORDER_ITEMS"] = pd.DataFrame({
+        "ORDER_ID": order_ids[item_order],
+        "ORDER_ITEM_ID": np.concatenate([np.arange(1, k + 1) for k in items_per_order]),
+        "PRODUCT_ID": rng.choice(product_ids, size=n_items),
+        "SELLER_ID": rng.choice(seller_ids, size=n_items),
+        "SHIPPING_LIMIT_DATE": purchase[item_order] + pd.Timedelta(days=5),
+        "PRICE": rng.lognormal(4, 0.8, n_items).round(2),
+        "FREIGHT_VALUE": rng.gamma(2, 10, n_items).round(2),
+    })
+    tables["ORDER_PAYMENTS"] = pd.DataFrame({
+        "ORDER_ID": order_ids,
+        "PAYMENT_SEQUENTIAL": 1,
+        "PAYMENT_TYPE": rng.choice(["credit_card", "boleto", "voucher", "debit_card"], size=n_orders, p=[0.74, 0.19, 0.05, 0.02]),
+        "PAYMENT_INSTALLMENTS": rng.integers(1, 10, n_orders),
+        "PAYMENT_VALUE": tables["ORDER_ITEMS"].groupby("ORDER_ID")["PRICE"].sum().reindex(order_ids).to_numpy(),
+    })
+
+    # Most orders get a review, with lower scores for late deliveries
+    late = np.asarray(delivered > estimated)
+    reviewed = rng.random(n_orders) < 0.95
+    scores = np.clip(np.round(rng.normal(4.3, 1.0, n_orders) - 1.5 * late), 1, 5).astype(int)
+    review_created = pd.Series(delivered[reviewed]).fillna(pd.Series(estimated[reviewed]))
+    tables["ORDER_REVIEWS"] = pd.DataFrame({
+        "REVIEW_ID": [f"r{i:09d}" for i in range(int(reviewed.sum()))],
+        "ORDER_ID": order_ids[reviewed],
+        "REVIEW_SCORE": scores[reviewed],
+        "REVIEW_COMMENT_TITLE": None,
+        "REVIEW_COMMENT_MESSAGE": None,
+        "REVIEW_CREATION_DATE": review_created,
+        "REVIEW_ANSWER_TIMESTAMP": review_created + pd.Timedelta(days=1),
+    })
+    tables["PRODUCTS"] = pd.DataFrame({
+        "PRODUCT_ID": product_ids,
+        "PRODUCT_CATEGORY_NAME": rng.choice(CATEGORIES, size=products),
+        "PRODUCT_NAME_LENGHT": rng.integers(10, 60, products),
+        "PRODUCT_DESCRIPTION_LENGHT": rng.integers(50, 2000, products),
+        "PRODUCT_PHOTOS_QTY": rng.integers(1, 6, products),
+        "PRODUCT_WEIGHT_G": rng.integers(100, 20_000, products),
+        "PRODUCT_LENGTH_CM": rng.integers(10, 100, products),
+        "PRODUCT_HEIGHT_CM": rng.integers(2, 60, products),
+        "PRODUCT_WIDTH_CM": rng.integers(10, 80, products),
+    })
+    tables["SELLERS"] = pd.DataFrame({
+        "SELLER_ID": seller_ids,
+        "SELLER_ZIP_CODE_PREFIX": rng.integers(1000, 99999, sellers).astype(str),
+        "SELLER_CITY": "cidade",
+        "SELLER_STATE": rng.choice(STATES, size=sellers),
+    })
+    return tables
+
+
+def build_olist_db(path: str, customers: int = 10_000, seed: int = 0) -> str:
+    """
+    Writes the synthetic tables to a DuckDB file under schema PUBLIC, so that attached as
+    OLIST (see agent.warehouse.DuckDBConnection) they match the warehouse's table names.
+    """
+    import duckdb
+    if os.path.exists(path):
+        os.remove(path)
+    conn = duckdb.connect(path)
+    try:
+        conn.execute("CREATE SCHEMA PUBLIC")
+        for name, df in make_tables(customers=customers, seed=seed).items():
+            conn.register("frame", df)
+            conn.execute(f"CREATE TABLE PUBLIC.{name} AS SELECT * FROM frame")
+            conn.unregister("frame")
+    finally:
+        conn.close()
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a synthetic Olist database in DuckDB.")
+    parser.add_argument("path")
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    build_olist_db(args.path, customers=args.customers, seed=args.seed)
+    print(f"Wrote {args.path}")
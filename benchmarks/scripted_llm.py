@@ -0,0 +1,163 @@
+import re
+import json
+import time
+import random
+import threading
+from collections import Counter
+
+# Typical latency (s) of each kind of LLM call, scaled by ScriptedLLM's `latency_scale`
+TYPICAL_LATENCY_S = {"plan": 4.0, "route": 1.5, "sql": 1.0, "code": 2.0, "judge": 0.6, "answer": 3.0, "other": 1.0}
+
+# Dict parameters are passed to generated functions as keyword arguments
+CHURN_CODE = '''def summarize_churn(**churn_preds):
+    total = len(churn_preds)
+    churners = sum(1 for v in churn_preds.values() if int(v) == 1)
+    return {"customers": total, "predicted_churners": churners, "churn_rate": churners / total if total else 0.0}'''
+
+# Canned scenarios: each question's plan, the tool called for each step and the SQL for each text query.
+# Steps and aliases are worded as a model would write them, so most steps go to the LLM judge
+SCENARIOS = [
+    {
+        "question": "Which customers are most likely to churn?",
+        "plan": [
+            "Fetch the unique IDs of customers with at least two orders (inputs: none | outputs: repeat_customers)",
+            "Predict churn for the repeat customers (inputs: repeat_customers | outputs: churn_preds)",
+            "Summarize how many customers are predicted to churn (inputs: churn_preds | outputs: churn_summary)",
+        ],
+        "tools": [
+            ("convert_text_to_sql", {"text": "Unique IDs of customers with at least two orders", "output_var": "repeat_customers"}),
+            ("predict_churn_for_users", {"user_ids_var": "repeat_customers", "output_var": "churn_preds"}),
+            ("write_python_code", {"prompt": "Count customers and predicted churners and compute the churn rate",
+                                   "params_var": "churn_preds", "output_var": "churn_summary"}),
+        ],
+        "sql": {
+            "Unique IDs of customers with at least two orders": (
+                "SELECT c.CUSTOMER_UNIQUE_ID FROM OLIST.PUBLIC.CUSTOMERS c "
+                "JOIN OLIST.PUBLIC.ORDERS o ON c.CUSTOMER_ID = o.CUSTOMER_ID "
+                "GROUP BY c.CUSTOMER_UNIQUE_ID HAVING COUNT(DISTINCT o.ORDER_ID) >= 2 "
+                "ORDER BY c.CUSTOMER_UNIQUE_ID LIMIT 2000"
+            ),
+        },
+        "code": {"Count customers and predicted churners and compute the churn rate": CHURN_CODE},
+        "answer": "About a fifth of repeat customers are predicted to churn; target them with retention offers.",
+    },
+    {
+        "question": "What sellers cause late delivery the most?",
+        "plan": [
+            "Compute each seller's late delivery rate and order count (inputs: none | outputs: seller_late_rates)",
+            "Compute the average review score for late and on-time orders (inputs: none | outputs: late_review_scores)",
+            "Compare the sellers with the highest late rates against review impact (inputs: seller_late_rates, late_review_scores | outputs: none)",
+        ],
+        "tools": [
+            ("convert_text_to_sql", {"text": "Late delivery rate per seller", "output_var": "seller_late_rates"}),
+            ("convert_text_to_sql", {"text": "Average review score for late vs on-time orders", "output_var": "late_review_scores"}),
+            ("think_reflect", {"note": "Sellers with the highest late rates also drag review scores down."}),
+        ],
+        "sql": {
+            "Late delivery rate per seller": (
+                "SELECT oi.SELLER_ID, COUNT(DISTINCT o.ORDER_ID) AS ORDER_COUNT, "
+                "AVG(CASE WHEN o.ORDER_DELIVERED_CUSTOMER_DATE > o.ORDER_ESTIMATED_DELIVERY_DATE THEN 1 ELSE 0 END) AS LATE_RATE "
+                "FROM OLIST.PUBLIC.ORDERS o JOIN OLIST.PUBLIC.ORDER_ITEMS oi ON o.ORDER_ID = oi.ORDER_ID "
+                "GROUP BY oi.SELLER_ID ORDER BY LATE_RATE DESC"
+            ),
+            "Average review score for late vs on-time orders": (
+                "SELECT o.ORDER_DELIVERED_CUSTOMER_DATE > o.ORDER_ESTIMATED_DELIVERY_DATE AS IS_LATE, AVG(r.REVIEW_SCORE) AS AVG_REVIEW_SCORE "
+                "FROM OLIST.PUBLIC.ORDERS o JOIN OLIST.PUBLIC.ORDER_REVIEWS r ON o.ORDER_ID = r.ORDER_ID "
+                "WHERE o.ORDER_DELIVERED_CUSTOMER_DATE IS NOT NULL GROUP BY 1"
+            ),
+        },
+        "code": {},
+        "answer": "A small group of sellers accounts for most late deliveries, and late orders score about 1.5 points lower.",
+    },
+]
+
+
+class ScriptedLLM:
+    """
+    Reply function for llm.fake_openai.FakeOpenAIServer that plays the agent's LLM calls
+    from SCENARIOS: plans, tool calls per step, SQL, generated code, judgements and answers.
+
+    Args:
+        scenarios: Scenarios to serve (SCENARIOS by default).
+        latency_scale: Each call sleeps TYPICAL_LATENCY_S[kind] times this (0 measures
+            the agent's own overhead; 1 approximates real model latencies).
+        latency_sigma: Spread of the sleeps, drawn from a lognormal distribution with that
+            sigma around the typical latency (0 for fixed latencies).
+    """
+
+    def __init__(self, scenarios=None, latency_scale: float = 0.0, latency_sigma: float = 0.0):
+        self.scenarios = scenarios or SCENARIOS
+        self.latency_scale = latency_scale
+        self.latency_sigma = latency_sigma
+        self.calls = Counter()   # kind -> calls served
+        self._lock = threading.Lock()
+        self._steps = {}         # step text -> (tool, args)
+        self._sql = {}
+        self._code = {}
+        for scenario in self.scenarios:
+            self._steps.update(zip(scenario["plan"], scenario["tools"]))
+            self._sql.update(scenario["sql"])
+            self._code.update(scenario["code"])
+
+    def __call__(self, body: dict):
+        kind, reply = self._reply(body)
+        with self._lock:
+            self.calls[kind] += 1
+        if self.latency_scale:
+            time.sleep(TYPICAL_LATENCY_S[kind] * self.latency_scale * lognormal(self.latency_sigma))
+        return reply
+
+    def _reply(self, body: dict):
+        text = _prompt_text(body)
+        if body.get("tools"):
+            return "route", self._route(text)
+        if "## Final Plan" in text:
+            # Follow-ups list earlier questions under Additional Context; match the current one
+            question_text = text.split("Additional Context:")[0]
+            for scenario in self.scenarios:
+                if scenario["question"] in question_text:
+                    steps = "\n".join(f"{i + 1}. {step}" for i, step in enumerate(scenario["plan"]))
+                    return "plan", f"Breaking the question down.\n## Final Plan\n{steps}\n"
+            return "plan", "## Final Plan\n1. Reflect on the question (inputs: none | outputs: none)\n"
+        if "transforms a natural language query into a SQL query" in text:
+            query = body["messages"][-1]["content"]
+            return "sql", self._sql.get(query, "SELECT COUNT(*) FROM OLIST.PUBLIC.ORDERS")
+        if text.startswith("Write a single, complete Python function"):
+            task = text.split("\n")[1]
+            return "code", self._code.get(task, "def noop():\n    return None")
+        if "Has the step been completed successfully?" in text:
+            return "judge", "Yes, the step produced what it asked for."
+        if "completed the following steps" in text:
+            for scenario in self.scenarios:
+                if scenario["question"] in text:
+                    return "answer", scenario["answer"]
+            return "answer", "Here is what the analysis found."
+        return "other", "Done."
+
+    def _route(self, text: str) -> dict:
+        match = re.search(r"currently working on tackling this step: '(.*?)'\n", text)
+        tool, args = self._steps.get(match.group(1) if match else "", ("think_reflect", {"note": "Nothing to do."}))
+        return {"output": [{"type": "function_call", "id": "fc_1", "call_id": "call_1", "name": tool,
+                            "arguments": json.dumps(args), "status": "completed"}]}
+
+
+def lognormal(sigma: float) -> float:
+    """
+    Random multiplier with mean 1, so scaled latencies keep their typical average.
+    """
+    if not sigma:
+        return 1.0
+    return random.lognormvariate(-sigma ** 2 / 2, sigma)
+
+
+def _prompt_text(body: dict) -> str:
+    if "messages" in body:
+        return "\n".join(str(m.get("content")) for m in body["messages"])
+    parts = []
+    for message in body.get("input") or []:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(c.get("text", "") for c in content or [])
+    return "\n".join(parts)
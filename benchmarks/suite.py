@@ -0,0 +1,312 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import io
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import platform
+import resource
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from olist_fixture import build_olist_db
+from scripted_llm import ScriptedLLM, SCENARIOS
+
+MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "models"))
+
+# Stage name -> span names timed under it (see agent.tracing)
+STAGES = {"plan": ("plan",), "route": ("think",), "tool": ("act",), "judge": ("judge",),
+          "answer": ("answer",), "sql": ("sql",)}
+
+# Relative differences smaller than this many seconds are noise, whatever the tolerance
+MIN_REGRESSION_S = 0.002
+
+
+def summarize_timings(timings) -> dict:
+    timings = np.asarray(timings, dtype=float)
+    if not len(timings):
+        return {}
+    return {"count": int(len(timings)), "mean_s": float(timings.mean()), "p50_s": float(np.percentile(timings, 50)),
+            "p95_s": float(np.percentile(timings, 95)), "p99_s": float(np.percentile(timings, 99)), "min_s": float(timings.min())}
+
+
+def time_call(fn, repeats: int) -> dict:
+    fn()   # warm up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return summarize_timings(timings)
+
+
+def offline_environment(workdir: str, customers: int) -> str:
+    """
+    Builds the fixture database in `workdir` and points the agent's warehouse, caches and
+    checkpoints there. Call before importing the agent, whose modules read these on import.
+    Returns the database path.
+    """
+    db_path = os.path.join(workdir, "olist.duckdb")
+    start = time.perf_counter()
+    build_olist_db(db_path, customers=customers)
+    print(f"Built {customers:,}-customer Olist database in {time.perf_counter() - start:.1f}s")
+
+    os.environ.update({
+        "MODEXA_WAREHOUSE": "duckdb",
+        "MODEXA_DUCKDB_PATH": db_path,
+        "MODEXA_PLAN_CACHE_PATH": os.path.join(workdir, "plans.json"),
+        "MODEXA_CODE_CACHE_PATH": os.path.join(workdir, "code.json"),
+        "MODEXA_CHECKPOINT_DIR": os.path.join(workdir, "checkpoints"),
+        "MODEXA_JOBS_DB": os.path.join(workdir, "jobs.db"),
+        "OPENAI_API_KEY": "benchmark",
+    })
+    for name in ("MODEXA_LLM_CACHE_DIR", "MODEXA_WAREHOUSE_CACHE_DIR", "MODEXA_TRACE_DIR", "MODEXA_TELEMETRY_PATH"):
+        os.environ.pop(name, None)
+    return db_path
+
+
+def reset_caches():
+    """
+    Empties the in-memory plan and code caches so every run plans and generates code cold.
+    """
+    from agent.plan_cache import default_plan_store
+    from agent.code_cache import default_code_cache
+    for cache in (default_plan_store, default_code_cache):
+        with cache._lock:
+            cache.entries.clear()
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    # The agent prints its progress; keep it out of the benchmark output
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def run_question(question: str, warm: bool) -> dict:
+    from agent.runner import run_agent_pipeline
+    from agent.tracing import tracer
+
+    if not warm:
+        reset_caches()
+    start = time.perf_counter()
+    plan, response, report = run_agent_pipeline(question)
+    wall_s = time.perf_counter() - start
+    spans = tracer.spans(report.run_id)
+    root = next((s for s in spans if s["name"] == "run_agent_pipeline"), {})
+    # A step succeeded if one of its judgements passed
+    passed = {s["parent_id"] for s in spans if s["name"] == "judge" and s["attrs"].get("passed")}
+    failed_steps = sum(s["name"] == "step" and s["span_id"] not in passed for s in spans)
+    return {"question": question, "wall_s": wall_s, "steps": len(plan), "spans": spans,
+            "peak_alloc_bytes": root.get("peak_alloc_bytes"), "ok": bool(response) and not failed_steps}
+
+
+def bench_pipeline(questions, iterations: int, warm: bool, verbose: bool) -> dict:
+    """
+    Runs each question `iterations` times, one at a time, and times the run and its stages.
+    """
+    runs = []
+    with quiet(not verbose):
+        run_question(questions[0], warm)   # warm up imports and clients
+        for _ in range(iterations):
+            for question in questions:
+                runs.append(run_question(question, warm))
+
+    stage_timings = {stage: [] for stage in STAGES}
+    tool_timings = {}
+    for run in runs:
+        for span in run["spans"]:
+            for stage, names in STAGES.items():
+                if span["name"] in names:
+                    stage_timings[stage].append(span["wall_s"])
+            if span["name"].startswith("tool:"):
+                tool_timings.setdefault(span["name"], []).append(span["wall_s"])
+
+    results = {
+        "runs": len(runs),
+        "failed": sum(not run["ok"] for run in runs),
+        "e2e": summarize_timings([run["wall_s"] for run in runs]),
+        "stages": {stage: summarize_timings(t) for stage, t in stage_timings.items() if t},
+        "tools": {name: summarize_timings(t) for name, t in sorted(tool_timings.items())},
+    }
+    peaks = [run["peak_alloc_bytes"] for run in runs if run["peak_alloc_bytes"] is not None]
+    if peaks:
+        results["peak_alloc_mb"] = max(peaks) / 1024 / 1024
+    return results
+
+
+def bench_throughput(questions, runs: int, concurrency: int, warm: bool, verbose: bool) -> dict:
+    """
+    Runs `runs` questions `concurrency` at a time and reports completed questions per second.
+    """
+    batch = [questions[i % len(questions)] for i in range(runs)]
+    with quiet(not verbose), ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda q: run_question(q, warm), batch))
+        total_s = time.perf_counter() - start
+    return {"runs": runs, "concurrency": concurrency, "total_s": total_s,
+            "questions_per_s": runs / total_s, "e2e": summarize_timings([r["wall_s"] for r in results])}
+
+
+def bench_micro(db_path: str, users: int, repeats: int) -> dict:
+    """
+    Times the hot helpers the tools are built from on the fixture database.
+    """
+    import joblib
+    from agent.utils import summarize_value
+    from agent.warehouse import DuckDBConnection
+    from agent import tool_utils
+
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({"ORDER_ID": np.arange(200_000), "PRICE": rng.random(200_000) * 100,
+                          "SELLER_ID": rng.choice([f"s{i}" for i in range(300)], 200_000)})
+    mapping = {f"u{i:08d}": int(i % 2) for i in range(50_000)}
+
+    results = {
+        "summarize_value.frame": time_call(lambda: summarize_value(frame), repeats),
+        "summarize_value.dict": time_call(lambda: summarize_value(mapping), repeats),
+    }
+    with DuckDBConnection(db_path) as conn:
+        ids = conn.read_frame(f"SELECT DISTINCT CUSTOMER_UNIQUE_ID FROM OLIST.PUBLIC.CUSTOMERS ORDER BY 1 LIMIT {users}")
+        results["fetch_user_data"] = time_call(lambda: tool_utils.fetch_user_data(ids, conn), repeats)
+        user_data = tool_utils.fetch_user_data(ids, conn)
+
+    results["generate_churn_features"] = time_call(lambda: tool_utils.generate_churn_features(user_data), repeats)
+    results["generate_clv_features"] = time_call(lambda: tool_utils.generate_clv_features(user_data), repeats)
+
+    churn_model = joblib.load(os.path.join(MODELS_DIR, "churn_model.joblib"))
+    churn_X = tool_utils.generate_churn_features(user_data)[["recency", "frequency", "monetary", "avg_rating", "avg_shipping_delay"]]
+    results["predict.churn"] = time_call(lambda: churn_model.predict(churn_X), repeats)
+
+    clv_path = os.path.join(MODELS_DIR, "future_clv_model.joblib")
+    if os.path.exists(clv_path):
+        clv_model = joblib.load(clv_path)
+        clv_X = tool_utils.generate_clv_features(user_data)[["recency", "frequency", "monetary", "avg_rating"]]
+        results["predict.clv"] = time_call(lambda: clv_model.predict(clv_X), repeats)
+    else:
+        print(f"Skipping predict.clv: {clv_path} not found")
+    return results
+
+
+def flatten_metrics(results: dict) -> dict:
+    """
+    The metrics compared against a baseline: seconds (lower is better) plus throughput.
+    """
+    metrics = {"e2e.p50_s": results["pipeline"]["e2e"]["p50_s"]}
+    for stage, timings in results["pipeline"]["stages"].items():
+        metrics[f"stage.{stage}.p50_s"] = timings["p50_s"]
+    for name, timings in results["micro"].items():
+        metrics[f"micro.{name}.min_s"] = timings["min_s"]
+    if "throughput" in results:
+        metrics["throughput.questions_per_s"] = results["throughput"]["questions_per_s"]
+    return metrics
+
+
+def compare(metrics: dict, baseline: dict, tolerance: float):
+    """
+    Returns (metric, baseline, current) for every metric more than `tolerance` worse than the baseline.
+    """
+    regressions = []
+    for name, base in baseline.items():
+        current = metrics.get(name)
+        if current is None or not base:
+            continue
+        if name.endswith("_per_s"):
+            worse = current < base * (1 - tolerance)
+        else:
+            worse = current > base * (1 + tolerance) and current - base > MIN_REGRESSION_S
+        if worse:
+            regressions.append((name, base, current))
+    return regressions
+
+
+def print_results(results: dict):
+    pipeline = results["pipeline"]
+    print(f"\nPipeline: {pipeline['runs']} runs, {pipeline['failed']} failed")
+    print(f"{'stage':>28} {'calls':>6} {'p50 (ms)':>10} {'p95 (ms)':>10} {'mean (ms)':>10}")
+    rows = [("end to end", pipeline["e2e"])] + list(pipeline["stages"].items()) + list(pipeline["tools"].items())
+    for name, t in rows:
+        print(f"{name:>28} {t['count']:>6} {t['p50_s'] * 1000:>10.1f} {t['p95_s'] * 1000:>10.1f} {t['mean_s'] * 1000:>10.1f}")
+    if "throughput" in results:
+        t = results["throughput"]
+        print(f"\nThroughput: {t['questions_per_s']:.2f} questions/s ({t['runs']} runs, {t['concurrency']} at a time)")
+    print(f"\n{'microbenchmark':>28} {'min (ms)':>10} {'mean (ms)':>10}")
+    for name, t in results["micro"].items():
+        print(f"{name:>28} {t['min_s'] * 1000:>10.2f} {t['mean_s'] * 1000:>10.2f}")
+    memory = results["memory"]
+    print(f"\nPeak RSS: {memory['peak_rss_mb']:.0f} MB" +
+          (f", peak Python allocations per run: {memory['peak_alloc_mb']:.1f} MB" if "peak_alloc_mb" in memory else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agent end to end against a scripted LLM and a local Olist database.")
+    parser.add_argument("--customers", type=int, default=20_000, help="Size of the synthetic Olist database")
+    parser.add_argument("--iterations", type=int, default=3, help="Sequential runs of each scripted question")
+    parser.add_argument("--throughput-runs", type=int, default=8, help="Questions run for the throughput test (0 to skip)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions run at once for the throughput test")
+    parser.add_argument("--llm-latency-scale", type=float, default=0.0,
+                        help="Scale of the simulated LLM latencies (0 times only the agent itself)")
+    parser.add_argument("--micro-repeats", type=int, default=10)
+    parser.add_argument("--micro-users", type=int, default=2_000, help="Users fetched and featurized by the microbenchmarks")
+    parser.add_argument("--warm", action="store_true", help="Keep the plan and code caches between runs")
+    parser.add_argument("--trace-memory", action="store_true", help="Record peak Python allocations per run (slower)")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Results JSON to compare against; exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown against the baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show the agent's own output")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="modexa-bench-")
+    db_path = offline_environment(workdir, args.customers)
+    if args.trace_memory:
+        os.environ["MODEXA_TRACE_MEMORY"] = "1"
+
+    from llm.fake_openai import FakeOpenAIServer
+
+    llm = ScriptedLLM(latency_scale=args.llm_latency_scale)
+    questions = [scenario["question"] for scenario in SCENARIOS]
+    try:
+        with FakeOpenAIServer(reply=llm) as server:
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+            results = {"pipeline": bench_pipeline(questions, args.iterations, args.warm, args.verbose)}
+            if args.throughput_runs:
+                results["throughput"] = bench_throughput(questions, args.throughput_runs, args.concurrency, args.warm, args.verbose)
+        results["micro"] = bench_micro(db_path, args.micro_users, args.micro_repeats)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # ru_maxrss is in KB on Linux
+    results["memory"] = {"peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    if "peak_alloc_mb" in results["pipeline"]:
+        results["memory"]["peak_alloc_mb"] = results["pipeline"]["peak_alloc_mb"]
+    results["llm_calls"] = dict(llm.calls)
+    results["config"] = dict(vars(args), python=platform.python_version(), machine=platform.machine(),
+                             timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    results["metrics"] = flatten_metrics(results)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["metrics"]
+        regressions = compare(results["metrics"], baseline, args.tolerance)
+        for name, base, current in regressions:
+            print(f"REGRESSION {name}: {base:.4g} -> {current:.4g} ({(current - base) / base:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
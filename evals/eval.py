@@ -1,33 +1,177 @@
 import sys
 import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from agent.runner import run_agent_pipeline
-from judge import eval_plan, eval_response
+# judge.py sits next to this file, which isn't on the path when this is imported as evals.eval
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".modexa_cache", "eval")
 
-sample_questions = ['What are the top 3 products, per category?', 
+sample_questions = ['What are the top 3 products, per category?',
                     "What customers should we target for our marketing efforts?",
                     "What sellers cause late delivery the most?",
                     "Is there a significant correlation between late delivery and customer reviews?"
                     ]
 
-average_conciceness = 0
-average_effectiveness = 0
-average_feasibility = 0
-average_helpfulness = 0
-for question in sample_questions:
-    plan, response = run_agent_pipeline(question, use_ui=False)
-    plan_evals = eval_plan(question, plan)
-    response_evals = eval_response(question, response)
-    average_conciceness += plan_evals.conciceness
-    average_feasibility += plan_evals.feasibility
-    average_effectiveness += plan_evals.effectiveness
-    average_helpfulness += response_evals.helpfulness
-
-print("Average Conciceness Score: ", average_conciceness / len(sample_questions))
-print("Average Feasibility Score: ", average_feasibility / len(sample_questions))   
-print("Average Effectiveness Score: ", average_effectiveness / len(sample_questions))
-print("Average Helpfulness Score: ", average_helpfulness / len(sample_questions))   
-
-
-    
+
+def load_questions(path: str):
+    """
+    Questions from a text file (one per line, # for comments) or JSONL with a "question" field.
+    """
+    questions = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            questions.append(json.loads(line)["question"] if line.startswith("{") else line)
+    return questions
+
+
+def run_question(question: str):
+    """
+    Runs the agent on one question. Returns a row of run costs, plus the plan and
+    response for the judges.
+    """
+    # Imported here, not at the top, so the cache directories can be set before the clients exist
+    from agent.runner import run_agent_pipeline
+    from agent.tracing import tracer
+    from llm.scheduler import default_scheduler
+    from llm.response_cache import get_response_cache
+
+    start = time.perf_counter()
+    row = {"question": question}
+    try:
+        # Eval traffic yields to interactive sessions sharing the same rate limits
+        with default_scheduler.priority("eval"):
+            plan, response, report = run_agent_pipeline(question)
+    except Exception as e:
+        return dict(row, error=f"{type(e).__name__}: {e}", wall_s=time.perf_counter() - start)
+    wall_s = time.perf_counter() - start
+
+    totals = report.to_dict()["totals"]
+    sql_spans = [s for s in tracer.spans(report.run_id) if s["name"] == "sql"]
+    llm_cache = get_response_cache()
+    return dict(
+        row,
+        wall_s=wall_s,
+        llm_calls=totals["calls"],
+        llm_cached=llm_cache.hits_for(report.run_id) if llm_cache else 0,
+        tokens=totals["input_tokens"] + totals["output_tokens"],
+        cost_usd=totals["cost_usd"],
+        sql_queries=len(sql_spans),
+        sql_cached=sum(bool(s["attrs"].get("cached")) for s in sql_spans),
+        run_id=report.run_id,
+        plan=plan,
+        response=response,
+    )
+
+
+def judge_single(plan_items, response_items, parallel: int):
+    # One judge call per item and metric group, `parallel` at a time
+    from judge import eval_plan, eval_response
+    with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="judge") as judges:
+        plan_scores = judges.map(lambda item: eval_plan(*item), plan_items)
+        response_scores = judges.map(lambda item: eval_response(*item), response_items)
+        return list(plan_scores), list(response_scores)
+
+
+def judge_rows(rows, batch_size: int, parallel: int):
+    """
+    Adds plan and response scores to the answered rows, `batch_size` items per judge call
+    (1 judges each item on its own). Returns the (single-item or batched) scores.
+    """
+    from judge import eval_plans, eval_responses
+    answered = [row for row in rows if "plan" in row]
+    plan_items = [(row["question"], row["plan"]) for row in answered]
+    response_items = [(row["question"], row["response"]) for row in answered]
+    if batch_size > 1:
+        plan_scores, response_scores = eval_plans(plan_items, batch_size), eval_responses(response_items, batch_size)
+    else:
+        plan_scores, response_scores = judge_single(plan_items, response_items, parallel)
+
+    for row, plan_evals, response_evals in zip(answered, plan_scores, response_scores):
+        row.update(
+            conciceness=plan_evals.conciceness,
+            feasibility=plan_evals.feasibility,
+            effectiveness=plan_evals.effectiveness,
+            helpfulness=response_evals.helpfulness,
+        )
+    return plan_items, response_items, plan_scores, response_scores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the agent's plans and answers on a set of questions.")
+    parser.add_argument("--questions", help="Question file (.txt, one per line, or .jsonl); the built-in samples by default")
+    parser.add_argument("--parallel", type=int, default=4, help="Questions evaluated at once")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Where LLM and warehouse responses are cached between runs")
+    parser.add_argument("--no-cache", action="store_true", help="Call the LLM and the warehouse for every request")
+    parser.add_argument("--output", help="Also write the per-question results to this CSV or JSONL file")
+    parser.add_argument("--judge-batch-size", type=int, help="Items scored per judge call (MODEXA_JUDGE_BATCH_SIZE, 10 by default; 1 judges each item alone)")
+    parser.add_argument("--consistency", type=int, default=0, metavar="N",
+                        help="Also judge the first N items one at a time and compare with the batched scores")
+    parser.add_argument("--batch-file", help="Write the judge calls as an OpenAI Batch API input file instead of judging now")
+    args = parser.parse_args()
+
+    # Set before the clients are created on import
+    if not args.no_cache:
+        os.environ.setdefault("MODEXA_LLM_CACHE_DIR", os.path.join(args.cache_dir, "llm"))
+        os.environ.setdefault("MODEXA_WAREHOUSE_CACHE_DIR", os.path.join(args.cache_dir, "warehouse"))
+
+    import pandas as pd
+    from judge import judge_router, write_batch_file, check_consistency, JUDGE_BATCH_SIZE
+    from llm.scheduler import default_scheduler
+    from llm.response_cache import get_response_cache
+
+    questions = load_questions(args.questions) if args.questions else sample_questions
+    batch_size = args.judge_batch_size or JUDGE_BATCH_SIZE
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.parallel, thread_name_prefix="eval") as pool:
+        rows = list(pool.map(run_question, questions))
+    answered = [row for row in rows if "plan" in row]
+
+    if args.batch_file:
+        for i, row in enumerate(answered):
+            row["judge_item"] = i   # Index of the row's scores in the batch results
+        n_requests = write_batch_file(args.batch_file, [(r["question"], r["plan"]) for r in answered],
+                                      [(r["question"], r["response"]) for r in answered], batch_size)
+        print(f"Wrote {n_requests} judge requests for {len(answered)} answered questions to {args.batch_file}; "
+              "join its results (judge.read_batch_results) on judge_item")
+    else:
+        plan_items, response_items, plan_scores, response_scores = judge_rows(rows, batch_size, args.parallel)
+    total_s = time.perf_counter() - start
+
+    results = pd.DataFrame(rows).drop(columns=["plan", "response"], errors="ignore")
+    with pd.option_context("display.max_colwidth", 40, "display.width", 200):
+        print(results.drop(columns=["run_id"], errors="ignore").to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+
+    scored = results.dropna(subset=["helpfulness"]) if "helpfulness" in results else results.iloc[0:0]
+    print(f"\n{len(scored)}/{len(results)} questions answered in {total_s:.1f}s ({args.parallel} at a time)")
+    for metric in ("conciceness", "feasibility", "effectiveness", "helpfulness"):
+        if metric in scored:
+            print(f"Average {metric.capitalize()} Score: ", scored[metric].mean())
+    judge_calls = judge_router.report().get("judge", {}).get("calls", 0)
+    print(f"Judge calls: {judge_calls} for {len(answered)} questions ({batch_size} items per call)")
+
+    if args.consistency and not args.batch_file and batch_size > 1:
+        n = min(args.consistency, len(plan_items))
+        single_plans, single_responses = judge_single(plan_items[:n], response_items[:n], args.parallel)
+        for name, single, batched in (("Plan", single_plans, plan_scores[:n]), ("Response", single_responses, response_scores[:n])):
+            report = check_consistency(single, batched)
+            print(f"{name} scores, batched vs one at a time ({n} items): ", report["metrics"])
+            for d in report["disagreements"]:
+                print(f"  item {d['item']} {d['metric']}: {d['single']} alone vs {d['batched']} batched")
+
+    print("LLM scheduler metrics: ", default_scheduler.metrics())
+    if get_response_cache():
+        print("LLM response cache: ", get_response_cache().report())
+
+    if args.output:
+        if args.output.endswith(".jsonl"):
+            results.to_json(args.output, orient="records", lines=True)
+        else:
+            results.to_csv(args.output, index=False)
+        print(f"Results written to {args.output}")
@@ -1,12 +1,47 @@
-from openai import OpenAI
 from dotenv import load_dotenv
 import os
+import json
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel
+from openai.lib._pydantic import to_strict_json_schema
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from llm.scheduler import default_scheduler, estimate_tokens
+from llm.response_cache import make_client
+from llm.routing import ModelRouter
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-client = OpenAI()
+# Retries are owned by the request scheduler; MODEXA_LLM_CACHE_DIR replays cached responses
+client = make_client()
+
+# Judges always run on one model, but share the scheduler and usage accounting
+judge_router = ModelRouter(
+    tiers={"judge": "gpt-4o"},
+    routes={"eval_plan": "judge", "eval_response": "judge", "eval_plan_batch": "judge", "eval_response_batch": "judge"},
+    tier_order=["judge"],
+)
+
+# Items scored per batched judge call (MODEXA_JUDGE_BATCH_SIZE overrides)
+JUDGE_BATCH_SIZE = int(os.getenv("MODEXA_JUDGE_BATCH_SIZE", 10))
+
+PLAN_RUBRIC = """
+    Evaluate the plan on a scale from 1 to 5 for:
+    1. **Conciseness** – Are there unnecessary or redundant steps?
+    2. **Feasibility** – Are the tools/data/models used realistic and available?
+    3. **Effectiveness** – Will these steps retrieve the right information to answer the question?
+
+    Include a brief rationale for each score
+"""
+
+RESPONSE_RUBRIC = """
+    Evaluate the plan on a scale from 1 to 5 for:
+    1. **Helpfulness** – Does the response directly and completely answer the user's question?
+
+    Include a brief rationale for the score
+"""
 
 
 class PlanScore(BaseModel):
@@ -19,6 +54,23 @@ class ResponseScore(BaseModel):
     helpfulness: int
     rationale: str
 
+# Batched judging scores several items in one call; `index` ties each score to its item
+class IndexedPlanScore(PlanScore):
+    index: int
+
+class PlanScoreBatch(BaseModel):
+    scores: List[IndexedPlanScore]
+
+class IndexedResponseScore(ResponseScore):
+    index: int
+
+class ResponseScoreBatch(BaseModel):
+    scores: List[IndexedResponseScore]
+
+
+def _format_plan(plan):
+    return chr(10).join(f"{i+1}. {step}" for i, step in enumerate(plan))
+
 
 def eval_plan(question, plan):
     prompt = f"""
@@ -28,27 +80,25 @@ def eval_plan(question, plan):
     {question}
 
     **Plan Steps:**
-    {chr(10).join(f"{i+1}. {step}" for i, step in enumerate(plan))}
-
-    Evaluate the plan on a scale from 1 to 5 for:
-    1. **Conciseness** – Are there unnecessary or redundant steps?
-    2. **Feasibility** – Are the tools/data/models used realistic and available?
-    3. **Effectiveness** – Will these steps retrieve the right information to answer the question?
-
-    Include a brief rationale for each score
-
+    {_format_plan(plan)}
+    {PLAN_RUBRIC}
     """
-    response = client.responses.parse(
-        model="gpt-4o",
-        input=[
-            {
-                "role": "user",
-                "content": prompt,
-            },
-        ],
-        text_format=PlanScore,
-    )
-    evals = response.output_parsed
+    with default_scheduler.priority("eval"):
+        evals = judge_router.call(
+            "eval_plan",
+            lambda model: client.responses.parse(
+                model=model,
+                input=[
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    },
+                ],
+                text_format=PlanScore,
+            ),
+            parse=lambda response: response.output_parsed,
+            est_tokens=estimate_tokens(prompt),
+        )
     return evals
 
 
@@ -61,22 +111,198 @@ def eval_response(question, response):
 
     **Response:**
     {response}
+    {RESPONSE_RUBRIC}"""
+    with default_scheduler.priority("eval"):
+        evals = judge_router.call(
+            "eval_response",
+            lambda model: client.responses.parse(
+                model=model,
+                input=[
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    },
+                ],
+                text_format=ResponseScore,
+            ),
+            parse=lambda response: response.output_parsed,
+            est_tokens=estimate_tokens(prompt),
+        )
+    return evals
 
-    Evaluate the plan on a scale from 1 to 5 for:
-    1. **Helpfulness** – Does the response directly and completely answer the user's question?
 
-    Include a brief rationale for the score
+
+def _plan_batch_prompt(items, start=0):
+    blocks = "".join(
+        f"""
+    ### Item {start + i}
+    **Question:**
+    {question}
+
+    **Plan Steps:**
+    {_format_plan(plan)}
     """
-    response = client.responses.parse(
-        model="gpt-4o",
-        input=[
-            {
-                "role": "user",
-                "content": prompt,
-            },
-        ],
-        text_format=ResponseScore,
+        for i, (question, plan) in enumerate(items)
     )
-    evals = response.output_parsed
-    return evals
+    return f"""
+    You are a critical-thinking research assistant evaluating proposed plans to answer data questions.
+    Judge each item on its own, as if it were the only one.
+    {blocks}
+    For each item:{PLAN_RUBRIC}
+    Return one score per item, with the item's number as its index.
+    """
+
+
+def _response_batch_prompt(items, start=0):
+    blocks = "".join(
+        f"""
+    ### Item {start + i}
+    **Question:**
+    {question}
+
+    **Response:**
+    {response}
+    """
+        for i, (question, response) in enumerate(items)
+    )
+    return f"""
+    You are a critical-thinking research assistant evaluating an AI agent's responses to data questions.
+    Judge each item on its own, as if it were the only one.
+    {blocks}
+    For each item:{RESPONSE_RUBRIC}
+    Return one score per item, with the item's number as its index.
+    """
+
+
+def _chunks(items, batch_size):
+    return [(start, items[start:start + batch_size]) for start in range(0, len(items), batch_size)]
+
+
+def _judge_in_batches(items, batch_size, call_type, build_prompt, batch_format, score_type, judge_one):
+    """
+    Scores `items` `batch_size` at a time, one structured call per batch (batches run side by
+    side). Items a batch reply leaves out, or all of them if it can't be parsed, are judged
+    on their own.
+    """
+    def judge_chunk(chunk):
+        start, batch = chunk
+        prompt = build_prompt(batch, start)
+        with default_scheduler.priority("eval"):
+            parsed = judge_router.call(
+                call_type,
+                lambda model: client.responses.parse(
+                    model=model,
+                    input=[{"role": "user", "content": prompt}],
+                    text_format=batch_format,
+                ),
+                parse=lambda response: response.output_parsed,
+                # A refusal or truncated reply has no parsed scores; try a stronger tier
+                accept=lambda parsed: parsed is not None,
+                est_tokens=estimate_tokens(prompt) + 150 * len(batch),
+            )
+        if parsed is None:
+            print(f"[Judge] Batch reply for items {start}-{start + len(batch) - 1} could not be parsed; judging them alone")
+            return [judge_one(*item) for item in batch]
+        by_index = {s.index: score_type(**s.model_dump(exclude={"index"})) for s in parsed.scores}
+        scores = []
+        for i, item in enumerate(batch):
+            if start + i not in by_index:
+                print(f"[Judge] Batch reply missed item {start + i}; judging it alone")
+            scores.append(by_index.get(start + i) or judge_one(*item))
+        return scores
+
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix="judge") as pool:
+        return [score for chunk in pool.map(judge_chunk, _chunks(items, batch_size)) for score in chunk]
 
+
+def eval_plans(items, batch_size: int = None) -> List[PlanScore]:
+    """
+    Scores many (question, plan) items with one judge call per `batch_size` of them
+    (JUDGE_BATCH_SIZE by default). Scores are returned in item order.
+    """
+    return _judge_in_batches(items, batch_size or JUDGE_BATCH_SIZE, "eval_plan_batch", _plan_batch_prompt,
+                             PlanScoreBatch, PlanScore, eval_plan)
+
+
+def eval_responses(items, batch_size: int = None) -> List[ResponseScore]:
+    """
+    Scores many (question, response) items with one judge call per `batch_size` of them.
+    """
+    return _judge_in_batches(items, batch_size or JUDGE_BATCH_SIZE, "eval_response_batch", _response_batch_prompt,
+                             ResponseScoreBatch, ResponseScore, eval_response)
+
+
+def write_batch_file(path, plan_items=(), response_items=(), batch_size: int = None, model: str = "gpt-4o") -> int:
+    """
+    Writes the batched judge calls as an OpenAI Batch API input file (JSONL, one /v1/responses
+    request per batch), for scoring large eval sets offline at batch pricing. Each request's
+    custom_id is "plan-<first item>" or "response-<first item>". Returns the number of requests.
+    """
+    batch_size = batch_size or JUDGE_BATCH_SIZE
+    requests = []
+    for kind, items, build_prompt, batch_format in (("plan", list(plan_items), _plan_batch_prompt, PlanScoreBatch),
+                                                    ("response", list(response_items), _response_batch_prompt, ResponseScoreBatch)):
+        # The same strict JSON schema responses.parse sends for structured outputs
+        text_format = {"format": {"type": "json_schema", "name": batch_format.__name__,
+                                  "schema": to_strict_json_schema(batch_format), "strict": True}}
+        for start, batch in _chunks(items, batch_size):
+            requests.append({
+                "custom_id": f"{kind}-{start}",
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": {"model": model, "input": [{"role": "user", "content": build_prompt(batch, start)}], "text": text_format},
+            })
+    with open(path, "w") as f:
+        for request in requests:
+            f.write(json.dumps(request) + "\n")
+    return len(requests)
+
+
+def read_batch_results(path):
+    """
+    Reads a Batch API output file for requests from `write_batch_file`.
+    Returns ({item index: PlanScore}, {item index: ResponseScore}); failed requests are skipped.
+    """
+    plans, responses = {}, {}
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if response.get("status_code") != 200:
+                print(f"[Judge] Batch request {result.get('custom_id')} failed: {result.get('error') or response.get('status_code')}")
+                continue
+            text = "".join(
+                content.get("text", "")
+                for item in response["body"].get("output", []) if item.get("type") == "message"
+                for content in item.get("content", [])
+            )
+            if result["custom_id"].startswith("plan-"):
+                for s in PlanScoreBatch.model_validate_json(text).scores:
+                    plans[s.index] = PlanScore(**s.model_dump(exclude={"index"}))
+            else:
+                for s in ResponseScoreBatch.model_validate_json(text).scores:
+                    responses[s.index] = ResponseScore(**s.model_dump(exclude={"index"}))
+    return plans, responses
+
+
+def check_consistency(single, batched, tolerance: int = 1) -> dict:
+    """
+    Compares batched scores with single-item scores for the same items: per metric, the mean
+    absolute difference and the share of items within `tolerance` points, plus the items
+    that differ by more.
+    """
+    metrics = [name for name in type(single[0]).model_fields if name != "rationale"] if single else []
+    report = {"items": len(single), "metrics": {}, "disagreements": []}
+    for metric in metrics:
+        diffs = [abs(getattr(b, metric) - getattr(s, metric)) for s, b in zip(single, batched)]
+        report["metrics"][metric] = {
+            "mean_abs_diff": sum(diffs) / len(diffs),
+            "agreement": sum(d <= tolerance for d in diffs) / len(diffs),
+        }
+        report["disagreements"].extend(
+            {"item": i, "metric": metric, "single": getattr(s, metric), "batched": getattr(b, metric)}
+            for i, (s, b) in enumerate(zip(single, batched)) if abs(getattr(b, metric) - getattr(s, metric)) > tolerance
+        )
+    return report
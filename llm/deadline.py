@@ -0,0 +1,125 @@
+import time
+import threading
+import contextlib
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from openai import NOT_GIVEN
+
+# Deadline that LLM calls, warehouse queries and sandbox executions made while it's set must meet
+_current = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """
+    Point in time by which work must finish. Child deadlines (e.g. per step) never outlast
+    their parent and share its per-stage count of time-outs.
+    """
+
+    def __init__(self, seconds: float, parent: "Deadline" = None):
+        self.expires_at = time.monotonic() + max(0.0, seconds)
+        if parent is not None:
+            self.expires_at = min(self.expires_at, parent.expires_at)
+        self.root = parent.root if parent is not None else self
+        self.timeouts = Counter()   # stage -> time-outs, kept on the root
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def child(self, seconds: float) -> "Deadline":
+        return Deadline(seconds, parent=self)
+
+    def record(self, stage: str):
+        with self.root._lock:
+            self.root.timeouts[stage] += 1
+
+    def check(self, stage: str):
+        """
+        Raises DeadlineExceeded (and records a time-out for `stage`) once the deadline has passed.
+        """
+        if self.expired():
+            self.record(stage)
+            raise DeadlineExceeded(stage)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextlib.contextmanager
+def within(deadline):
+    """
+    Runs the block under `deadline` (a Deadline, or seconds from now). A deadline set by an
+    enclosing block still applies if it's earlier.
+    """
+    if deadline is None:
+        yield current_deadline()
+        return
+    if not isinstance(deadline, Deadline):
+        deadline = Deadline(deadline, parent=current_deadline())
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def remaining(cap: float = None) -> Optional[float]:
+    """
+    Seconds left before the current deadline, at most `cap`. `cap` if there is no deadline.
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return cap
+    return deadline.remaining() if cap is None else min(cap, deadline.remaining())
+
+
+def check(stage: str):
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check(stage)
+
+
+def expired() -> bool:
+    deadline = current_deadline()
+    return deadline is not None and deadline.expired()
+
+
+def record_timeout(stage: str):
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.record(stage)
+
+
+def request_timeout():
+    """
+    `timeout=` for an OpenAI request: the time left before the current deadline, or the
+    client default when there is none.
+    """
+    left = remaining()
+    return NOT_GIVEN if left is None else max(0.5, left)
+
+
+def bind(iterable, deadline: Optional[Deadline]):
+    """
+    Wraps a lazy iterable (e.g. a streamed answer) so work it does while being consumed
+    stays under `deadline`, even outside the original `within` block.
+    """
+    iterator = iter(iterable)
+    while True:
+        with within(deadline):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
@@ -0,0 +1,192 @@
+"""
+A local stand-in for the OpenAI API, for exercising retries and rate limiting offline.
+
+Point the SDK at it with OPENAI_BASE_URL (or OpenAI(base_url=...)):
+
+    with FakeOpenAIServer(rate_limit_every=3, retry_after=0.5) as server:
+        client = OpenAI(base_url=server.base_url, api_key="test", max_retries=0)
+
+or run it standalone:
+
+    python -m llm.fake_openai --port 8089 --rate-limit-every 3
+"""
+import json
+import time
+import random
+import argparse
+import threading
+import itertools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIServer:
+    """
+    Serves /v1/responses and /v1/chat/completions with canned text.
+
+    Args:
+        reply: Text (or callable taking the parsed request body) returned as the completion.
+        rate_limit_every: Every Nth request gets a 429 (0 disables).
+        rate_limit_first: The first N requests get a 429.
+        retry_after: Value of the retry-after header sent with 429s.
+        latency: Seconds to wait before responding, or a callable returning seconds.
+    """
+
+    def __init__(self, reply="yes", rate_limit_every=0, rate_limit_first=0, retry_after=None, latency=0.0, port=0):
+        self.reply = reply
+        self.rate_limit_every = rate_limit_every
+        self.rate_limit_first = rate_limit_first
+        self.retry_after = retry_after
+        self.latency = latency
+        self.requests = []            # (path, body) of every request received
+        self.rate_limited = 0
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _should_rate_limit(self, n):
+        if self.rate_limit_first and n <= self.rate_limit_first:
+            return True
+        return bool(self.rate_limit_every) and n % self.rate_limit_every == 0
+
+    def _reply_text(self, body):
+        return self.reply(body) if callable(self.reply) else self.reply
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with fake._lock:
+                    n = next(fake._counter)
+                    fake.requests.append((self.path, body))
+
+                delay = fake.latency() if callable(fake.latency) else fake.latency
+                if delay:
+                    time.sleep(delay)
+
+                if fake._should_rate_limit(n):
+                    with fake._lock:
+                        fake.rate_limited += 1
+                    headers = {"retry-after": str(fake.retry_after)} if fake.retry_after is not None else {}
+                    error = {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+                    return self._send_json(429, error, headers)
+
+                if self.path.endswith("/responses"):
+                    if body.get("stream"):
+                        return self._stream_response(body)
+                    return self._send_json(200, fake_response(body.get("model"), fake._reply_text(body)))
+                if self.path.endswith("/chat/completions"):
+                    return self._send_json(200, fake_chat_completion(body.get("model"), fake._reply_text(body)))
+                return self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def _stream_response(self, body):
+                text = fake._reply_text(body)
+                completed = fake_response(body.get("model"), text)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for i in range(0, len(text), 8):
+                    event = {"type": "response.output_text.delta", "delta": text[i:i + 8], "item_id": "msg_fake",
+                             "output_index": 0, "content_index": 0, "sequence_number": i}
+                    self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+                event = {"type": "response.completed", "response": completed, "sequence_number": len(text)}
+                self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+
+        return Handler
+
+
+def _usage_for(text):
+    output_tokens = max(1, len(text) // 4)
+    return output_tokens
+
+
+def fake_response(model, text):
+    if isinstance(text, dict):
+        # Pre-built output items, e.g. a function call for think_and_route
+        output = text["output"]
+        text = json.dumps(output)
+    else:
+        output = [{
+            "type": "message", "id": "msg_fake", "role": "assistant", "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }]
+    output_tokens = _usage_for(text)
+    return {
+        "id": f"resp_fake_{random.randint(0, 10**9)}", "object": "response", "created_at": int(time.time()),
+        "model": model, "status": "completed", "output": output,
+        "parallel_tool_calls": True, "tool_choice": "auto", "tools": [],
+        "usage": {"input_tokens": 100, "output_tokens": output_tokens, "total_tokens": 100 + output_tokens,
+                  "input_tokens_details": {"cached_tokens": 0}, "output_tokens_details": {"reasoning_tokens": 0}},
+    }
+
+
+def fake_chat_completion(model, text):
+    output_tokens = _usage_for(text)
+    return {
+        "id": f"chatcmpl_fake_{random.randint(0, 10**9)}", "object": "chat.completion", "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 100, "completion_tokens": output_tokens, "total_tokens": 100 + output_tokens},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI endpoint that can inject 429s.")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--reply", default="yes")
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--rate-limit-first", type=int, default=0)
+    parser.add_argument("--retry-after", type=float, default=None)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        reply=args.reply,
+        rate_limit_every=args.rate_limit_every,
+        rate_limit_first=args.rate_limit_first,
+        retry_after=args.retry_after,
+        latency=args.latency,
+        port=args.port,
+    )
+    print(f"Fake OpenAI endpoint listening on {server.base_url}")
+    server.start()
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
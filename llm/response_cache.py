@@ -0,0 +1,159 @@
+import os
+import json
+import hashlib
+import threading
+from collections import Counter
+from typing import Optional
+import httpx
+from openai import OpenAI, DefaultHttpxClient
+from llm.telemetry import current_run_id
+
+# Headers that describe the body as it came over the wire, not the decoded body we replay
+_WIRE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class ResponseCache:
+    """
+    On-disk cache of OpenAI API responses keyed by request (method, path and JSON body),
+    so repeated runs of the same prompts (e.g. evals) replay answers instead of calling
+    the API. Streamed responses are cached once read to the end and replayed as one chunk.
+
+    Hits are counted per run ID, so a run's report can say how many calls were replayed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+        self.hits_by_run = Counter()
+
+    @staticmethod
+    def key(request: httpx.Request) -> str:
+        body = request.content
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True).encode()
+        except ValueError:
+            pass
+        return hashlib.sha256(request.method.encode() + b" " + request.url.path.encode() + b"\n" + body).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def lookup(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+            self.hits_by_run[current_run_id()] += 1
+        return entry
+
+    def store(self, key: str, status_code: int, headers: dict, content: bytes):
+        entry = {
+            "status_code": status_code,
+            "headers": headers,
+            "content": content.decode(),
+        }
+        tmp_path = self._path(key) + f".{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._path(key))
+
+    def hits_for(self, run_id: str) -> int:
+        with self._lock:
+            return self.hits_by_run[run_id]
+
+    def report(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats, hit_rate=self.stats["hits"] / lookups if lookups else 0.0)
+
+
+class _CachingStream(httpx.SyncByteStream):
+    """
+    Passes a response body through as it arrives and calls `on_complete` with the whole
+    body once it has been read to the end. A stream closed early is never cached.
+    """
+
+    def __init__(self, response: httpx.Response, on_complete):
+        self._response = response
+        self._on_complete = on_complete
+
+    def __iter__(self):
+        chunks = []
+        # Decoded as it arrives, matching the headers passed on without the wire encoding
+        for chunk in self._response.iter_bytes():
+            chunks.append(chunk)
+            yield chunk
+        self._on_complete(b"".join(chunks))
+
+    def close(self):
+        self._response.close()
+
+
+class CachingTransport(httpx.BaseTransport):
+    """
+    httpx transport that answers from a ResponseCache, and caches successful responses
+    from the wrapped transport. Bodies are passed through as they arrive, so streamed
+    responses still stream on a miss.
+    """
+
+    def __init__(self, cache: ResponseCache, transport: httpx.BaseTransport = None):
+        self.cache = cache
+        self._transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        key = self.cache.key(request)
+        entry = self.cache.lookup(key)
+        if entry is not None:
+            return httpx.Response(entry["status_code"], headers=entry["headers"], content=entry["content"].encode(), request=request)
+
+        response = self._transport.handle_request(request)
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _WIRE_HEADERS}
+        if response.status_code != 200:
+            response.read()
+            return httpx.Response(response.status_code, headers=headers, content=response.content, request=request)
+
+        def on_complete(content: bytes):
+            self.cache.store(key, response.status_code, headers, content)
+
+        return httpx.Response(response.status_code, headers=headers, stream=_CachingStream(response, on_complete), request=request)
+
+    def close(self):
+        self._transport.close()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(directory: str = None) -> Optional[ResponseCache]:
+    """
+    The shared cache for `directory` (MODEXA_LLM_CACHE_DIR by default), or None if caching is off.
+    """
+    directory = directory or os.getenv("MODEXA_LLM_CACHE_DIR")
+    if not directory:
+        return None
+    directory = os.path.abspath(directory)
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = ResponseCache(directory)
+        return _caches[directory]
+
+
+def make_client(**kwargs) -> OpenAI:
+    """
+    The OpenAI client used across the app. Retries are owned by the request scheduler.
+    With MODEXA_LLM_CACHE_DIR set, responses are served from and saved to that cache.
+    """
+    cache = get_response_cache()
+    if cache is not None:
+        kwargs.setdefault("http_client", DefaultHttpxClient(transport=CachingTransport(cache)))
+    return OpenAI(max_retries=0, **kwargs)
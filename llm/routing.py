@@ -0,0 +1,169 @@
+import os
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+from llm.scheduler import RequestScheduler, default_scheduler
+from llm.telemetry import UsageRecorder, usage_recorder
+
+# Model tiers, ordered from cheapest/fastest to strongest. Escalation walks this order.
+DEFAULT_TIERS = {
+    "fast": "gpt-4.1-mini",
+    "standard": "gpt-4.1",
+}
+TIER_ORDER = ["fast", "standard"]
+
+# Which tier serves each call type
+DEFAULT_ROUTES = {
+    "plan": "standard",
+    "plan_adapt": "fast",
+    "route": "fast",
+    "judge": "fast",
+    "sql": "standard",
+    "code": "standard",
+    "answer": "standard",
+    "digest": "fast",
+}
+
+# USD per 1M tokens (input, output)
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+
+def extract_usage(response) -> tuple:
+    """
+    Returns (input_tokens, output_tokens) for both Responses and Chat Completions objects.
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return 0, 0
+    input_tokens = getattr(usage, "input_tokens", None)
+    if input_tokens is None:
+        input_tokens = getattr(usage, "prompt_tokens", 0)
+    output_tokens = getattr(usage, "output_tokens", None)
+    if output_tokens is None:
+        output_tokens = getattr(usage, "completion_tokens", 0)
+    return input_tokens or 0, output_tokens or 0
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class ModelRouter:
+    """
+    Sends each LLM call type (plan, route, judge, sql, code, answer) to a model tier,
+    escalating to the next stronger tier when the response can't be parsed or looks unsure.
+
+    Tiers and routes can be overridden per call type with environment variables, e.g.
+    MODEXA_MODEL_FAST=gpt-4.1-nano or MODEXA_ROUTE_JUDGE=standard.
+    """
+
+    def __init__(
+        self,
+        tiers: Dict[str, str] = None,
+        routes: Dict[str, str] = None,
+        tier_order: List[str] = None,
+        scheduler: RequestScheduler = None,
+        recorder: UsageRecorder = None,
+    ):
+        self.scheduler = scheduler or default_scheduler   # Rate limits and retries every request
+        self.recorder = recorder or usage_recorder        # Per-call usage log, tagged by run and step
+        self.tiers = dict(tiers or DEFAULT_TIERS)
+        self.routes = dict(routes or DEFAULT_ROUTES)
+        self.tier_order = list(tier_order or TIER_ORDER)
+
+        for tier in self.tiers:
+            override = os.getenv(f"MODEXA_MODEL_{tier.upper()}")
+            if override:
+                self.tiers[tier] = override
+        for call_type in self.routes:
+            override = os.getenv(f"MODEXA_ROUTE_{call_type.upper()}")
+            if override in self.tiers:
+                self.routes[call_type] = override
+
+        self._lock = threading.Lock()
+        self.stats = {tier: self._empty_stats() for tier in self.tiers}
+
+    @staticmethod
+    def _empty_stats():
+        return {"calls": 0, "escalations": 0, "latency_s": 0.0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+
+    def tier_for(self, call_type: str) -> str:
+        return self.routes.get(call_type, self.tier_order[-1])
+
+    def model_for(self, call_type: str) -> str:
+        return self.tiers[self.tier_for(call_type)]
+
+    def next_tier(self, tier: str) -> Optional[str]:
+        idx = self.tier_order.index(tier) if tier in self.tier_order else len(self.tier_order) - 1
+        return self.tier_order[idx + 1] if idx + 1 < len(self.tier_order) else None
+
+    def call(self, call_type: str, request: Callable, parse: Callable = None, accept: Callable = None, est_tokens: int = 1000):
+        """
+        Runs `request(model)` through the scheduler on the tier routed for `call_type` and
+        returns `parse(response)`. `est_tokens` is the token budget reserved for the request.
+
+        If parsing raises or `accept(parsed)` is False, the call is retried on the next
+        stronger tier. The last tier's result is returned as-is.
+        """
+        parse = parse or (lambda response: response)
+        tier = self.tier_for(call_type)
+
+        while True:
+            model = self.tiers[tier]
+            start = time.perf_counter()
+            response = self.scheduler.submit(request, model, est_tokens=est_tokens)
+            self.record(call_type, tier, model, time.perf_counter() - start, response)
+
+            stronger = self.next_tier(tier)
+            try:
+                parsed = parse(response)
+            except Exception as e:
+                if stronger is None:
+                    raise
+                print(f"[Router] {call_type} response from {model} failed to parse ({e}), escalating to {stronger}")
+                self._escalated(tier)
+                tier = stronger
+                continue
+
+            if accept is None or accept(parsed) or stronger is None:
+                return parsed
+
+            print(f"[Router] Low-confidence {call_type} response from {model}, escalating to {stronger}")
+            self._escalated(tier)
+            tier = stronger
+
+    def record(self, call_type: str, tier: str, model: str, latency: float, response, ttft: float = None):
+        input_tokens, output_tokens = extract_usage(response)
+        cost = estimate_cost(model, input_tokens, output_tokens)
+        self.recorder.record(call_type, model, tier, latency, input_tokens, output_tokens, cost, ttft=ttft)
+        with self._lock:
+            stats = self.stats.setdefault(tier, self._empty_stats())
+            stats["calls"] += 1
+            stats["latency_s"] += latency
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+            stats["cost_usd"] += cost
+
+    def _escalated(self, tier: str):
+        with self._lock:
+            self.stats[tier]["escalations"] += 1
+
+    def report(self) -> Dict[str, dict]:
+        with self._lock:
+            report = {}
+            for tier, stats in self.stats.items():
+                row = dict(stats, model=self.tiers.get(tier))
+                row["avg_latency_s"] = stats["latency_s"] / stats["calls"] if stats["calls"] else 0.0
+                report[tier] = row
+            return report
+
+
+# Shared across the wrapper and tools so accounting covers every call site
+default_router = ModelRouter()
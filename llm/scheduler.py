@@ -0,0 +1,306 @@
+import os
+import time
+import heapq
+import random
+import itertools
+import threading
+import contextlib
+from contextvars import ContextVar
+import openai
+from llm import deadline
+
+# Lower value is served first
+PRIORITIES = {"interactive": 0, "eval": 1}
+
+_current_priority = ContextVar("llm_priority", default="interactive")
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and 5xx
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class StreamInterrupted(Exception):
+    """
+    A streamed response failed after part of it had been delivered, so it can't be retried
+    transparently. The original error is the `__cause__`.
+    """
+
+
+def estimate_tokens(*texts) -> int:
+    """
+    Rough token estimate (~4 characters per token) for budgeting before a request is sent.
+    """
+    return max(1, sum(len(str(t)) for t in texts) // 4)
+
+
+def retry_after_seconds(error):
+    """
+    Reads the server's retry-after hint from an OpenAI error, if it sent one.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0   # Refill per second
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Seconds until `amount` can be taken. Requests larger than the bucket wait for a full bucket.
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RequestScheduler:
+    """
+    Shared gate for every LLM request in the process.
+
+    Requests wait in a priority queue (interactive before eval), then go out when a
+    concurrency slot is free and the request/token buckets allow it. Rate limits and
+    transient errors are retried with jittered exponential backoff, honoring retry-after.
+    Nothing waits, or retries, past the caller's deadline (see llm.deadline).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 500,
+        tokens_per_minute: int = 200_000,
+        max_concurrency: int = 8,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._waiting = []                 # Heap of (priority, seq) tickets
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._paused_until = 0.0           # Set by retry-after so every caller backs off
+
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failures": 0,
+            "wait_s_total": 0.0,
+            "wait_s_max": 0.0,
+            "max_queue_depth": 0,
+        }
+
+    @contextlib.contextmanager
+    def priority(self, name: str):
+        """
+        Runs every LLM call made inside the block (including from tools) at `name` priority.
+        """
+        token = _current_priority.set(name)
+        try:
+            yield
+        finally:
+            _current_priority.reset(token)
+
+    def submit(self, fn, *args, est_tokens: int = 1000, priority: str = None, **kwargs):
+        """
+        Calls `fn(*args, **kwargs)` once the scheduler admits it, retrying transient failures.
+        Raises DeadlineExceeded if the current deadline passes while queued or retrying.
+        """
+        priority = priority or _current_priority.get()
+        attempt = 0
+
+        while True:
+            deadline.check("llm")
+            self._acquire(priority, est_tokens)
+            try:
+                result = fn(*args, **kwargs)
+                self._settle_tokens(est_tokens, result)
+                return result
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                delay = self._retry_delay(e, attempt)
+            finally:
+                self._release()
+
+            time.sleep(deadline.remaining(delay))
+
+    def stream(self, fn, *args, est_tokens: int = 1000, priority: str = None, **kwargs):
+        """
+        Like `submit` for a streamed request: yields the events of the stream `fn` returns,
+        holding a concurrency slot until the stream is exhausted or closed. Failures before
+        the first event are retried; later ones raise StreamInterrupted, since the caller
+        has already used part of the output. DeadlineExceeded ends the stream at the deadline.
+        """
+        priority = priority or _current_priority.get()
+        attempt = 0
+
+        while True:
+            deadline.check("llm")
+            self._acquire(priority, est_tokens)
+            started = False
+            try:
+                stream = fn(*args, **kwargs)
+                try:
+                    for event in stream:
+                        # Events may keep arriving, but the stream doesn't outlive the deadline
+                        deadline.check("llm")
+                        started = True
+                        if getattr(event, "type", None) == "response.completed":
+                            self._settle_tokens(est_tokens, event.response)
+                        yield event
+                finally:
+                    close = getattr(stream, "close", None)
+                    if close is not None:
+                        close()
+                return
+            except RETRYABLE_ERRORS as e:
+                if started:
+                    with self._cond:
+                        self.stats["failures"] += 1
+                    raise StreamInterrupted(f"Stream failed part way: {type(e).__name__}: {e}") from e
+                attempt += 1
+                delay = self._retry_delay(e, attempt)
+            finally:
+                self._release()
+
+            time.sleep(deadline.remaining(delay))
+
+    def _retry_delay(self, error, attempt: int) -> float:
+        """
+        Counts a failed attempt and returns how long to back off before the next one.
+        Re-raises `error` once retries are used up, or DeadlineExceeded if time is.
+        """
+        if deadline.expired():
+            # The request was cut off by the deadline's timeout, not worth retrying
+            deadline.record_timeout("llm")
+            raise deadline.DeadlineExceeded("llm") from error
+        is_rate_limit = isinstance(error, openai.RateLimitError)
+        with self._cond:
+            self.stats["retries"] += 1
+            self.stats["rate_limited"] += int(is_rate_limit)
+            if attempt > self.max_retries:
+                self.stats["failures"] += 1
+
+        if attempt > self.max_retries:
+            raise error
+
+        # Full jitter, but never earlier than the server asked for
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        hinted = retry_after_seconds(error)
+        if hinted is not None:
+            delay = max(delay, hinted)
+            with self._cond:
+                self._paused_until = max(self._paused_until, time.monotonic() + hinted)
+        print(f"[Scheduler] {type(error).__name__} on attempt {attempt}, retrying in {delay:.2f}s")
+        return delay
+
+    def _acquire(self, priority: str, est_tokens: int):
+        ticket = (PRIORITIES.get(priority, len(PRIORITIES)), next(self._seq))
+        enqueued = time.monotonic()
+
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._waiting))
+
+            while True:
+                left = deadline.remaining()
+                if left is not None and left <= 0:
+                    # Give up the place in line rather than wait past the deadline
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    deadline.record_timeout("llm_queue")
+                    raise deadline.DeadlineExceeded("llm_queue")
+                if self._waiting[0] == ticket and self._in_flight < self.max_concurrency:
+                    wait = max(
+                        self.requests.wait_time(1),
+                        self.tokens.wait_time(est_tokens),
+                        self._paused_until - time.monotonic(),
+                    )
+                    if wait <= 0:
+                        break
+                    self._cond.wait(timeout=wait if left is None else min(wait, left))
+                else:
+                    self._cond.wait(timeout=left)
+
+            heapq.heappop(self._waiting)
+            self.requests.take(1)
+            self.tokens.take(est_tokens)
+            self._in_flight += 1
+
+            waited = time.monotonic() - enqueued
+            self.stats["requests"] += 1
+            self.stats["wait_s_total"] += waited
+            self.stats["wait_s_max"] = max(self.stats["wait_s_max"], waited)
+            # The next ticket in line may be admissible now
+            self._cond.notify_all()
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _settle_tokens(self, est_tokens: int, result):
+        # Correct the token bucket once the real usage is known
+        usage = getattr(result, "usage", None)
+        if usage is None:
+            return
+        actual = getattr(usage, "total_tokens", None)
+        if not actual:
+            return
+        with self._cond:
+            if actual < est_tokens:
+                self.tokens.give_back(est_tokens - actual)
+            else:
+                self.tokens.take(actual - est_tokens)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            metrics = dict(self.stats)
+            metrics["queue_depth"] = len(self._waiting)
+            metrics["in_flight"] = self._in_flight
+            metrics["wait_s_avg"] = self.stats["wait_s_total"] / self.stats["requests"] if self.stats["requests"] else 0.0
+            return metrics
+
+
+default_scheduler = RequestScheduler(
+    requests_per_minute=int(os.getenv("MODEXA_LLM_RPM", 500)),
+    tokens_per_minute=int(os.getenv("MODEXA_LLM_TPM", 200_000)),
+    max_concurrency=int(os.getenv("MODEXA_LLM_CONCURRENCY", 8)),
+)
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextlib
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, List
+
+# Tags attached to every LLM call made while they're set
+_run_id = ContextVar("run_id", default=None)
+_step_index = ContextVar("step_index", default=None)
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def current_run_id():
+    return _run_id.get()
+
+
+class UsageRecorder:
+    """
+    Records one entry per LLM request: call type, model, tokens, latency (and time to first
+    token, for streamed calls) and estimated cost, tagged with the current run ID and plan step index.
+
+    If MODEXA_TELEMETRY_PATH is set, every record is also appended there as JSONL.
+    Records are kept in memory for the `max_runs` most recently active runs.
+    """
+
+    def __init__(self, export_path: str = None, max_runs: int = 100):
+        self.export_path = export_path or os.getenv("MODEXA_TELEMETRY_PATH")
+        self.max_runs = max_runs
+        self._runs = OrderedDict()   # run_id -> records, least recently active run first
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def run(self, run_id: str):
+        token = _run_id.set(run_id)
+        try:
+            yield run_id
+        finally:
+            _run_id.reset(token)
+
+    @contextlib.contextmanager
+    def step(self, step_index: int):
+        token = _step_index.set(step_index)
+        try:
+            yield
+        finally:
+            _step_index.reset(token)
+
+    def bind(self, iterable, run_id: str, step_index: int = None):
+        """
+        Wraps a lazy iterable (e.g. a streamed answer) so calls it makes while being
+        consumed are still tagged with `run_id`, even outside the original `run` block.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.run(run_id), self.step(step_index):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def record(self, call_type: str, model: str, tier: str, latency: float, input_tokens: int, output_tokens: int, cost: float,
+               ttft: float = None):
+        entry = {
+            "timestamp": time.time(),
+            "run_id": _run_id.get(),
+            "step_index": _step_index.get(),
+            "call_type": call_type,
+            "model": model,
+            "tier": tier,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "latency_s": round(latency, 4),
+            "ttft_s": round(ttft, 4) if ttft is not None else None,
+            "cost_usd": round(cost, 6),
+        }
+        with self._lock:
+            self._runs.setdefault(entry["run_id"], []).append(entry)
+            self._runs.move_to_end(entry["run_id"])
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+            if self.export_path:
+                self._append(self.export_path, [entry])
+        return entry
+
+    @property
+    def records(self) -> List[dict]:
+        with self._lock:
+            return [r for records in self._runs.values() for r in records]
+
+    def records_for(self, run_id: str) -> List[dict]:
+        with self._lock:
+            return list(self._runs.get(run_id, []))
+
+    def report(self, run_id: str) -> dict:
+        """
+        Aggregates a run's records into totals, overall and per call type, plus the time
+        to first token of the run's first streamed call of each type.
+        """
+        records = self.records_for(run_id)
+        totals = _empty_totals()
+        by_call_type: Dict[str, dict] = {}
+        by_step: Dict[str, dict] = {}
+        ttft: Dict[str, float] = {}
+        for r in records:
+            if r.get("ttft_s") is not None:
+                ttft.setdefault(r["call_type"], r["ttft_s"])
+            for bucket in (totals, by_call_type.setdefault(r["call_type"], _empty_totals()),
+                           by_step.setdefault(str(r["step_index"]), _empty_totals())):
+                bucket["calls"] += 1
+                bucket["input_tokens"] += r["input_tokens"]
+                bucket["output_tokens"] += r["output_tokens"]
+                bucket["latency_s"] += r["latency_s"]
+                bucket["cost_usd"] += r["cost_usd"]
+        return {"run_id": run_id, "totals": totals, "by_call_type": by_call_type, "by_step": by_step, "ttft_s": ttft}
+
+    def export_jsonl(self, path: str, run_id: str = None):
+        records = self.records_for(run_id) if run_id else self.records
+        self._append(path, records)
+
+    @staticmethod
+    def _append(path: str, records: List[dict]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "a") as f:
+            for r in records:
+                f.write(json.dumps(r) + "\n")
+
+
+def _empty_totals():
+    return {"calls": 0, "input_tokens": 0, "output_tokens": 0, "latency_s": 0.0, "cost_usd": 0.0}
+
+
+class RunReport:
+    """
+    Usage report for one agent run. Totals are read at access time, so a report returned
+    alongside a streamed answer also covers the answer once the stream is consumed.
+    """
+
+    def __init__(self, run_id: str, recorder: UsageRecorder = None):
+        self.run_id = run_id
+        self.recorder = recorder or usage_recorder
+
+    @property
+    def records(self) -> List[dict]:
+        return self.recorder.records_for(self.run_id)
+
+    def to_dict(self) -> dict:
+        return self.recorder.report(self.run_id)
+
+    def export_jsonl(self, path: str):
+        self.recorder.export_jsonl(path, run_id=self.run_id)
+
+
+usage_recorder = UsageRecorder()
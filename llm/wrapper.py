@@ -1,26 +1,70 @@
-from openai import OpenAI
+from llm.response_cache import make_client
 from typing import List, Dict, Any
 import json
 import inspect
 from llm.prompts import dbschema_str
+from llm.routing import ModelRouter, default_router
+from llm.scheduler import estimate_tokens, StreamInterrupted
+from llm.deadline import request_timeout
 from dotenv import load_dotenv
 import re
 import os
+import time
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")   
 
-client = OpenAI()
+# Retries are owned by the request scheduler; MODEXA_LLM_CACHE_DIR replays cached responses
+client = make_client()
 
 class LLMWrapper:
-    def __init__(self, model="gpt-4.1", temperature=0.3, tool_specs: List[Dict] = None):
-        self.model = model
+    def __init__(self, temperature=0.3, tool_specs: List[Dict] = None, router: ModelRouter = None):
+        self.router = router or default_router   # Picks a model tier per call type
         self.temperature = temperature
         self.tool_specs = tool_specs or []
 
-    def _call_llm(self, prompt: str):
-        response = client.responses.create(
-            model=self.model,
+    def _call_llm(self, prompt: str, call_type: str = "answer", accept=None):
+        return self.router.call(
+            call_type,
+            lambda model: client.responses.create(
+                model=model,
+                input=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {
+                                'type': "input_text",
+                                "text": prompt
+                            }
+                        ]
+                    },
+                ],
+                temperature=self.temperature,
+                timeout=request_timeout(),
+            ),
+            parse=lambda response: response.output_text,
+            accept=accept,
+            est_tokens=estimate_tokens(prompt),
+        )
+
+    def _stream_llm(self, prompt: str, call_type: str = "answer"):
+        """
+        Streams the response to `prompt`, yielding text deltas as they arrive.
+        Time to first token goes into the call's usage record, tagged with the run, since a
+        session's wrapper serves many runs.
+        The scheduler slot is held until the stream ends or is closed; a failure after the
+        first delta raises StreamInterrupted for the caller to recover from.
+        """
+        tier = self.router.tier_for(call_type)
+        model = self.router.tiers[tier]
+        start = time.perf_counter()
+        final_response = None
+        ttft = None
+
+        events = self.router.scheduler.stream(
+            client.responses.create,
+            est_tokens=estimate_tokens(prompt),
+            model=model,
             input=[
                 {
                     "role": "user",
@@ -33,8 +77,41 @@ class LLMWrapper:
                 },
             ],
             temperature=self.temperature,
+            stream=True,
+            timeout=request_timeout(),
         )
-        return response.output_text
+        try:
+            for event in events:
+                if event.type == "response.output_text.delta":
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                        print(f"[Stream] {call_type}: first token after {ttft:.2f}s")
+                    yield event.delta
+                elif event.type == "response.completed":
+                    final_response = event.response
+        finally:
+            # Frees the scheduler slot right away if the caller stops reading early
+            events.close()
+
+        self.router.record(call_type, tier, model, time.perf_counter() - start, final_response, ttft=ttft)
+
+    def stream_answer(self, prompt: str):
+        """
+        Streams the final answer token by token. If the stream breaks part way, the rest of
+        the answer comes from a regular call asked to continue the text already sent.
+        """
+        sent = ""
+        try:
+            for delta in self._stream_llm(prompt, call_type="answer"):
+                sent += delta
+                yield delta
+        except StreamInterrupted as e:
+            print(f"[Stream] answer interrupted after {len(sent)} characters ({e.__cause__!r}), finishing without streaming")
+            yield self._call_llm(
+                f"{prompt}\n\nThe beginning of your answer has already been sent to the user:\n{sent}\n\n"
+                f"Continue it exactly where it stops, without repeating any of it.",
+                call_type="answer",
+            )
 
     def think_and_route(self, context: Dict[str, Any]) -> Dict:
         """
@@ -62,41 +139,111 @@ class LLMWrapper:
             f"If no tool is appropriate, use the `think_reflect` tool with a note that explains your thought process. If you're using the 'write_python_code' function, pass input parameters using a single scratchpad variable or a comma-separated list of variable names."
         )
 
-        response = client.responses.create(
-            model=self.model,
-            input=[
-                {
-                    "role": "user", 
-                    "content": [
-                        {
-                            'type': "input_text",
-                            "text": prompt
-                        }
-                    ]
-                },
-            ],
-            temperature=self.temperature,
-            tools=self.tool_specs,
-            tool_choice="auto",
+        results = self.router.call(
+            "route",
+            lambda model: client.responses.create(
+                model=model,
+                input=[
+                    {
+                        "role": "user", 
+                        "content": [
+                            {
+                                'type': "input_text",
+                                "text": prompt
+                            }
+                        ]
+                    },
+                ],
+                temperature=self.temperature,
+                tools=self.tool_specs,
+                tool_choice="auto",
+                timeout=request_timeout(),
+            ),
+            parse=self._parse_thought,
+            # Neither a thought nor a tool call means the model didn't follow the format
+            accept=lambda results: bool(results["thought"] or results["tool"]),
+            est_tokens=estimate_tokens(prompt),
         )
-        results = self._parse_thought(response)
         return results
     
 
     def plan(self, question: str, context: str = "") -> List[str]:
+        prompt = self._build_plan_prompt(question, context)
+        response = self._call_llm(prompt, call_type="plan", accept=lambda text: bool(self._parse_plan(text)))
+        print(response)
+        return self._parse_plan(response)
+
+    def stream_plan(self, question: str, context: str = ""):
+        """
+        Streams the plan, yielding each step as soon as its line under ## Final Plan is complete.
+        Falls back to a regular (escalating) planning call if the stream yields no steps or
+        breaks part way; in that case only the steps not yet yielded are taken from it.
+        """
+        prompt = self._build_plan_prompt(question, context)
+        buffer = ""
+        plan_start = None   # Offset just past the ## Final Plan header
+        n_steps = 0
+
+        try:
+            for delta in self._stream_llm(prompt, call_type="plan"):
+                buffer += delta
+                if plan_start is None:
+                    match = re.search(r"## Final Plan\s*\n", buffer, re.IGNORECASE)
+                    if not match:
+                        continue
+                    plan_start = match.end()
+
+                # Only parse lines that are complete, the last one may still be streaming
+                *complete_lines, partial = buffer[plan_start:].split("\n")
+                for line in complete_lines:
+                    step = self._parse_plan_line(line)
+                    if step:
+                        n_steps += 1
+                        yield step
+                plan_start = len(buffer) - len(partial)
+        except StreamInterrupted as e:
+            # The half-streamed last line can't be trusted; steps already yielded are running
+            print(f"[Stream] plan interrupted after {n_steps} steps ({e.__cause__!r}), falling back to a full planning call")
+            yield from self.plan(question, context)[n_steps:]
+            return
+
+        print(buffer)
+        if plan_start is not None:
+            step = self._parse_plan_line(buffer[plan_start:])
+            if step:
+                n_steps += 1
+                yield step
+
+        if n_steps == 0:
+            print("[Stream] No plan steps found in streamed response, falling back to a full planning call")
+            yield from self.plan(question, context)
+
+    def adapt_plan(self, question: str, cached_question: str, cached_plan: List[str]) -> List[str]:
+        """
+        Cheaply rewrites a plan that worked for a similar question to fit `question`.
+        """
+        plan_str = "\n".join(f"{i + 1}. {step}" for i, step in enumerate(cached_plan))
+        prompt = (
+            f"You are a seasoned data scientist. A plan that successfully answered the question '{cached_question}' is below.\n\n"
+            f"{plan_str}\n\n"
+            f"Adapt this plan to answer the new question: '{question}'. Change only what the new question requires (filters, metrics, grouping), keep the same tools, and keep each step's `(inputs: ... | outputs: ...)` annotation.\n\n"
+            "% Output Format:\nOutput the adapted numbered list under a ## Final Plan header, one step per line."
+        )
+        response = self._call_llm(prompt, call_type="plan_adapt", accept=lambda text: bool(self._parse_plan(text)))
+        print(response)
+        return self._parse_plan(response)
+
+    def _build_plan_prompt(self, question: str, context: str = "") -> str:
         prompt = (
             f"You are a seasoned data scientist helping the user answer the following business question for their company: {question}. You have access to a set of models % Tools and a database % Database to help you answer the question.\n\n"
             "% Task:\nFor the given business question, generate a step-by-step plan for the data and tools to use for the task. This plan should involve individual tasks, that if executed correctly, will generate the information you need to answer the question. Do not add any superfluous steps, and prioritize being as concise as possible. This includes minimizing calls to `write_python_code` and fetching and manipulating data mostly via `convert_text_to_sql`. Make sure the each step in the plan is grounded in the tools and data we are provided with – do not make up new models or columns.\n\n"
             f"% Tools:\n{self._summarize_toolspecs(self.tool_specs)}\n\n"
             f"% Database:\n{dbschema_str}"
-            "% Output Format:\nThink step by step about how to break down the question into smaller tasks. Finally, generate a numbered list for each step in the plan under a ## Final Plan header. Make sure each step is in one line."
+            "% Output Format:\nThink step by step about how to break down the question into smaller tasks. Finally, generate a numbered list for each step in the plan under a ## Final Plan header. Make sure each step is in one line, and end each step with `(inputs: <comma-separated scratchpad variables the step reads, or none> | outputs: <variables the step creates>)` so that independent steps can run in parallel."
         )
         if context:
             prompt += f"Additional Context:\n{context}\n\n"
-
-        response = self._call_llm(prompt)
-        print(response)
-        return self._parse_plan(response)
+        return prompt
 
     def _parse_plan(self, response: str) -> List[str]:
         # Locate the start of the Final Plan section
@@ -112,6 +259,10 @@ class LLMWrapper:
 
         return steps
 
+    def _parse_plan_line(self, line: str):
+        match = re.match(r"^\s*\d+\.\s*(.+)", line)
+        return match.group(1).strip() if match else None
+
     def _summarize_toolspecs(self, tool_specs):
         summary = []
         for tool in tool_specs:
@@ -176,6 +327,21 @@ class LLMWrapper:
 
         return results
     
+    def digest_step(self, step: str, trace: List[Dict]) -> str:
+        """
+        Summarizes a finished step's trace in one or two sentences for long-context compaction.
+        """
+        history_str = "\n".join([
+            f"Thought: {t.get('thought')}\nAction: {t.get('action')}\nObservation: {t.get('observation')}"
+            for t in trace[-3:]
+        ])
+        prompt = (
+            f"Summarize what this completed analysis step did and found in at most two sentences. "
+            f"Keep variable names, numbers and column names exactly as they appear.\n\n"
+            f"Step: '{step}'\n\nTrace:\n{history_str}"
+        )
+        return self._call_llm(prompt, call_type="digest").strip()
+
     def judge_step(self, step: str, trace: List[Dict]):
         """
         Use the LLM to decide if a step is complete based on reasoning trace and last observation.
@@ -193,7 +359,12 @@ class LLMWrapper:
             f"Answer 'yes' or 'no' and briefly justify."
         ) 
 
-        response = self._call_llm(prompt)
+        # An answer that doesn't open with yes/no is treated as low confidence and escalated
+        response = self._call_llm(
+            prompt,
+            call_type="judge",
+            accept=lambda text: re.match(r"\W*(yes|no)\b", text.lower()) is not None,
+        )
 
         return "yes" in response.lower()[:10]
 
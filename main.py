@@ -1,5 +1,9 @@
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
 from agent.runner import run_agent_pipeline
+from agent.session import default_session_manager
+from agent.jobs import get_job_store
+from agent import events
 
 # Set page title and layout
 st.set_page_config(page_title="Modexa AI Chat", layout="centered")
@@ -11,6 +15,77 @@ if "messages" not in st.session_state:
         {"role": "assistant", "content": "Hi I'm Modexa AI, your agentic data scientist here to answer your data questions!"}
     ]
 
+# The agent's working state (scratchpad, history) is kept across turns so follow-ups reuse earlier results.
+# Sessions live in a process-wide manager that evicts idle ones; only the ID is kept per browser session.
+if "agent_session_id" not in st.session_state:
+    st.session_state.agent_session_id = default_session_manager.get().session_id
+
+
+def run_in_background(question: str, session_id: str, progress: events.EventQueue):
+    """
+    Runs the agent off the script thread, so progress can be drawn while it works.
+    Returns the usage report once the answer has been fully streamed.
+    """
+    try:
+        session = default_session_manager.get(session_id, acquire=True)
+        plan, response_stream, report = run_agent_pipeline(question, stream=True, on_progress=progress, session=session)
+        "".join(response_stream)   # Tokens reach the UI as AnswerToken events
+        return report
+    finally:
+        progress.close()
+
+
+def render_progress(progress: events.EventQueue, steps_area):
+    """
+    Draws step progress into `steps_area` and yields the answer's tokens for st.write_stream.
+    Streamlit elements are only touched here, on the script thread.
+    """
+    statuses = {}
+    for event in progress:
+        if isinstance(event, events.StepStarted):
+            statuses[event.index] = steps_area.status(f"Step {event.index + 1}: {event.step}", expanded=False)
+        elif isinstance(event, events.Thought) and event.index in statuses:
+            statuses[event.index].markdown(f"**Thought:** {event.thought}")
+        elif isinstance(event, events.Action) and event.index in statuses:
+            statuses[event.index].markdown(f"**Action:** `{event.tool}`")
+            statuses[event.index].json(event.args, expanded=False)
+        elif isinstance(event, events.Observation) and event.index in statuses:
+            label = "Observation (cached)" if event.cached else "Observation"
+            statuses[event.index].markdown(f"**{label}:** {event.observation[:1000]}")
+        elif isinstance(event, events.StepDone) and event.index in statuses:
+            state = "error" if event.failed else "complete"
+            statuses[event.index].update(label=f"Step {event.index + 1}: {event.step}", state=state)
+        elif isinstance(event, events.StepFailed) and event.index in statuses:
+            statuses[event.index].markdown(f"**Error:** {event.error}")
+            statuses[event.index].update(state="error")
+        elif isinstance(event, events.AnswerToken):
+            yield event.text
+
+
+# Heavy analyses can run on the background job workers (python -m agent.jobs) instead of this script run
+with st.sidebar:
+    run_as_job = st.toggle("Run as background job", help="For long analyses; results appear below when ready")
+    if "job_ids" not in st.session_state:
+        st.session_state.job_ids = []
+    if st.session_state.job_ids:
+        st.subheader("Background jobs")
+        st.button("Refresh")
+    for job_id in reversed(st.session_state.job_ids):
+        job = get_job_store().get(job_id)
+        if job is None:
+            continue
+        with st.expander(f"{job['question'][:40]} – {job['status']}"):
+            if job["status"] == "done":
+                st.markdown(job["result"]["final_summary"])
+            elif job["status"] == "failed":
+                st.error(job["error"])
+            elif job["status"] == "queued":
+                st.caption(f"{job['queue_position']} job(s) ahead")
+            else:
+                steps = [e for e in get_job_store().events(job_id) if e["type"] == "step_done"]
+                st.caption(f"{len(steps)} step(s) done")
+
+
 # Display chat history
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -22,8 +97,22 @@ if prompt:
     st.chat_message("user").markdown(prompt)
     st.session_state.messages.append({"role": "user", "content": prompt})
 
+    if run_as_job:
+        job_id = get_job_store().submit(prompt)
+        st.session_state.job_ids.append(job_id)
+        response = f"Queued as background job `{job_id}`; its answer will appear in the sidebar."
+        st.chat_message("assistant").markdown(response)
+        st.session_state.messages.append({"role": "assistant", "content": response})
+        st.stop()
+
     with st.chat_message("assistant"):
-        plan, response = run_agent_pipeline(prompt)
-        st.markdown(response)
+        progress = events.EventQueue()
+        steps_area = st.container()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(run_in_background, prompt, st.session_state.agent_session_id, progress)
+            response = st.write_stream(render_progress(progress, steps_area))
+            report = future.result()
+        with st.expander("LLM usage"):
+            st.json(report.to_dict()["totals"])
 
     st.session_state.messages.append({"role": "assistant", "content": response})
@@ -4,6 +4,8 @@ from typing import List, Dict, Any, Optional
 class AgentRequest(BaseModel):
     question: str
     user_id: Optional[str] = None
+    time_budget_s: Optional[float] = None
+    session_id: Optional[str] = None   # Continue a conversation; its earlier results are reused
 
 class StepTrace(BaseModel):
     thought: str
@@ -18,3 +20,10 @@ class AgentResponse(BaseModel):
     plan: List[str]
     execution_trace: List[StepResult]
     final_summary: str
+    run_id: Optional[str] = None
+    session_id: Optional[str] = None
+
+class JobRequest(BaseModel):
+    question: str
+    priority: int = 0   # Higher runs first
+    time_budget_s: Optional[float] = None
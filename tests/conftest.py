@@ -0,0 +1,6 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# The OpenAI clients are created on import; tests point them at llm.fake_openai servers
+os.environ.setdefault("OPENAI_API_KEY", "test")
@@ -0,0 +1,17 @@
+from fastapi.testclient import TestClient
+from agent.session import default_session_manager
+from api import app, service
+
+
+def test_busy_session_is_refused_before_streaming():
+    session = default_session_manager.get("api-busy", acquire=True)
+    try:
+        with TestClient(app) as client:
+            r = client.post("/v1/agent/stream", json={"question": "How many orders?", "session_id": "api-busy"})
+            assert r.status_code == 409
+            r = client.post("/v1/agent", json={"question": "How many orders?", "session_id": "api-busy"})
+            assert r.status_code == 409
+    finally:
+        session.release()
+    # Neither request took a worker slot
+    assert service.admission.pending == 0
@@ -0,0 +1,34 @@
+import pandas as pd
+from agent.code_cache import CodeCache
+
+CODE = "def f(df):\n    return len(df)"
+
+
+def test_hit_counted_only_after_successful_run(tmp_path):
+    cache = CodeCache(path=str(tmp_path / "code.json"))
+    params = pd.DataFrame({"a": [1, 2]})
+    cache.add("Count rows", params, CODE, generation_latency=1.5)
+
+    assert cache.lookup("Count rows.", params) == CODE
+    assert cache.report()["hits"] == 0
+    cache.record_hit("Count rows", params)
+    report = cache.report()
+    assert report["hits"] == 1
+    assert report["saved_latency_s"] == 1.5
+
+
+def test_failed_cached_code_counts_as_miss(tmp_path):
+    cache = CodeCache(path=str(tmp_path / "code.json"))
+    params = pd.DataFrame({"a": [1, 2]})
+    cache.add("Count rows", params, CODE)
+
+    assert cache.lookup("Count rows", params) == CODE
+    cache.invalidate("Count rows", params)
+    report = cache.report()
+    assert (report["hits"], report["misses"], report["invalidated"], report["entries"]) == (0, 1, 1, 0)
+
+
+def test_schema_change_misses(tmp_path):
+    cache = CodeCache(path=str(tmp_path / "code.json"))
+    cache.add("Count rows", pd.DataFrame({"a": [1]}), CODE)
+    assert cache.lookup("Count rows", pd.DataFrame({"b": [1]})) is None
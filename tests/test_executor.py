@@ -0,0 +1,115 @@
+import time
+import threading
+from llm import deadline
+from agent.executor import ReActPlanExecutor
+
+
+class StubLLM:
+    """Answers every step by reflecting (or with `route(step, attempt)`), and passes every judgement."""
+
+    def __init__(self, route=None):
+        self.route = route
+        self.attempts = {}
+
+    def think_and_route(self, context):
+        step = context["step_description"]
+        self.attempts[step] = self.attempts.get(step, 0) + 1
+        if self.route is not None:
+            tool, args = self.route(step, self.attempts[step])
+            return {"thought": f"Calling {tool}", "tool": tool, "args": args}
+        return {"thought": f"Done: {step}", "tool": "think_reflect", "args": {}}
+
+    def judge_step(self, step, trace):
+        return True
+
+    def _call_llm(self, prompt, call_type="answer", accept=None):
+        return "answer"
+
+    def stream_answer(self, prompt):
+        yield "answer"
+
+
+def make_executor(llm=None, tool_mapper=None, **kwargs):
+    return ReActPlanExecutor(tool_specs=[], tool_mapper=tool_mapper or {}, llm=llm or StubLLM(), **kwargs)
+
+
+def test_independent_steps_run_in_parallel_and_dependents_wait():
+    lock = threading.Lock()
+    running, peak, order = [], [], []
+
+    def fetch(name):
+        with lock:
+            running.append(name)
+            peak.append(len(running))
+        time.sleep(0.2)
+        with lock:
+            running.remove(name)
+            order.append(name)
+        return name
+
+    def route(step, attempt):
+        name = step.split()[1]
+        return "fetch", {"name": name, "output_var": name}
+
+    plan = [
+        "Fetch a (inputs: none | outputs: a)",
+        "Fetch b (inputs: none | outputs: b)",
+        "Combine c (inputs: a, b | outputs: c)",
+    ]
+    executor = make_executor(llm=StubLLM(route), tool_mapper={"fetch": fetch})
+    assert executor.run_plan(plan, "question") == "answer"
+    assert max(peak) == 2
+    assert order[-1] == "c"
+    assert executor.succeeded()
+
+
+def test_undeclared_output_var_is_rejected_and_retried():
+    def route(step, attempt):
+        return "fetch", {"output_var": "some_other_name" if attempt == 1 else "orders"}
+
+    executor = make_executor(llm=StubLLM(route), tool_mapper={"fetch": lambda: 42})
+    executor.run_plan(["Fetch orders (inputs: none | outputs: orders)"], "question")
+    trace = executor.context_history.entries[-1]["trace"]
+    assert "isn't an output of this step" in trace[0]["error"]
+    assert trace[1]["output_var"] == "orders"
+    assert "some_other_name" not in executor.scratchpad.memory
+    assert executor.scratchpad.get("orders") == 42
+
+
+def test_slow_streamed_plan_stops_at_steps_deadline():
+    closed = []
+
+    def slow_plan():
+        try:
+            yield "Reflect A (inputs: none | outputs: none)"
+            time.sleep(3)
+            yield "Reflect B (inputs: none | outputs: none)"
+        finally:
+            closed.append(True)
+
+    executor = make_executor(answer_reserve_s=0.5)
+    start = time.perf_counter()
+    with deadline.within(2.0):
+        answer = executor.run_plan(slow_plan(), "question")
+    assert time.perf_counter() - start < 2.0
+    assert answer == "answer"
+    assert executor.plan == ["Reflect A (inputs: none | outputs: none)"]
+    assert executor.metrics["timeouts"]["steps"] == 1
+    # The abandoned planner is closed once its pending read returns
+    time.sleep(2)
+    assert closed == [True]
+
+
+def test_plan_stream_hitting_deadline_still_answers():
+    def plan_out_of_time():
+        yield "Reflect A (inputs: none | outputs: none)"
+        time.sleep(0.7)
+        # What the scheduler does before the planner's next LLM request
+        deadline.check("llm")
+        yield "Reflect B (inputs: none | outputs: none)"
+
+    executor = make_executor(answer_reserve_s=0.5)
+    with deadline.within(1.0):
+        response = executor.run_plan(plan_out_of_time(), "question", stream=True)
+        assert "".join(response) == "answer"
+    assert executor.plan == ["Reflect A (inputs: none | outputs: none)"]
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+from agent.jobs import JobStore, JobWorkerPool
+
+
+def test_claim_order_and_cancel(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    low = store.submit("low?", priority=0)
+    high = store.submit("high?", priority=5)
+    cancelled = store.submit("cancel me?")
+
+    assert store.cancel(cancelled)
+    assert store.get(high)["queue_position"] == 0   # Jobs ahead of it
+    assert store.get(low)["queue_position"] == 1
+    assert store.claim(worker_pid=1)["job_id"] == high
+    assert store.claim(worker_pid=1)["job_id"] == low
+    assert store.claim(worker_pid=1) is None
+    assert not store.cancel(low)   # Only queued jobs can be cancelled
+
+
+def test_requeue_orphans(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job_id = store.submit("orphaned?")
+    store.claim(worker_pid=2 ** 22 + 1)   # No such process
+    assert store.requeue_orphans() == 1
+    assert store.get(job_id)["status"] == "queued"
+
+
+def test_workers_can_start_processes_and_stop_requeues(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    pool = JobWorkerPool(store, workers=1, poll_s=0.1)
+    pool.start()
+    try:
+        # Generated code runs in sandbox processes, which daemonic workers can't start
+        assert not any(process.daemon for process in pool._processes)
+        # Pretend the worker is mid-job when it gets terminated
+        job_id = store.submit("long running?")
+        with sqlite3.connect(store.path) as conn:
+            conn.execute("UPDATE jobs SET status = 'running', worker_pid = ? WHERE job_id = ?",
+                         (pool._processes[0].pid, job_id))
+    finally:
+        pool.stop(timeout_s=0)
+    assert store.get(job_id)["status"] == "queued"
+
+
+def test_job_that_keeps_killing_its_worker_fails(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), max_attempts=2)
+    job_id = store.submit("crashes the worker?")
+    for _ in range(2):
+        assert store.claim(worker_pid=2 ** 22 + 1)["job_id"] == job_id   # No such process
+        store.requeue_orphans()
+    job = store.get(job_id)
+    assert job["status"] == "failed"
+    assert "Worker died" in job["error"]
+    assert store.claim(worker_pid=2 ** 22 + 1) is None
+
+
+def test_claim_skips_jobs_out_of_attempts(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"), max_attempts=1)
+    job_id = store.submit("already tried?")
+    with sqlite3.connect(store.path) as conn:
+        conn.execute("UPDATE jobs SET attempts = 1 WHERE job_id = ?", (job_id,))
+    assert store.claim(worker_pid=os.getpid()) is None
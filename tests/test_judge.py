@@ -0,0 +1,16 @@
+from evals import judge
+
+
+def test_unparsed_batch_reply_falls_back_to_single_judging(monkeypatch):
+    monkeypatch.setattr(judge.judge_router, "call", lambda *args, **kwargs: None)
+    judged_alone = []
+
+    def judge_one(question, response):
+        judged_alone.append(question)
+        return judge.ResponseScore(helpfulness=3, rationale="alone")
+
+    items = [("q1", "r1"), ("q2", "r2"), ("q3", "r3")]
+    scores = judge._judge_in_batches(items, 2, "eval_response_batch", judge._response_batch_prompt,
+                                     judge.ResponseScoreBatch, judge.ResponseScore, judge_one)
+    assert [s.rationale for s in scores] == ["alone"] * 3
+    assert sorted(judged_alone) == ["q1", "q2", "q3"]
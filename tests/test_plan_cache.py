@@ -0,0 +1,36 @@
+from agent.plan_cache import PlanStore, normalize_question
+
+PLAN = ["Fetch late deliveries per SELLER_ID (inputs: none | outputs: late)"]
+
+
+def test_rephrasings_share_a_key():
+    assert normalize_question("What sellers cause late delivery the most?") == \
+        normalize_question("what sellers cause LATE delivery the most")
+
+
+def test_quantifiers_and_content_words_stay_in_the_key():
+    assert normalize_question("Which sellers are most late?") != normalize_question("Which sellers are late?")
+    assert normalize_question("Top 3 products per category") != normalize_question("Top 3 products")
+
+
+def test_only_identical_questions_are_exact(tmp_path):
+    store = PlanStore(str(tmp_path / "plans.json"))
+    store.add("What were the top 5 sellers by revenue in 2017?", PLAN)
+
+    entry, score = store.lookup("what were the top 5 sellers by revenue in 2017")
+    assert score == 1.0 and entry["plan"] == PLAN
+
+    # Near-matches are adapted, never reused verbatim
+    entry, score = store.lookup("What were the top 5 sellers by revenue in 2018?")
+    assert entry["plan"] == PLAN
+    assert store.adapt_threshold <= score < 1.0
+
+
+def test_persists_and_reports(tmp_path):
+    path = str(tmp_path / "plans.json")
+    PlanStore(path).add("How many orders were late?", PLAN)
+    store = PlanStore(path)
+    assert store.lookup("How many orders were late?")[1] == 1.0
+    store.record("exact_hits", 0.0)
+    store.record("misses", 2.0)
+    assert store.report()["hit_rate"] == 0.5
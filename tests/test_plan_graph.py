@@ -0,0 +1,26 @@
+from agent.plan_graph import PlanGraph, parse_step_io
+
+
+def test_parse_step_io():
+    assert parse_step_io("Fetch orders (inputs: none | outputs: orders)") == ("Fetch orders", set(), {"orders"})
+    assert parse_step_io("Join them (inputs: a, `b` | outputs: c).") == ("Join them", {"a", "b"}, {"c"})
+    assert parse_step_io("Just think") == ("Just think", None, None)
+
+
+def test_dependencies_follow_inputs_and_outputs():
+    graph = PlanGraph()
+    graph.add("Fetch orders (inputs: none | outputs: orders)")
+    graph.add("Fetch reviews (inputs: none | outputs: reviews)")
+    graph.add("Join (inputs: orders, reviews | outputs: joined)")
+    graph.add("Overwrite orders (inputs: none | outputs: orders)")
+    assert graph.deps == [set(), set(), {0, 1}, {0, 2}]
+    assert graph.ready(done=set(), started=set()) == [0, 1]
+    assert graph.ready(done={0, 1}, started={0, 1}) == [2]
+
+
+def test_unannotated_step_is_a_barrier():
+    graph = PlanGraph()
+    graph.add("Fetch orders (inputs: none | outputs: orders)")
+    graph.add("Look around")
+    graph.add("Fetch reviews (inputs: none | outputs: reviews)")
+    assert graph.deps == [set(), {0}, {1}]
@@ -0,0 +1,42 @@
+import httpx
+from llm.response_cache import ResponseCache, CachingTransport
+
+
+class ChunkedTransport(httpx.BaseTransport):
+    """Serves a body in chunks, noting how many have been produced."""
+
+    def __init__(self):
+        self.produced = 0
+
+    def handle_request(self, request):
+        def body():
+            for chunk in (b"data: one\n\n", b"data: two\n\n"):
+                self.produced += 1
+                yield chunk
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body())
+
+
+def test_miss_streams_through_and_is_cached_when_complete(tmp_path):
+    upstream = ChunkedTransport()
+    cache = ResponseCache(str(tmp_path))
+    client = httpx.Client(transport=CachingTransport(cache, upstream))
+
+    with client.stream("POST", "http://api/v1/responses", json={"stream": True}) as response:
+        chunks = response.iter_bytes()
+        assert next(chunks) == b"data: one\n\n"
+        assert upstream.produced == 1
+        assert b"".join(chunks) == b"data: two\n\n"
+
+    replayed = client.post("http://api/v1/responses", json={"stream": True})
+    assert replayed.content == b"data: one\n\ndata: two\n\n"
+    assert cache.stats == {"hits": 1, "misses": 1}
+
+
+def test_stream_closed_early_is_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    client = httpx.Client(transport=CachingTransport(cache, ChunkedTransport()))
+
+    with client.stream("POST", "http://api/v1/responses", json={"stream": True}) as response:
+        next(response.iter_bytes())
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,26 @@
+import pytest
+from agent.sandbox import SandboxPool
+from llm import deadline
+
+
+@pytest.fixture
+def pool():
+    pool = SandboxPool(size=1, memory_limit_mb=None)
+    yield pool
+    pool.close()
+
+
+def test_runs_code(pool):
+    outcome = pool.run("def add(a, b):\n    return a + b", {"a": 1, "b": 2})
+    assert outcome["traceback"] is None
+    assert outcome["result"] == 3
+
+
+def test_waiting_for_a_worker_respects_the_deadline(pool):
+    busy = pool._idle.get()   # The only worker is taken
+    try:
+        with deadline.within(0.2):
+            with pytest.raises(deadline.DeadlineExceeded):
+                pool.run("def f():\n    return 1")
+    finally:
+        pool._idle.put(busy)
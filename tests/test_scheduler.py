@@ -0,0 +1,140 @@
+import time
+import threading
+import httpx
+import openai
+import pytest
+from llm.fake_openai import FakeOpenAIServer
+from llm.scheduler import RequestScheduler, StreamInterrupted
+
+
+def make_client(server):
+    # Retries belong to the scheduler under test, not the SDK
+    return openai.OpenAI(base_url=server.base_url, api_key="test", max_retries=0)
+
+
+def stream_text(scheduler, client):
+    events = scheduler.stream(client.responses.create, model="m", input="hi", stream=True, est_tokens=10)
+    return "".join(e.delta for e in events if e.type == "response.output_text.delta")
+
+
+def connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "http://fake/v1/responses"))
+
+
+def wait_for_queue_depth(scheduler, depth):
+    while scheduler.metrics()["queue_depth"] < depth:
+        time.sleep(0.005)
+
+
+def test_submit_backs_off_and_retries_rate_limits():
+    scheduler = RequestScheduler(base_delay=0.01)
+    with FakeOpenAIServer(reply="ok", rate_limit_first=3) as server:
+        response = scheduler.submit(make_client(server).responses.create, model="m", input="hi")
+    assert response.output_text == "ok"
+    assert scheduler.stats["retries"] == 3
+    assert scheduler.stats["rate_limited"] == 3
+    assert len(server.requests) == 4
+
+
+def test_submit_gives_up_after_max_retries():
+    scheduler = RequestScheduler(base_delay=0.01, max_retries=2)
+    with FakeOpenAIServer(reply="ok", rate_limit_first=10) as server:
+        with pytest.raises(openai.RateLimitError):
+            scheduler.submit(make_client(server).responses.create, model="m", input="hi")
+    assert scheduler.stats["failures"] == 1
+    assert len(server.requests) == 3
+
+
+def test_submit_honors_retry_after():
+    scheduler = RequestScheduler(base_delay=0.001)
+    with FakeOpenAIServer(reply="ok", rate_limit_first=1, retry_after=0.3) as server:
+        start = time.monotonic()
+        scheduler.submit(make_client(server).responses.create, model="m", input="hi")
+    assert time.monotonic() - start >= 0.3
+
+
+def test_interactive_requests_jump_the_queue():
+    scheduler = RequestScheduler(max_concurrency=1)
+    served = []
+    with FakeOpenAIServer(reply="ok") as server:
+        create = make_client(server).responses.create
+        # Hold the only slot with an unfinished stream while both requests queue up
+        holder = scheduler.stream(create, model="m", input="hi", stream=True)
+        next(holder)
+
+        def ask(priority):
+            # Records the order the scheduler admits requests in
+            scheduler.submit(served.append, priority, priority=priority)
+
+        threads = [threading.Thread(target=ask, args=("eval",)), threading.Thread(target=ask, args=("interactive",))]
+        threads[0].start()
+        wait_for_queue_depth(scheduler, 1)
+        threads[1].start()
+        wait_for_queue_depth(scheduler, 2)
+        holder.close()
+        for thread in threads:
+            thread.join()
+    assert served == ["interactive", "eval"]
+
+
+def test_concurrency_cap():
+    scheduler = RequestScheduler(max_concurrency=2)
+    peak = []
+
+    def call():
+        peak.append(scheduler.metrics()["in_flight"])
+        time.sleep(0.05)
+        return "done"
+
+    threads = [threading.Thread(target=scheduler.submit, args=(call,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
+    assert scheduler.metrics()["in_flight"] == 0
+
+
+def test_stream_holds_slot_until_exhausted():
+    scheduler = RequestScheduler(max_concurrency=1)
+    with FakeOpenAIServer(reply="a streamed reply") as server:
+        events = scheduler.stream(make_client(server).responses.create, model="m", input="hi", stream=True)
+        next(events)
+        assert scheduler.metrics()["in_flight"] == 1
+        list(events)
+    assert scheduler.metrics()["in_flight"] == 0
+
+
+def test_stream_releases_slot_when_closed_early():
+    scheduler = RequestScheduler(max_concurrency=1)
+    with FakeOpenAIServer(reply="a streamed reply") as server:
+        events = scheduler.stream(make_client(server).responses.create, model="m", input="hi", stream=True)
+        next(events)
+        events.close()
+    assert scheduler.metrics()["in_flight"] == 0
+
+
+def test_stream_retries_rate_limit_before_first_event():
+    scheduler = RequestScheduler(base_delay=0.01)
+    with FakeOpenAIServer(reply="recovered", rate_limit_first=2, retry_after=0.05) as server:
+        assert stream_text(scheduler, make_client(server)) == "recovered"
+    assert scheduler.stats["rate_limited"] == 2
+
+
+def test_stream_failure_after_output_raises_interrupted():
+    scheduler = RequestScheduler(base_delay=0.01)
+    calls = []
+
+    def flaky_stream():
+        calls.append(1)
+        yield "first"
+        raise connection_error()
+
+    events = scheduler.stream(flaky_stream)
+    assert next(events) == "first"
+    with pytest.raises(StreamInterrupted) as excinfo:
+        next(events)
+    assert isinstance(excinfo.value.__cause__, openai.APIConnectionError)
+    # Not retried, the caller already has part of the output
+    assert len(calls) == 1
+    assert scheduler.metrics()["in_flight"] == 0
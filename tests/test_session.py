@@ -0,0 +1,90 @@
+import gc
+import pytest
+from agent.session import SessionManager, SessionBusy
+from agent.runner import _SessionTurnStream
+
+
+def test_get_reuses_session_by_id():
+    manager = SessionManager()
+    session = manager.get("abc")
+    assert manager.get("abc") is session
+    assert manager.stats["created"] == 1
+    assert manager.stats["reused"] == 1
+
+
+def test_idle_sessions_are_evicted():
+    manager = SessionManager(idle_timeout_s=60)
+    session = manager.get("old")
+    session.last_used -= 120
+    manager.sweep()
+    assert manager.find("old") is None
+    assert manager.stats["evicted_idle"] == 1
+
+
+def test_busy_sessions_are_never_evicted():
+    manager = SessionManager(idle_timeout_s=60)
+    session = manager.get("busy")
+    assert session.acquire()
+    session.last_used -= 120
+    manager.sweep()
+    assert manager.find("busy") is session
+    session.release()
+
+
+def test_least_recently_used_evicted_beyond_max_sessions():
+    manager = SessionManager(max_sessions=2)
+    manager.get("a")
+    manager.get("b")
+    manager.get("a")
+    manager.get("c")
+    assert manager.find("b") is None
+    assert manager.find("a") is not None and manager.find("c") is not None
+    assert manager.stats["evicted_memory"] == 1
+
+
+def test_acquired_session_survives_concurrent_sweep():
+    manager = SessionManager(max_sessions=1)
+    session = manager.get("a", acquire=True)
+    # Another request's get() pushes the manager over its limit, then a sweep runs
+    manager.get("b")
+    manager.sweep()
+    assert manager.find("a") is session
+    session.release()
+
+
+def test_acquire_busy_session_raises():
+    manager = SessionManager()
+    session = manager.get("a", acquire=True)
+    with pytest.raises(SessionBusy):
+        manager.get("a", acquire=True)
+    session.release()
+    assert manager.get("a", acquire=True) is session
+
+
+def answer():
+    yield "an answer"
+
+
+def test_unread_streamed_answer_releases_session():
+    session = SessionManager().get("s", acquire=True)
+    response = _SessionTurnStream(answer(), session, "q")
+    del response
+    gc.collect()
+    assert not session.busy
+    assert [turn["question"] for turn in session.turns] == ["q"]
+
+
+def test_closed_streamed_answer_releases_session_once():
+    session = SessionManager().get("s", acquire=True)
+    response = _SessionTurnStream(answer(), session, "q")
+    response.close()
+    response.close()
+    assert not session.busy
+    assert len(session.turns) == 1
+
+
+def test_consumed_streamed_answer_releases_session():
+    session = SessionManager().get("s", acquire=True)
+    response = _SessionTurnStream(answer(), session, "q")
+    assert "".join(response) == "an answer"
+    assert not session.busy
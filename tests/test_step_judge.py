@@ -0,0 +1,43 @@
+from agent.step_judge import prejudge_step, requested_columns
+
+
+def sql_entry(**meta):
+    return {"action": {"tool": "convert_text_to_sql", "args": {}}, "result_meta": meta}
+
+
+def test_frame_with_requested_columns_passes():
+    step = "Fetch ORDER_ID and REVIEW_SCORE for late orders"
+    assert requested_columns(step) == {"ORDER_ID", "REVIEW_SCORE"}
+    entry = sql_entry(type="DataFrame", empty=False, columns=["order_id", "review_score"])
+    assert prejudge_step(step, entry) is True
+
+
+def test_frame_missing_requested_column_escalates():
+    entry = sql_entry(type="DataFrame", empty=False, columns=["ORDER_ID"])
+    assert prejudge_step("Fetch ORDER_ID and REVIEW_SCORE", entry) is None
+
+
+def test_step_naming_no_columns_escalates():
+    entry = sql_entry(type="DataFrame", empty=False, columns=["SELLER", "LATE_RATE"])
+    assert prejudge_step("Find the sellers with the most late deliveries", entry) is None
+
+
+def test_empty_frame_escalates():
+    assert prejudge_step("Fetch ORDER_ID", sql_entry(type="DataFrame", empty=True, columns=["ORDER_ID"])) is None
+
+
+def test_errors_and_none_fail():
+    assert prejudge_step("Fetch ORDER_ID", dict(sql_entry(), error="boom")) is False
+    assert prejudge_step("Fetch ORDER_ID", sql_entry(is_none=True)) is False
+
+
+def test_scalars():
+    assert prejudge_step("Count orders", sql_entry(type="int")) is True
+    # A string may be an error or "no data" message
+    assert prejudge_step("Count orders", sql_entry(type="str")) is None
+
+
+def test_non_data_tools_escalate():
+    entry = {"action": {"tool": "write_python_code", "args": {}}, "result_meta": {"type": "DataFrame", "empty": False}}
+    assert prejudge_step("Summarize", entry) is None
+    assert prejudge_step("Reflect", {"action": None}) is None
@@ -0,0 +1,38 @@
+from llm.telemetry import UsageRecorder
+
+
+def record(recorder, run_id, calls=1):
+    with recorder.run(run_id):
+        for _ in range(calls):
+            recorder.record("plan", "gpt-4o", "strong", 0.5, 100, 20, 0.001)
+
+
+def test_report_per_run():
+    recorder = UsageRecorder()
+    record(recorder, "a", calls=2)
+    record(recorder, "b")
+    assert recorder.report("a")["totals"]["calls"] == 2
+    assert recorder.report("a")["by_call_type"]["plan"]["input_tokens"] == 200
+    assert len(recorder.records_for("b")) == 1
+
+
+def test_keeps_most_recently_active_runs():
+    recorder = UsageRecorder(max_runs=2)
+    record(recorder, "a")
+    record(recorder, "b")
+    record(recorder, "a")   # Still active, so "b" is the least recent
+    record(recorder, "c")
+    assert recorder.records_for("b") == []
+    assert len(recorder.records_for("a")) == 2
+    assert len(recorder.records) == 3
+
+
+def test_report_has_first_ttft_per_call_type():
+    recorder = UsageRecorder()
+    with recorder.run("run-1"):
+        recorder.record("plan", "m", "fast", 1.0, 10, 5, 0.0, ttft=0.25)
+        recorder.record("answer", "m", "fast", 2.0, 10, 5, 0.0, ttft=0.5)
+        recorder.record("answer", "m", "fast", 2.0, 10, 5, 0.0, ttft=0.9)
+        recorder.record("judge", "m", "fast", 0.1, 10, 5, 0.0)
+    assert recorder.report("run-1")["ttft_s"] == {"plan": 0.25, "answer": 0.5}
+    assert recorder.records_for("run-1")[-1]["ttft_s"] is None